@@ -0,0 +1,277 @@
+"""Load-test the app's real flows against a local fake LLM: profile form -> plan generation -> multi-turn chat.
+
+Each simulated session drives `src/main2.py` through Streamlit's AppTest
+harness (no browser or server). It fills in and submits the profile form,
+polls until its background plan job finishes, then sends `--turns` chat
+messages. The Gemini/Groq clients are replaced by FakeLLM
+(benchmarks/fake_llm.py), which has a configurable time to first token,
+decode rate and error rate.
+
+AppTest installs a process-global mock runtime for every run, so concurrent
+sessions each get their own process; they load the fake backend at the same
+time but don't share the app's in-process caches, like separate replicas.
+
+Reported: wall and CPU time per rerun, plan and chat latency, time to first
+token (from the app's tracer), throughput, and memory growth of the profile
+store and of each session's process (tracemalloc). Results are written as
+JSON; pass `--baseline` with an earlier result file to print the changes.
+
+Usage:
+    python benchmarks/bench_app_load.py --sessions 4 --turns 3 --ttft 0.3 --tokens-per-second 80 \\
+        --error-rate 0.05 --output data/benchmarks/app_load.json --baseline data/benchmarks/app_load_main.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import tracemalloc
+import subprocess
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = Path(__file__).resolve().parent.parent
+MAIN_SCRIPT = ROOT / "src" / "main2.py"
+# Compared against --baseline: metric path -> True if higher is better
+KEY_METRICS = {
+    ("rerun_ms", "p50"): False,
+    ("rerun_ms", "p95"): False,
+    ("rerun_cpu_ms", "p50"): False,
+    ("plan_seconds", "p50"): False,
+    ("chat_turn_seconds", "p50"): False,
+    ("ttft_ms", "p50"): False,
+    ("throughput", "chat_turns_per_second"): True,
+    ("memory", "store_kb"): False,
+    ("memory", "process_growth_kb"): False,
+}
+
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+
+def percentiles(values, scale=1.0, digits=1):
+    if not values:
+        return {"p50": None, "p95": None, "max": None, "n": 0}
+    ordered = sorted(values)
+    pick = lambda q: round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * scale, digits)
+    return {"p50": pick(0.5), "p95": pick(0.95), "max": round(ordered[-1] * scale, digits), "n": len(ordered)}
+
+
+def profile_for(index):
+    """A distinct profile per session so the plan cache doesn't short-circuit generation."""
+    return {"Age": 20 + index % 60, "Weight (kg)": 60.0 + index % 40, "Height (cm)": 160.0 + index % 30}
+
+
+class Session:
+    """One simulated browser session driving the app through AppTest."""
+
+    def __init__(self, index, args):
+        self.index = index
+        self.args = args
+        self.reruns = []  # (wall seconds, process CPU seconds)
+        self.plan_seconds = None
+        self.chat_turns = []
+        self.errors = []
+
+    def rerun(self, app):
+        wall, cpu = time.perf_counter(), time.process_time()
+        app.run()
+        self.reruns.append((time.perf_counter() - wall, time.process_time() - cpu))
+        self.errors.extend(str(e.value) for e in app.exception)
+        return app
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+
+        app = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=self.args.timeout)
+        self.rerun(app)
+
+        for label, value in profile_for(self.index).items():
+            next(w for w in app.number_input if w.label == label).set_value(value)
+        next(b for b in app.button if "Generate My Personalized Plans" in b.label).click()
+        started = time.perf_counter()
+        self.rerun(app)
+        # The plan job runs in the background; poll the way the progress fragment does
+        while not app.session_state["plans_generated"]:
+            state = app.session_state.filtered_state
+            if state.get("plan_job_id") is None:
+                self.errors.append(f"plan job failed: {state.get('plan_job_error') or 'no plans returned'}")
+                return self
+            if time.perf_counter() - started > self.args.timeout:
+                self.errors.append("plan generation timed out")
+                return self
+            time.sleep(self.args.poll_interval)
+            self.rerun(app)
+        self.plan_seconds = time.perf_counter() - started
+
+        # AppTest keeps the profile form's widgets from the run the job's st.rerun() interrupted and then
+        # fails to read their state; reload the page on the same session, as a browser would show it
+        reloaded = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=self.args.timeout)
+        for key, value in app.session_state.filtered_state.items():
+            reloaded.session_state[key] = value
+        app = self.rerun(reloaded)
+
+        for turn in range(self.args.turns):
+            started = time.perf_counter()
+            app.chat_input[0].set_value(f"Session {self.index} question {turn}: how should I adjust my plan?")
+            self.rerun(app)
+            self.chat_turns.append(time.perf_counter() - started)
+        return self
+
+
+def install_fake_backend(args):
+    """Swap the provider SDK clients for FakeLLM; everything above them (registry, router, jobs) stays real."""
+    import model_registry
+    from fake_llm import FakeLLM, build_fake_agent
+
+    models = {}
+    lock = threading.Lock()
+
+    def create_fake_model(model_id):
+        with lock:
+            return models.setdefault(model_id, FakeLLM(
+                model_id, ttft=args.ttft, tokens_per_second=args.tokens_per_second,
+                answer_tokens=args.answer_tokens, error_rate=args.error_rate, seed=args.seed,
+            ))
+
+    # main2 builds its registry from these module attributes on its first run
+    model_registry.create_model = create_fake_model
+    model_registry.build_agent = build_fake_agent
+    return models
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_session(index, args):
+    """Run one session in this (fresh) process and return its measurements."""
+    models = install_fake_backend(args)
+    from tracing import get_tracer
+    tracer = get_tracer()
+    tracer.enabled = True
+    if not args.no_memory:
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+
+    session = Session(index, args).run()
+
+    memory = {}
+    if not args.no_memory:
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        memory = {
+            "process_growth": sum(stat.size_diff for stat in after.compare_to(before, "filename")),
+            "store": store_bytes(after),
+        }
+    return {
+        "reruns": session.reruns,
+        "plan_seconds": session.plan_seconds,
+        "chat_turns": session.chat_turns,
+        "errors": session.errors,
+        "ttft": [value for (metric, _), histogram in tracer.histograms.items() if metric == "ttft_seconds"
+                 for value in histogram.recent],
+        "tokens": {row["metric"]: row["value"] for row in tracer.stats()["counters"] if "tokens" in row["metric"]},
+        "model_calls": {model_id: (model.calls, model.errors) for model_id, model in models.items()},
+        "memory": memory,
+    }
+
+
+def store_bytes(snapshot):
+    """Bytes currently held by allocations made in the store and profile model modules."""
+    filters = [tracemalloc.Filter(True, str(ROOT / "src" / name)) for name in ("storage.py", "profile_model.py")]
+    return sum(stat.size for stat in snapshot.filter_traces(filters).statistics("filename"))
+
+
+def compare(result, baseline):
+    print("\nChange vs baseline (negative is better unless marked ^):", file=sys.stderr)
+    for (section, key), higher_is_better in KEY_METRICS.items():
+        new, old = result.get(section, {}).get(key), baseline.get(section, {}).get(key)
+        if new is None or not old:
+            continue
+        change = (new - old) / old * 100
+        marker = " ^" if higher_is_better else ""
+        print(f"  {section}.{key}{marker}: {old} -> {new} ({change:+.1f}%)", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent simulated sessions")
+    parser.add_argument("--turns", type=int, default=3, help="chat messages per session")
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake model time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=80, help="fake model decode rate")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="chat answer length")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of fake model calls that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per AppTest run and per plan")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="seconds between plan job polls")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (it slows every allocation)")
+    parser.add_argument("--output", default=str(ROOT / "data" / "benchmarks" / "app_load.json"))
+    parser.add_argument("--baseline", help="earlier result file to compare against")
+    args = parser.parse_args()
+
+    # In-memory store and cache keep runs independent; logs go to a scratch file. Inherited by the workers.
+    os.environ.update(STORE_BACKEND="memory", PLAN_CACHE_BACKEND="memory",
+                      LOG_PATH=str(Path(tempfile.gettempdir()) / "bench_app_load.log"))
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.sessions, mp_context=multiprocessing.get_context("spawn")) as executor:
+        sessions = list(executor.map(run_session, range(args.sessions), [args] * args.sessions))
+    elapsed = time.perf_counter() - started
+
+    chat_turns = [seconds for session in sessions for seconds in session["chat_turns"]]
+    plans = [session["plan_seconds"] for session in sessions if session["plan_seconds"] is not None]
+    model_calls, tokens = {}, {}
+    for session in sessions:
+        for model_id, (calls, errors) in session["model_calls"].items():
+            totals = model_calls.setdefault(model_id, {"calls": 0, "errors": 0})
+            totals["calls"] += calls
+            totals["errors"] += errors
+        for metric, value in session["tokens"].items():
+            tokens[metric] = tokens.get(metric, 0) + value
+    memory = {}
+    if not args.no_memory:
+        growth = [session["memory"]["process_growth"] / 1024 for session in sessions]
+        store = [session["memory"]["store"] / 1024 for session in sessions]
+        memory = {
+            "process_growth_kb": round(statistics.median(growth), 1),
+            "store_kb": round(statistics.median(store), 1),
+        }
+
+    result = {
+        "commit": git_commit(),
+        "config": vars(args),
+        "elapsed_seconds": round(elapsed, 3),
+        "rerun_ms": percentiles([wall for s in sessions for wall, _ in s["reruns"]], scale=1000),
+        "rerun_cpu_ms": percentiles([cpu for s in sessions for _, cpu in s["reruns"]], scale=1000),
+        "plan_seconds": percentiles(plans, digits=3),
+        "chat_turn_seconds": percentiles(chat_turns, digits=3),
+        "ttft_ms": percentiles([value for session in sessions for value in session["ttft"]], scale=1000),
+        "throughput": {
+            "plans_per_second": round(len(plans) / elapsed, 3),
+            "chat_turns_per_second": round(len(chat_turns) / elapsed, 3),
+        },
+        "memory": memory,  # median per session
+        "model_calls": model_calls,
+        "tokens": tokens,
+        "errors": [error for session in sessions for error in session["errors"]][:20],
+    }
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    print(json.dumps(result, indent=2))
+    if args.baseline:
+        compare(result, json.loads(Path(args.baseline).read_text()))
+
+
+if __name__ == "__main__":
+    main()
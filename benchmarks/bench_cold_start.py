@@ -0,0 +1,101 @@
+"""Measure cold start: a fresh interpreter importing and running the app until its first page is rendered.
+
+Each round starts a new Python process that runs `src/main2.py` once through
+Streamlit's AppTest harness (no browser or server), with in-memory storage and
+its log in the temp directory so no files in the repo are touched. Reports the time to first paint, the slowest imports
+(from the app's import profiler) and which model provider SDKs were loaded;
+none should be before a model is used. Exits non-zero if the median time to
+first paint exceeds `--max-seconds` or a provider SDK was imported at startup.
+
+Usage:
+    python benchmarks/bench_cold_start.py --rounds 5 --max-seconds 3
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+# Modules that must stay unloaded until a model is actually used
+PROVIDER_MODULES = ("agno", "google.genai", "groq", "httpx", "tomli")
+
+CHILD = """
+import sys, time, json
+started = time.perf_counter()
+sys.path.insert(0, {src!r})
+from import_profiler import get_profiler
+profiler = get_profiler()
+profiler.install()
+from streamlit.testing.v1 import AppTest
+harness_ready = time.perf_counter()
+profiler.report(top=0)  # marks the harness's own imports as reported
+app = AppTest.from_file({script!r}, default_timeout=60).run()
+finished = time.perf_counter()
+print(json.dumps({{
+    "harness_seconds": harness_ready - started,
+    "first_paint_seconds": finished - harness_ready,
+    "exceptions": [str(e.value) for e in app.exception],
+    # Attempted imports count too, so a provider SDK missing from this environment is still caught
+    "providers_loaded": sorted(m for m in set(sys.modules) | set(profiler.timings)
+                               if m.split(".")[0] in {providers!r} or m in {providers!r}),
+    "slowest_imports": [[m, round(c * 1000, 1), round(s * 1000, 1)] for m, (c, s) in profiler.report(top={top})],
+}}))
+"""
+
+
+def run_once(top):
+    env = dict(os.environ, STORE_BACKEND="memory", PLAN_CACHE_BACKEND="memory")
+    env.setdefault("LOG_PATH", str(Path(tempfile.gettempdir()) / "bench_cold_start.log"))
+    code = CHILD.format(src=str(ROOT / "src"), script=str(ROOT / "src" / "main2.py"),
+                        providers=PROVIDER_MODULES, top=top)
+    process = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(process.stderr[-2000:])
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to report")
+    parser.add_argument("--max-seconds", type=float, default=None, help="fail if median first paint is slower")
+    args = parser.parse_args()
+
+    runs = [run_once(args.top) for _ in range(args.rounds)]
+    first_paint = [run["first_paint_seconds"] for run in runs]
+    last = runs[-1]
+    result = {
+        "rounds": args.rounds,
+        "first_paint_ms": {
+            "median": round(statistics.median(first_paint) * 1000, 1),
+            "min": round(min(first_paint) * 1000, 1),
+            "max": round(max(first_paint) * 1000, 1),
+        },
+        "harness_import_ms": round(statistics.median(run["harness_seconds"] for run in runs) * 1000, 1),
+        "providers_loaded_at_startup": last["providers_loaded"],
+        "exceptions": last["exceptions"],
+        "slowest_imports_ms": [
+            {"module": module, "cumulative": cumulative, "self": self_time}
+            for module, cumulative, self_time in last["slowest_imports"]
+        ],
+    }
+    print(json.dumps(result, indent=2))
+
+    failures = []
+    if args.max_seconds is not None and statistics.median(first_paint) > args.max_seconds:
+        failures.append(f"median first paint {statistics.median(first_paint):.2f}s exceeds {args.max_seconds}s")
+    if last["providers_loaded"]:
+        failures.append(f"provider modules imported at startup: {', '.join(last['providers_loaded'])}")
+    if last["exceptions"]:
+        failures.append("the app raised during its first run")
+    if failures:
+        print("FAIL: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
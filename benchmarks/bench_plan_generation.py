@@ -0,0 +1,53 @@
+"""Compare sequential vs concurrent plan generation against the local fake agents.
+
+Usage:
+    python benchmarks/bench_plan_generation.py --dietary-latency 1.5 --fitness-latency 1.0
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from fake_llm import FakeAgent
+from plan_service import run_agents_concurrently
+
+
+def bench_sequential(agents, prompt):
+    started = time.perf_counter()
+    for agent in agents.values():
+        agent.run(prompt)
+    return time.perf_counter() - started
+
+
+def bench_concurrent(agents, prompt):
+    started = time.perf_counter()
+    run_agents_concurrently(agents, prompt)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dietary-latency", type=float, default=1.5)
+    parser.add_argument("--fitness-latency", type=float, default=1.0)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    agents = {
+        "dietary": FakeAgent("dietary", latency=args.dietary_latency),
+        "fitness": FakeAgent("fitness", latency=args.fitness_latency),
+    }
+    prompt = "Age: 30\nWeight: 70kg"
+
+    sequential = min(bench_sequential(agents, prompt) for _ in range(args.rounds))
+    concurrent = min(bench_concurrent(agents, prompt) for _ in range(args.rounds))
+    slowest = max(args.dietary_latency, args.fitness_latency)
+
+    print(f"sequential: {sequential:.3f}s")
+    print(f"concurrent: {concurrent:.3f}s (slowest single call: {slowest:.3f}s)")
+    print(f"speedup:    {sequential / concurrent:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Compare the memory held by 100k profiles as dicts, CompactProfile records and ColumnarProfiles.
+
+Usage:
+    python benchmarks/bench_profile_memory.py --profiles 100000
+"""
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from profile_model import (
+    ACTIVITY_LEVEL_OPTIONS, DIETARY_PREFERENCE_OPTIONS, FITNESS_GOAL_OPTIONS, HEALTH_CONDITION_OPTIONS, SEX_OPTIONS,
+    ColumnarProfiles, CompactProfile,
+)
+
+
+def random_profiles(count, seed=0):
+    rng = random.Random(seed)
+    for _ in range(count):
+        conditions = rng.sample(HEALTH_CONDITION_OPTIONS[1:], rng.choice([0, 0, 1, 2])) or ["None"]
+        # Values are rebuilt per profile, like profiles decoded from JSON or submitted by separate sessions
+        yield json.loads(json.dumps({
+            "age": rng.randint(18, 80),
+            "weight": round(rng.uniform(45, 140), 1),
+            "height": round(rng.uniform(150, 200), 1),
+            "sex": rng.choice(SEX_OPTIONS),
+            "activity_level": rng.choice(ACTIVITY_LEVEL_OPTIONS),
+            "dietary_preferences": rng.choice(DIETARY_PREFERENCE_OPTIONS),
+            "fitness_goals": rng.choice(FITNESS_GOAL_OPTIONS),
+            "health_conditions": conditions,
+            "time_available": rng.choice(range(15, 121, 15)),
+        }))
+
+
+def measure(build):
+    """Bytes still allocated after `build()` returns, and the seconds it took."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    held = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return held, current, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profiles", type=int, default=100_000)
+    args = parser.parse_args()
+
+    source = list(random_profiles(args.profiles))
+    ids = [f"user-{i}" for i in range(args.profiles)]
+
+    def as_dicts():
+        return {user_id: json.loads(json.dumps(p)) for user_id, p in zip(ids, source)}
+
+    def as_records():
+        return {user_id: CompactProfile.from_dict(p) for user_id, p in zip(ids, source)}
+
+    def as_columns():
+        columns = ColumnarProfiles()
+        for user_id, p in zip(ids, source):
+            columns.put(user_id, p)
+        return columns
+
+    results = {}
+    for name, build in (("dicts", as_dicts), ("compact_records", as_records), ("columnar", as_columns)):
+        held, nbytes, elapsed = measure(build)
+        results[name] = {"bytes": nbytes, "bytes_per_profile": round(nbytes / args.profiles, 1),
+                         "build_seconds": round(elapsed, 3)}
+        if name == "compact_records":
+            assert all(held[u].to_dict() == p for u, p in zip(ids, source)), "CompactProfile round trip changed data"
+        elif name == "columnar":
+            assert all(held.get(u) == p for u, p in zip(ids, source)), "ColumnarProfiles round trip changed data"
+        del held
+
+    baseline = results["dicts"]["bytes"]
+    for result in results.values():
+        result["vs_dicts"] = round(result["bytes"] / baseline, 3)
+    print(json.dumps({"profiles": args.profiles, **results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
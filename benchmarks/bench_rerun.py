@@ -0,0 +1,106 @@
+"""Measure what one rerun of the generated-plans view and one chat turn cost: wall and CPU time, and elements sent.
+
+Runs `src/main2.py` through Streamlit's AppTest with a session that already
+has its plans (and optionally a chat history of `--messages` messages), then
+reruns it `--reruns` times and sends `--turns` chat messages. Chat answers
+come from FakeLLM with no latency, so a turn's time is the app's own work.
+
+Usage:
+    python benchmarks/bench_rerun.py --reruns 30 --messages 40 --turns 10
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from plan_schema import build_dietary_plan, build_fitness_plan
+
+DIETARY_PLAN = {
+    "why_this_plan_works": "Protein at every meal keeps you full while the calorie target stays 400 kcal under TDEE.",
+    "meals": [
+        {"slot": slot, "name": f"{slot.title()} bowl", "portion": "1 bowl (350g)", "calories": 450,
+         "notes": "Swap the grain for vegetables on rest days."}
+        for slot in ("breakfast", "lunch", "dinner", "snack")
+    ],
+    "important_considerations": [f"Consideration {i}: drink water and keep portions steady" for i in range(5)],
+}
+FITNESS_PLAN = {
+    "goals": "Build strength three days a week and walk on the others.",
+    "routine": [
+        {"phase": phase, "name": f"{phase.title()} exercise {i}", "prescription": "3 x 10", "notes": "Slow tempo."}
+        for phase in ("warm-up", "main", "cool-down") for i in range(3)
+    ],
+    "tips": [f"Tip {i}: rest 60-90s between sets" for i in range(5)],
+}
+
+
+def element_count(node):
+    children = getattr(node, "children", {})
+    return len(children) + sum(element_count(child) for child in children.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=30)
+    parser.add_argument("--messages", type=int, default=0, help="chat history length")
+    parser.add_argument("--turns", type=int, default=0, help="chat messages to send after the reruns")
+    args = parser.parse_args()
+
+    os.environ.update(STORE_BACKEND="memory", PLAN_CACHE_BACKEND="memory",
+                      LOG_PATH=str(Path(tempfile.gettempdir()) / "bench_rerun.log"))
+    from streamlit.testing.v1 import AppTest
+    import model_registry
+    from fake_llm import FakeLLM, build_fake_agent
+
+    model_registry.create_model = lambda model_id: FakeLLM(model_id, ttft=0, tokens_per_second=1e9)
+    model_registry.build_agent = build_fake_agent
+
+    app = AppTest.from_file(str(ROOT / "src" / "main2.py"), default_timeout=60)
+    app.session_state["plans_generated"] = True
+    app.session_state["dietary_plan"] = build_dietary_plan(DIETARY_PLAN)
+    app.session_state["fitness_plan"] = build_fitness_plan(FITNESS_PLAN)
+    app.session_state["chat_history"] = [
+        {"id": i + 1, "role": "user" if i % 2 == 0 else "assistant", "content": f"Message {i} about my plan. " * 8}
+        for i in range(args.messages)
+    ]
+    app.run()  # warm up: imports, cached resources
+    if app.exception:
+        raise SystemExit(app.exception[0].value)
+
+    wall, cpu = [], []
+    for _ in range(args.reruns):
+        started, started_cpu = time.perf_counter(), time.process_time()
+        app.run()
+        wall.append(time.perf_counter() - started)
+        cpu.append(time.process_time() - started_cpu)
+
+    print(f"Reruns:    {args.reruns} (chat history: {args.messages} messages)")
+    print(f"Wall time: median {statistics.median(wall) * 1000:.1f}ms, max {max(wall) * 1000:.1f}ms")
+    print(f"CPU time:  median {statistics.median(cpu) * 1000:.1f}ms")
+    print(f"Elements:  {element_count(app._tree)} per rerun ({len(app.markdown)} markdown)")
+
+    if args.turns:
+        wall, cpu = [], []
+        for turn in range(args.turns):
+            started, started_cpu = time.perf_counter(), time.process_time()
+            app.chat_input[0].set_value(f"Question {turn}: what should I eat after a workout?").run()
+            wall.append(time.perf_counter() - started)
+            cpu.append(time.process_time() - started_cpu)
+        if app.exception:
+            raise SystemExit(app.exception[0].value)
+        print(f"Chat turns: {args.turns}, wall median {statistics.median(wall) * 1000:.1f}ms, "
+              f"CPU median {statistics.median(cpu) * 1000:.1f}ms")
+        history = app.session_state["chat_history"]
+        print(f"Session chat state: {len(history)} messages, "
+              f"{sum(len(m['content']) for m in history) / 1024:.1f} KB of text")
+
+
+if __name__ == "__main__":
+    main()
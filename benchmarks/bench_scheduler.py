@@ -0,0 +1,60 @@
+"""Drive the model call scheduler with many sessions against a fake provider that injects 429s.
+
+Usage:
+    python benchmarks/bench_scheduler.py --sessions 8 --calls 5 --rpm 120 --rate-limit-ratio 0.2
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src"))
+
+from fake_llm import FakeProvider
+from scheduler import ModelCallScheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--calls", type=int, default=5, help="calls per session")
+    parser.add_argument("--rpm", type=float, default=120)
+    parser.add_argument("--tpm", type=float, default=1_000_000)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.2)
+    parser.add_argument("--max-concurrent", type=int, default=None)
+    args = parser.parse_args()
+
+    provider = FakeProvider(latency=args.latency, rate_limit_ratio=args.rate_limit_ratio,
+                            max_concurrent=args.max_concurrent)
+    scheduler = ModelCallScheduler({"fake": {"rpm": args.rpm, "tpm": args.tpm}}, sleep=lambda s: time.sleep(s / 10))
+
+    def session(session_id):
+        agent = scheduler.wrap(provider.agent(session_id), "fake", session_id, output_tokens=100)
+        finished = []
+        for call in range(args.calls):
+            try:
+                agent.run(f"question {call}")
+                finished.append(time.perf_counter())
+            except Exception as e:
+                print(f"{session_id}: {e}")
+        return finished
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.sessions) as executor:
+        completions = list(executor.map(session, [f"session-{i}" for i in range(args.sessions)]))
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "elapsed": round(elapsed, 3),
+        "provider_calls": provider.calls,
+        "provider_429s": provider.rate_limited,
+        "per_session_last_completion": [round(max(c) - started, 3) if c else None for c in completions],
+        "scheduler": scheduler.metrics()["fake"],
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
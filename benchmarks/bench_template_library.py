@@ -0,0 +1,179 @@
+"""Measure the template library: lazy load, selector speed, and end-to-end plan generation with and without it.
+
+Plan generation runs the real pipeline (prompt assembly, router, scheduler
+budgeting, streaming parse, validation) twice over the same profiles,
+against FakeLLM (benchmarks/fake_llm.py):
+
+- free_text: the profile-only prompt and free-text instructions (no
+  candidates, no JSON schema) the agents had before the library, budgeted
+  at the scheduler's DEFAULT_OUTPUT_TOKENS;
+- from_templates: the current prompts with candidate meals and exercises,
+  budgeted at plan_service.PLAN_OUTPUT_TOKENS.
+
+The fake model's time to first token grows with the prompt it is sent, and
+its plans are padded to `--free-text-tokens` / `--template-tokens`. Output
+sizes are not measured: they default to each variant's budget, so the
+reported `estimated_plan_latency_drop_pct` is an estimate for those sizes.
+Pass the `tokens_out_total` seen in the app's metrics for real plans of each
+kind to base it on actual outputs.
+
+Usage:
+    python benchmarks/bench_template_library.py --profiles 10000 --plans 8 --concurrency 4 --tokens-per-second 100
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from pathlib import Path
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+os.environ.setdefault("LOG_PATH", str(Path(tempfile.gettempdir()) / "bench_template_library.log"))
+
+import plan_service
+from chat_context import count_tokens
+from nutrition import nutrition_metrics
+from profile_model import (
+    ACTIVITY_LEVEL_OPTIONS, DIETARY_PREFERENCE_OPTIONS, FITNESS_GOAL_OPTIONS, HEALTH_CONDITION_OPTIONS, SEX_OPTIONS,
+)
+from scheduler import DEFAULT_OUTPUT_TOKENS, ModelCallScheduler
+from model_registry import GEMINI_MODEL_NAME, ModelRegistry
+from model_router import ModelRouter
+from plan_service import PLAN_OUTPUT_TOKENS, PLAN_SCHEMAS, generate_plans
+from plan_schema import schema_instruction
+from template_library import TemplateLibrary, render_exercise_candidates, render_meal_candidates
+from tracing import get_tracer
+from fake_llm import FakeLLM, build_fake_agent
+
+
+def random_profile(rng):
+    return {
+        "age": rng.randint(18, 80),
+        "weight": round(rng.uniform(45, 140), 1),
+        "height": round(rng.uniform(150, 200), 1),
+        "sex": rng.choice(SEX_OPTIONS),
+        "activity_level": rng.choice(ACTIVITY_LEVEL_OPTIONS),
+        "dietary_preferences": rng.choice(DIETARY_PREFERENCE_OPTIONS),
+        "fitness_goals": rng.choice(FITNESS_GOAL_OPTIONS),
+        "health_conditions": rng.sample(HEALTH_CONDITION_OPTIONS[1:], rng.choice([0, 1, 2])) or ["None"],
+        "time_available": rng.choice(range(15, 121, 15)),
+    }
+
+
+def free_text_agent(spec):
+    """`spec` as it was before the library: no candidate list to build from, no length limit, no JSON schema."""
+    schema_lines = {schema_instruction(schema) for schema in PLAN_SCHEMAS.values()}
+    instructions = [
+        line for line in spec["instructions"]
+        if "candidate" not in line and not line.startswith("Keep it concise") and line not in schema_lines
+    ]
+    return {**spec, "instructions": instructions}
+
+
+def measure_selection(profiles):
+    library = TemplateLibrary()
+    started = time.perf_counter()
+    library.get_version()
+    load_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candidate_tokens = []
+    for profile in profiles:
+        meals = library.select_meals(profile, nutrition_metrics(profile).target_calories)
+        exercises = library.select_exercises(profile)
+        candidate_tokens.append(
+            count_tokens(render_meal_candidates(meals)) + count_tokens(render_exercise_candidates(exercises))
+        )
+    select_seconds = time.perf_counter() - started
+    return {
+        "library_load_ms": round(load_seconds * 1000, 2),
+        "select_us_per_profile": round(select_seconds / len(profiles) * 1e6, 1),
+        "candidate_prompt_tokens_avg": round(sum(candidate_tokens) / len(candidate_tokens)),
+    }
+
+
+def measure_generation(profiles, args, plan_tokens):
+    """Generate plans for `profiles` through a fresh router; returns latency and token totals."""
+    model = FakeLLM(
+        args.model, ttft=args.ttft, tokens_per_second=args.tokens_per_second, plan_tokens=plan_tokens,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+    )
+    registry = ModelRegistry(model_factory=lambda model_id: model, agent_factory=build_fake_agent)
+    scheduler = ModelCallScheduler() if args.provider_limits else None
+    router = ModelRouter(registry, scheduler, fallbacks={}, coalesce=False)
+    tracer = get_tracer()
+    tracer.counters.clear()
+
+    def timed(index):
+        started = time.perf_counter()
+        result = generate_plans(profiles[index], args.model, router, session_id=f"bench-{index}")
+        if result.errors:
+            raise RuntimeError(f"plan {index} failed: {result.errors}")
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = sorted(executor.map(timed, range(len(profiles))))
+    elapsed = time.perf_counter() - started
+
+    tokens = {metric: value for (metric, _), value in tracer.counters.items()}
+    return {
+        "plan_seconds_p50": round(latencies[len(latencies) // 2], 3),
+        "plan_seconds_p95": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))], 3),
+        "plans_per_second": round(len(profiles) / elapsed, 3),
+        "tokens_in_per_plan": round(tokens.get("tokens_in_total", 0) / len(profiles)),
+        "tokens_out_per_plan": round(tokens.get("tokens_out_total", 0) / len(profiles)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=10_000, help="profiles for the selector timing")
+    parser.add_argument("--plans", type=int, default=8, help="plans generated per variant")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--model", default=GEMINI_MODEL_NAME)
+    parser.add_argument("--ttft", type=float, default=0.3, help="fake model base time to first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=100, help="fake model decode rate")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000, help="fake model prompt rate")
+    parser.add_argument("--free-text-tokens", type=int, default=DEFAULT_OUTPUT_TOKENS, help="free-text plan size")
+    parser.add_argument("--template-tokens", type=int, default=PLAN_OUTPUT_TOKENS, help="template plan size")
+    parser.add_argument("--provider-limits", action="store_true",
+                        help="put the app's per-provider rate limits in front of the fake model (slow)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    profiles = [random_profile(rng) for _ in range(max(args.profiles, args.plans))]
+    get_tracer().enabled = True  # token counts come from the router's tracer
+
+    # Both agents got the bare profile before the library
+    free_text_prompts = lambda user_data: dict.fromkeys(
+        ("dietary", "fitness"), plan_service.build_user_profile(user_data)
+    )
+    with mock.patch.multiple(
+        plan_service, build_agent_prompts=free_text_prompts, PLAN_OUTPUT_TOKENS=DEFAULT_OUTPUT_TOKENS,
+        DIETARY_AGENT=free_text_agent(plan_service.DIETARY_AGENT),
+        FITNESS_AGENT=free_text_agent(plan_service.FITNESS_AGENT),
+    ):
+        free_text = measure_generation(profiles[:args.plans], args, args.free_text_tokens)
+    from_templates = measure_generation(profiles[:args.plans], args, args.template_tokens)
+
+    print(json.dumps({
+        "profiles": args.profiles,
+        **measure_selection(profiles[:args.profiles]),
+        "generation": {"free_text": free_text, "from_templates": from_templates},
+        # Output sizes are the given token counts, not measured ones
+        "assumed_output_tokens": {"free_text": args.free_text_tokens, "from_templates": args.template_tokens},
+        "estimated_plan_latency_drop_pct": round(
+            (1 - from_templates["plan_seconds_p50"] / free_text["plan_seconds_p50"]) * 100, 1
+        ),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
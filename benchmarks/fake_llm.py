@@ -0,0 +1,193 @@
+"""Deterministic local stand-ins for the Gemini/Groq agents used by the benchmarks."""
+import json
+import time
+import random
+import threading
+from types import SimpleNamespace
+
+FILLER_WORDS = ["Keep", "going", "with", "your", "plan", "and", "stay", "consistent", "today"]
+
+
+class FakeRateLimitError(Exception):
+    """Mimics the 429 errors raised by the provider SDKs."""
+
+    status_code = 429
+
+
+class FakeAgent:
+    """Agent look-alike whose `run` sleeps for a fixed latency and returns canned text."""
+
+    def __init__(self, name, latency=1.0, content=None):
+        self.name = name
+        self.latency = latency
+        self.content = content or f"{name} response"
+        self.calls = 0
+
+    def run(self, message, **kwargs):
+        self.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(content=self.content)
+
+
+class FakeProvider:
+    """Shared fake provider that injects latency jitter and 429s.
+
+    A call fails with FakeRateLimitError with probability `rate_limit_ratio`,
+    or whenever more than `max_concurrent` calls are in flight at once.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, rate_limit_ratio=0.0, max_concurrent=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_ratio = rate_limit_ratio
+        self.max_concurrent = max_concurrent
+        self.calls = 0
+        self.rate_limited = 0
+        self._in_flight = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def agent(self, name="fake"):
+        return FakeProviderAgent(self, name)
+
+    def complete(self, name, message):
+        with self._lock:
+            self.calls += 1
+            self._in_flight += 1
+            overloaded = self.max_concurrent is not None and self._in_flight > self.max_concurrent
+            limited = overloaded or self._random.random() < self.rate_limit_ratio
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        try:
+            if limited:
+                with self._lock:
+                    self.rate_limited += 1
+                raise FakeRateLimitError("429 Too Many Requests")
+            time.sleep(delay)
+            return SimpleNamespace(content=f"{name}: answer to {str(message)[:40]}")
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+
+class FakeProviderAgent:
+    def __init__(self, provider, name):
+        self.provider = provider
+        self.name = name
+
+    def run(self, message, **kwargs):
+        return self.provider.complete(self.name, message)
+
+
+class FakeProviderError(Exception):
+    """Mimics a provider 5xx."""
+
+    status_code = 503
+
+
+class FakeLLM:
+    """Stand-in model client with a fixed time to first token, a decode rate and error injection.
+
+    Answers are deterministic: whether a call fails, and the text it returns,
+    depend only on `seed`, the model id and the prompt. Plan agents (whose
+    instructions ask for a JSON schema) get schema-valid plans, padded to
+    about `plan_tokens` tokens when given; plan agents without a schema get
+    free text of about `plan_tokens` tokens when it is given. Everything else
+    gets a chat answer of `answer_tokens` tokens. With `prefill_tokens_per_second`, the time to
+    first token also grows with the prompt and instructions.
+    """
+
+    def __init__(self, model_id, ttft=0.3, tokens_per_second=80, answer_tokens=120, error_rate=0.0, seed=0,
+                 plan_tokens=None, prefill_tokens_per_second=None):
+        self.model_id = model_id
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.plan_tokens = plan_tokens
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def complete(self, name, instructions, message, stream=False):
+        rng = random.Random(f"{self.seed}:{self.model_id}:{name}:{message}")
+        with self._lock:
+            self.calls += 1
+            failed = rng.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        text = self._answer(name, instructions, message, rng)
+        pieces = [text[i:i + 16] for i in range(0, len(text), 16)]  # ~4 tokens per piece
+        piece_delay = 4 / self.tokens_per_second
+        ttft = self.ttft
+        if self.prefill_tokens_per_second:
+            prompt_chars = len(message) + sum(len(line) for line in instructions)
+            ttft += prompt_chars / 4 / self.prefill_tokens_per_second
+
+        if not stream:
+            time.sleep(ttft + piece_delay * len(pieces))
+            if failed:
+                raise FakeProviderError(f"{self.model_id}: 503 Service Unavailable")
+            return SimpleNamespace(content=text)
+
+        def chunks():
+            time.sleep(ttft)
+            if failed:
+                raise FakeProviderError(f"{self.model_id}: 503 Service Unavailable")
+            for piece in pieces:
+                yield SimpleNamespace(content=piece)
+                time.sleep(piece_delay)
+        return chunks()
+
+    def _answer(self, name, instructions, message, rng):
+        if any("JSON schema" in line for line in instructions):
+            if "Dietary" in name:
+                return self._plan({
+                    "why_this_plan_works": "Balanced macros around the calorie target.",
+                    "meals": [
+                        {"slot": slot, "name": f"{slot.title()} option {rng.randint(1, 9)}", "portion": "1 plate",
+                         "calories": rng.randint(300, 700), "notes": "From the candidate list."}
+                        for slot in ("breakfast", "lunch", "dinner", "snack")
+                    ],
+                    "important_considerations": ["Drink plenty of water", "Adjust portions to hunger"],
+                }, "meals", rng)
+            return self._plan({
+                "goals": "Build strength and endurance within the time available.",
+                "routine": [
+                    {"phase": phase, "name": f"{phase.title()} exercise {i + 1}", "prescription": "3 x 10",
+                     "notes": "Controlled tempo."}
+                    for phase in ("warm-up", "main", "cool-down") for i in range(2)
+                ],
+                "tips": ["Rest 60-90s between sets", "Track your progress"],
+            }, "routine", rng)
+        if self.plan_tokens and ("Dietary" in name or "Fitness" in name):
+            # A free-text plan, as agents wrote before they were asked for JSON
+            return " ".join(rng.choice(FILLER_WORDS) for _ in range(self.plan_tokens * 4 // 6))  # ~6 chars per word
+        return " ".join(rng.choice(FILLER_WORDS) for _ in range(self.answer_tokens))
+
+    def _plan(self, plan, items_key, rng):
+        """Serialize `plan`, first lengthening its items' notes to reach about `plan_tokens` tokens."""
+        if self.plan_tokens:
+            missing_words = max(0, self.plan_tokens * 4 - len(json.dumps(plan))) // 6  # ~6 chars per word
+            items = plan[items_key]
+            for item in items:
+                item["notes"] += " " + " ".join(rng.choice(FILLER_WORDS) for _ in range(missing_words // len(items)))
+        return json.dumps(plan)
+
+
+class FakeLLMAgent:
+    """Agent look-alike around a FakeLLM, built by `build_fake_agent`."""
+
+    def __init__(self, model, name, instructions):
+        self.model = model
+        self.name = name
+        self.instructions = list(instructions)
+
+    def run(self, message, stream=False, **kwargs):
+        return self.model.complete(self.name, self.instructions, message, stream=stream)
+
+
+def build_fake_agent(model, name, role, instructions, markdown=False):
+    """`ModelRegistry` agent factory for FakeLLM clients."""
+    return FakeLLMAgent(model, name, instructions)
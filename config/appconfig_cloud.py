@@ -1,20 +1,14 @@
-import sys
 import logging
+import threading
 from pathlib import Path
-import tomli
+
+from config.logging_config import configure_logging
 
 project_root = Path(__file__).resolve().parent.parent
 secrets_path = project_root / ".streamlit/secrets.toml"
 
 # Initialize logger first to capture configuration errors
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(project_root / 'config/logs/config.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Configuration variables that will be exported
@@ -23,31 +17,60 @@ CONFIG = {
     'GROQ_API_KEY': None,
 }
 
-try:
-    # Load and validate configuration
-    with open(secrets_path, "rb") as f:
-        secrets = tomli.load(f)
-    
-    # Map configuration values
-    CONFIG.update({
-            'GOOGLE_API_KEY': secrets['GOOGLE']['API_KEY'],
-            'GROQ_API_KEY': secrets['GROQ']['API_KEY'],
-    })
-
-    # Secure logging
-    for key, value in CONFIG.items():
-        hidden = f"{value[:2]}****{value[-2:]}" if value and len(value) > 4 else "****"
-        logger.info(f"Loaded {key}: {hidden}")
-
-except Exception as e:
-    logger.critical(f"Configuration failed: {str(e)}")
-    sys.exit(1)
-
-# Export specific variables
-GOOGLE_API_KEY = CONFIG['GOOGLE_API_KEY']
-GROQ_API_KEY = CONFIG['GROQ_API_KEY']
+_loaded = False
+_lock = threading.Lock()
+
+
+class ConfigError(RuntimeError):
+    """Raised when the secrets file is missing or incomplete."""
+
+
+def load_config():
+    """Read the secrets file once, on first access to an exported key.
+
+    Raises ConfigError on failure. This runs on whichever thread first needs
+    a key (often a model worker), so the error is raised to that caller
+    rather than exiting the process.
+    """
+    global _loaded
+    if _loaded:
+        return CONFIG
+    with _lock:
+        if _loaded:
+            return CONFIG
+        try:
+            import tomli
+
+            # Load and validate configuration
+            with open(secrets_path, "rb") as f:
+                secrets = tomli.load(f)
+
+            # Map configuration values
+            CONFIG.update({
+                    'GOOGLE_API_KEY': secrets['GOOGLE']['API_KEY'],
+                    'GROQ_API_KEY': secrets['GROQ']['API_KEY'],
+            })
+
+            # Secure logging
+            for key, value in CONFIG.items():
+                hidden = f"{value[:2]}****{value[-2:]}" if value and len(value) > 4 else "****"
+                logger.info(f"Loaded {key}: {hidden}")
+
+        except Exception as e:
+            logger.critical(f"Configuration failed: {str(e)}")
+            raise ConfigError(f"Configuration failed: {str(e)}") from e
+        _loaded = True
+    return CONFIG
+
+
+def __getattr__(name):
+    # Export specific variables; the secrets file is parsed the first time one is read
+    if name in __all__:
+        return load_config()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     'GOOGLE_API_KEY',
     'GROQ_API_KEY'
-]
\ No newline at end of file
+]
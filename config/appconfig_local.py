@@ -5,19 +5,11 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
-project_root = Path(__file__).resolve().parent.parent
-
-from qdrant_client import QdrantClient
+from config.logging_config import configure_logging
 
+project_root = Path(__file__).resolve().parent.parent
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(Path(__file__).resolve().parent.parent / 'config/logs/config.log'),
-        logging.StreamHandler()
-    ]
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 try:
@@ -0,0 +1,210 @@
+import os
+import re
+import copy
+import json
+import time
+import queue
+import atexit
+import hashlib
+import logging
+import threading
+import itertools
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+
+project_root = Path(__file__).resolve().parent.parent
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+LOG_PATH = Path(os.getenv("LOG_PATH", project_root / "config/logs/config.log"))
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # "json" or "text"
+LOG_ROTATION = os.getenv("LOG_ROTATION", "size")  # "size" or "time"
+LOG_MAX_BYTES = 5 * 1024 * 1024  # size rotation: bytes per file
+LOG_ROTATE_WHEN = "midnight"  # time rotation: TimedRotatingFileHandler interval
+LOG_BACKUP_COUNT = 5
+LOG_QUEUE_SIZE = 10000  # records buffered for the writer thread; beyond this they are dropped
+# Share of records logged with `extra=SAMPLED` (per-rerun noise) that are kept
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.05"))
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Pass as `extra=` on per-rerun messages so only a sample of them is written
+SAMPLED = {"sampled": True}
+
+CONTEXT_FIELDS = ("session_id", "user_id", "request_id")
+_context = contextvars.ContextVar("log_context", default={})
+
+REDACTIONS = [
+    (re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+"), "<email>"),
+    (re.compile(r"\b(?:sk|gsk|AIza)[\w-]{16,}\b"), "<api-key>"),
+    (re.compile(r"(?<![\w.])(?:\+\d{1,3}[\s-]?)?\(?\d{3}\)?[\s-]?\d{3}[\s-]?\d{4}\b"), "<phone>"),
+]
+
+
+#--------------------------------------
+# Record context, sampling and redaction
+#--------------------------------------
+def set_log_context(**fields):
+    """Attach ids (session_id, user_id, request_id) to records logged from the current context; None clears one."""
+    _context.set({**_context.get(), **fields})
+
+
+@contextmanager
+def log_context(**fields):
+    """Attach ids to records logged inside the block."""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def redact(text):
+    """Mask emails, phone numbers and API keys in `text`."""
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def redact_prompt(prompt):
+    """Stand-in for user-written text in logs: its length and a short hash, never the content."""
+    prompt = prompt or ""
+    return f"<prompt {len(prompt)} chars {hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8]}>"
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the logging context; runs in the caller's thread, before the queue."""
+
+    def filter(self, record):
+        context = _context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps one in every 1/rate records marked `sampled`, counted per message template."""
+
+    def __init__(self, rate=LOG_SAMPLE_RATE):
+        super().__init__()
+        self.every = max(1, round(1 / rate)) if rate > 0 else None
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "sampled", False) or record.levelno > logging.INFO:
+            return True
+        if self.every is None:
+            return False
+        with self._lock:
+            counter = self._counters.setdefault((record.name, record.msg), itertools.count())
+            return next(counter) % self.every == 0
+
+
+class RedactingQueueHandler(QueueHandler):
+    """QueueHandler that renders and redacts the message before it leaves the caller's thread.
+
+    Never blocks the caller: when the writer falls behind and the queue is
+    full, records are dropped and counted.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = redact(record.getMessage())
+        record.args = None
+        if record.exc_info:
+            record.exc_text = redact(logging.Formatter().formatException(record.exc_info))
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with the record's context ids."""
+
+    def format(self, record):
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            if getattr(record, field, None) is not None:
+                payload[field] = getattr(record, field)
+        if record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+#--------------------------------------
+# Process-wide setup
+#--------------------------------------
+_listener = None
+_lock = threading.Lock()
+
+
+def configure_logging(path=LOG_PATH, level=LOG_LEVEL, fmt=LOG_FORMAT, rotation=LOG_ROTATION, console=True):
+    """Route every log record through a queue to a rotating file (and the console), once per process.
+
+    Callers only pay for putting the record on the queue; a listener thread
+    does the formatting and writing. `path=None` logs to the console only.
+    Later calls (e.g. every Streamlit rerun) are no-ops.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return
+        handlers = []
+        if path is not None:
+            path = Path(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            if rotation == "time":
+                file_handler = TimedRotatingFileHandler(path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT,
+                                                        encoding="utf-8")
+            else:
+                file_handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                                   encoding="utf-8")
+            file_handler.setFormatter(JSONFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+            handlers.append(file_handler)
+        if console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+            handlers.append(console_handler)
+
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        queue_handler = RedactingQueueHandler(log_queue)
+        queue_handler.addFilter(ContextFilter())
+        queue_handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
@@ -0,0 +1,232 @@
+"""Generate plans for many member profiles without the Streamlit UI.
+
+Reads profiles from a JSONL or CSV file (one profile per line/row, with the
+same fields as the app's profile form plus an optional `id`), generates the
+dietary and fitness plans with bounded concurrency and per-provider request
+limits, and appends one JSON line per profile to the output file as soon as it
+is done. Completed ids are recorded in a checkpoint file so an interrupted run
+can be restarted and will skip them.
+
+Usage:
+    python src/batch_plans.py profiles.jsonl --output plans.jsonl --concurrency 8
+    python src/batch_plans.py profiles.csv --output plans.jsonl --model llama-3.3-70b-versatile \\
+        --rpm groq=30 --cache data/plan_cache.db
+"""
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import threading
+from pathlib import Path
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(str(Path(__file__).parent.parent.resolve()))
+
+from config.logging_config import configure_logging
+from plan_service import generate_plans
+from plan_cache import create_plan_cache
+from nutrition import nutrition_metrics_many
+from model_registry import GEMINI_MODEL_NAME, ModelRegistry
+from model_router import ModelRouter
+from scheduler import DEFAULT_PROVIDER_LIMITS, ModelCallScheduler
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+DEFAULT_CONCURRENCY = 4
+INT_FIELDS = ("age", "time_available")
+FLOAT_FIELDS = ("weight", "height")
+METRICS_CHUNK_SIZE = 256  # profiles whose nutrition metrics are computed in one vectorised pass
+
+
+#--------------------------------------
+# Input
+#--------------------------------------
+def normalize_record(record):
+    """Coerce a raw JSONL/CSV record into the profile shape the app produces."""
+    user_data = {key: value for key, value in record.items() if key not in ("id", "model")}
+    for key in INT_FIELDS:
+        user_data[key] = int(float(user_data[key]))
+    for key in FLOAT_FIELDS:
+        user_data[key] = float(user_data[key])
+    conditions = user_data.get("health_conditions") or ["None"]
+    if isinstance(conditions, str):
+        conditions = [c.strip() for c in conditions.replace("|", ";").split(";") if c.strip()]
+    user_data["health_conditions"] = conditions
+    return user_data
+
+
+def read_profiles(path):
+    """Yield `(record_id, model_id_or_None, user_data, error)` for each profile in a JSONL or CSV file.
+
+    A record that can't be parsed or normalized comes back with `user_data`
+    None and the reason in `error`, so one bad row doesn't stop the batch.
+    """
+    path = Path(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            rows = enumerate(csv.DictReader(f), start=1)
+        else:
+            rows = ((number, line) for number, line in enumerate(f, start=1) if line.strip())
+        for number, row in rows:
+            record_id, model_id, user_data, error = f"row-{number}", None, None, None
+            try:
+                record = json.loads(row) if isinstance(row, str) else row
+                if not isinstance(record, dict):
+                    raise TypeError("expected a JSON object")
+                record_id = str(record.get("id") or record_id)
+                model_id = record.get("model") or None
+                user_data = normalize_record(record)
+            except KeyError as e:
+                error = f"invalid profile: missing field {e}"
+            except (ValueError, TypeError) as e:
+                error = f"invalid profile: {str(e)}"
+            yield record_id, model_id, user_data, error
+
+
+def chunked(items, size):
+    """Yield lists of up to `size` consecutive items."""
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def load_checkpoint(path):
+    if not path.exists():
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+#--------------------------------------
+# Scheduling
+#--------------------------------------
+def parse_limits(rpm_values, tpm_values):
+    """Provider limits from repeated PROVIDER=N options, on top of the scheduler defaults."""
+    limits = {provider: dict(limit) for provider, limit in DEFAULT_PROVIDER_LIMITS.items()}
+    for key, values in (("rpm", rpm_values), ("tpm", tpm_values)):
+        for value in values or []:
+            provider, _, limit = value.partition("=")
+            limits.setdefault(provider.strip(), dict(DEFAULT_PROVIDER_LIMITS["google"]))[key] = float(limit)
+    return limits
+
+
+#--------------------------------------
+# Batch run
+#--------------------------------------
+def run_batch(args):
+    output_path = Path(args.output)
+    checkpoint_path = Path(args.checkpoint or f"{args.output}.checkpoint")
+    done = load_checkpoint(checkpoint_path) if not args.restart else set()
+    if args.restart:
+        checkpoint_path.unlink(missing_ok=True)
+
+    registry = ModelRegistry()
+    cache = create_plan_cache("sqlite", path=args.cache) if args.cache else None
+    # Provider quotas, retries and circuit breaking are handled by the same scheduler the app uses
+    scheduler = ModelCallScheduler(parse_limits(args.rpm, args.tpm))
+    router = ModelRouter(registry, scheduler, fallbacks={} if args.no_failover else None, hedge=args.hedge)
+    write_lock = threading.Lock()
+    counts = {"succeeded": 0, "failed": 0, "skipped": 0, "cached": 0}
+
+    def write(line, status, result, output, checkpoint):
+        with write_lock:
+            output.write(json.dumps(line) + "\n")
+            output.flush()
+            # Only fully successful profiles are checkpointed so failures are retried on resume
+            if status == "succeeded":
+                checkpoint.write(line["id"] + "\n")
+                checkpoint.flush()
+            counts[status] += 1
+            if result is not None and result.cached:
+                counts["cached"] += 1
+
+    def process(record_id, model_id, user_data, metrics, output, checkpoint):
+        model_id = model_id or args.model
+        started = time.perf_counter()
+        try:
+            result = generate_plans(user_data, model_id, router, cache=cache, timeout=args.timeout,
+                                    session_id="batch")
+            line = {
+                "id": record_id,
+                "model": model_id,
+                "metrics": metrics.to_dict(),
+                "dietary_plan": result.dietary_plan,
+                "fitness_plan": result.fitness_plan,
+                "errors": {key: str(error) for key, error in result.errors.items()},
+                "cached": result.cached,
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            status = "failed" if result.errors else "succeeded"
+        except Exception as e:
+            logger.error(f"Profile {record_id} failed: {str(e)}")
+            line = {"id": record_id, "model": model_id, "error": str(e)}
+            status, result = "failed", None
+        write(line, status, result, output, checkpoint)
+
+    started = time.perf_counter()
+    # A restart starts the output over too, so it doesn't repeat lines from the abandoned run
+    with open(output_path, "w" if args.restart else "a", encoding="utf-8") as output, \
+            open(checkpoint_path, "a", encoding="utf-8") as checkpoint, \
+            ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="batch") as executor:
+        # Keep only a bounded number of profiles in flight so huge inputs are streamed, not loaded
+        in_flight = threading.BoundedSemaphore(args.concurrency * 2)
+        for chunk in chunked(read_profiles(args.input), METRICS_CHUNK_SIZE):
+            pending = []
+            for record_id, model_id, user_data, error in chunk:
+                if record_id in done:
+                    counts["skipped"] += 1
+                    continue
+                if error is not None:
+                    logger.error(f"Profile {record_id} skipped: {error}")
+                    write({"id": record_id, "model": model_id or args.model, "error": error}, "failed", None,
+                          output, checkpoint)
+                    continue
+                pending.append((record_id, model_id, user_data))
+
+            metrics = nutrition_metrics_many([user_data for _, _, user_data in pending])
+            for (record_id, model_id, user_data), profile_metrics in zip(pending, metrics):
+                in_flight.acquire()
+                future = executor.submit(process, record_id, model_id, user_data, profile_metrics, output, checkpoint)
+                future.add_done_callback(lambda _: in_flight.release())
+
+    elapsed = time.perf_counter() - started
+    for provider, metrics in scheduler.metrics().items():
+        if metrics["admitted"]:
+            logger.info(f"{provider}: {metrics['admitted']} calls, {metrics['retries']} retries, "
+                        f"wait p95 {metrics['wait_p95']:.1f}s")
+    logger.info(f"Batch finished in {elapsed:.1f}s: {counts['succeeded']} succeeded, {counts['failed']} failed, "
+                f"{counts['skipped']} skipped from checkpoint, {counts['cached']} served from cache")
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate health and fitness plans for a file of profiles.")
+    parser.add_argument("input", help="JSONL or CSV file of profiles")
+    parser.add_argument("--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--model", default=GEMINI_MODEL_NAME, help="model id used when a record has no 'model'")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="profiles generated at once")
+    parser.add_argument("--rpm", action="append", metavar="PROVIDER=N",
+                        help="requests per minute for a provider (google, groq); repeatable")
+    parser.add_argument("--tpm", action="append", metavar="PROVIDER=N",
+                        help="tokens per minute for a provider; repeatable")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per agent call")
+    parser.add_argument("--no-failover", action="store_true", help="don't retry failed profiles on the other model")
+    parser.add_argument("--hedge", action="store_true", help="duplicate slow requests to the other model")
+    parser.add_argument("--checkpoint", help="checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="ignore and reset an existing checkpoint and output")
+    parser.add_argument("--cache", help="SQLite plan cache to reuse between runs")
+    args = parser.parse_args(argv)
+
+    configure_logging(path=None)
+    counts = run_batch(args)
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import math
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+CHARS_PER_TOKEN = 4  # conservative estimate for English text on Gemini/Llama tokenizers
+DEFAULT_WINDOW_TURNS = 6  # most recent messages sent verbatim
+DEFAULT_REPLY_RESERVE = 1024  # tokens kept free for the model's answer
+PLAN_SHARE = 0.5  # fraction of the prompt budget the plans may use
+SUMMARY_SHARE = 0.15  # fraction of the prompt budget the rolling summary may use
+SUMMARY_LINE_CHARS = 160  # longest line kept per summarized message
+
+
+def count_tokens(text):
+    """Cheap token estimate; good enough for budgeting, not for billing."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut `text` so it fits in `max_tokens`, marking the cut."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    max_chars = max(0, max_tokens * CHARS_PER_TOKEN - 3)
+    return text[:max_chars].rstrip() + "..."
+
+
+#--------------------------------------
+# Rolling summary
+#--------------------------------------
+class RollingSummary:
+    """Compact, incrementally maintained digest of the turns that left the window.
+
+    Each aged-out message becomes one short line; only new messages are
+    processed on each turn, and the oldest lines are dropped once `max_lines`
+    is reached. No model call is involved. Messages are recognized by their
+    increasing `id`, so the history passed in may be a window whose oldest
+    messages have already been dropped.
+    """
+
+    def __init__(self, max_lines=40):
+        self.lines = deque(maxlen=max_lines)
+        self.last_id = None  # id of the newest message already folded in
+
+    def update(self, older_messages):
+        if older_messages and self.last_id is not None and older_messages[-1]["id"] < self.last_id:
+            # History was cleared or replaced; start over
+            self.lines.clear()
+            self.last_id = None
+        for message in older_messages:
+            if self.last_id is not None and message["id"] <= self.last_id:
+                continue
+            speaker = "User" if message["role"] == "user" else "Assistant"
+            text = " ".join(message["content"].split())
+            first_sentence = text.split(". ")[0]
+            if len(first_sentence) > SUMMARY_LINE_CHARS:
+                first_sentence = first_sentence[:SUMMARY_LINE_CHARS - 3].rstrip() + "..."
+            self.lines.append(f"- {speaker}: {first_sentence}")
+            self.last_id = message["id"]
+
+    def render(self, max_tokens):
+        """Return the newest summary lines that fit in `max_tokens`."""
+        kept, used = [], 0
+        for line in reversed(self.lines):
+            cost = count_tokens(line) + 1
+            if used + cost > max_tokens:
+                break
+            kept.append(line)
+            used += cost
+        return "\n".join(reversed(kept))
+
+
+#--------------------------------------
+# Context builder
+#--------------------------------------
+@dataclass
+class ChatContext:
+    prompt: str
+    messages: list
+    tokens: dict = field(default_factory=dict)
+
+
+class ChatContextBuilder:
+    """Assemble a chat request that fits a per-model token budget.
+
+    The request is the user's question plus the plans (truncated to their
+    share) and a rolling summary of older turns, sent as the prompt, with the
+    most recent turns passed as structured messages.
+    """
+
+    def __init__(self, token_budget, window_turns=DEFAULT_WINDOW_TURNS, reply_reserve=DEFAULT_REPLY_RESERVE):
+        self.token_budget = token_budget
+        self.window_turns = window_turns
+        self.reply_reserve = reply_reserve
+
+    def build(self, question, plan_context, history, summary):
+        """Build the request for `question` given the prior `history` (oldest first)."""
+        available = self.token_budget - self.reply_reserve
+        question = truncate_to_tokens(question, available // 4)
+        question_tokens = count_tokens(question)
+
+        plans = truncate_to_tokens(plan_context, int(available * PLAN_SHARE))
+        plan_tokens = count_tokens(plans)
+
+        # Fill the window with the newest turns that still fit
+        remaining = available - question_tokens - plan_tokens - int(available * SUMMARY_SHARE)
+        window, history_tokens = [], 0
+        for message in reversed(history[-self.window_turns:]):
+            cost = count_tokens(message["content"]) + 4  # per-message framing overhead
+            if history_tokens + cost > remaining:
+                break
+            window.append({"role": message["role"], "content": message["content"]})
+            history_tokens += cost
+        window.reverse()
+
+        # Everything older than the window is folded into the rolling summary
+        summary.update(history[:len(history) - len(window)])
+        summary_text = summary.render(int(available * SUMMARY_SHARE))
+        summary_tokens = count_tokens(summary_text)
+
+        sections = [plans]
+        if summary_text:
+            sections.append(f"Summary of earlier conversation:\n{summary_text}")
+        sections.append(f"User Question: {question}")
+        prompt = "\n\n".join(section for section in sections if section)
+
+        tokens = {
+            "plans": plan_tokens,
+            "summary": summary_tokens,
+            "history": history_tokens,
+            "question": question_tokens,
+            "total": count_tokens(prompt) + history_tokens,
+            "budget": self.token_budget,
+        }
+        logger.info(f"Chat context uses {tokens['total']}/{self.token_budget} tokens "
+                    f"({len(window)} recent messages, {len(summary.lines)} summarized)")
+        return ChatContext(prompt=prompt, messages=window, tokens=tokens)
@@ -0,0 +1,93 @@
+import sys
+import time
+import logging
+import builtins
+import threading
+import importlib.util
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+REPORT_TOP_MODULES = 15
+
+
+class ImportProfiler:
+    """Records how long each first-time module import takes.
+
+    Wraps `builtins.__import__` and times every import of a module that isn't
+    loaded yet. `cumulative` includes the module's own imports, `self` does
+    not. Lazily loaded modules are recorded whenever they happen, so reports
+    also show what a first model call or dashboard view pulled in.
+    """
+
+    def __init__(self):
+        self.timings = {}  # module -> [cumulative seconds, self seconds]
+        self._reported = set()
+        self._original_import = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self):
+        if self._original_import is not None:
+            return
+        self._original_import = builtins.__import__
+        builtins.__import__ = self._import
+
+    def uninstall(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def _import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        original = self._original_import
+        try:
+            package = (globals or {}).get("__package__")
+            resolved = importlib.util.resolve_name("." * level + name, package) if level else name
+        except (ImportError, ValueError):
+            resolved = name
+        if resolved in sys.modules:
+            return original(name, globals, locals, fromlist, level)
+
+        # Children subtract their time from the enclosing import's self time
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)
+        started = time.perf_counter()
+        try:
+            return original(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - started
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                timing = self.timings.setdefault(resolved, [0.0, 0.0])
+                timing[0] += elapsed
+                timing[1] += elapsed - children
+
+    def report(self, top=REPORT_TOP_MODULES, new_only=True):
+        """Log the slowest imports (only those not reported before, if `new_only`); returns them."""
+        with self._lock:
+            timings = {m: t for m, t in self.timings.items() if not (new_only and m in self._reported)}
+            self._reported.update(timings)
+        if not timings:
+            return []
+
+        total = sum(self_time for _, self_time in timings.values())
+        slowest = sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:top]
+        lines = [f"{cumulative * 1000:9.1f}ms {self_time * 1000:9.1f}ms  {module}"
+                 for module, (cumulative, self_time) in slowest]
+        logger.info(f"Imported {len(timings)} modules in {total * 1000:.1f}ms; slowest (cumulative, self):\n"
+                    + "\n".join(lines))
+        return slowest
+
+
+_profiler = ImportProfiler()
+
+
+def get_profiler():
+    """Return the process-wide import profiler (installed by the caller when profiling is enabled)."""
+    return _profiler
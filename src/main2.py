@@ -1,38 +1,86 @@
 import os
 import sys
+import time
+import copy
+import uuid
+import threading
 from pathlib import Path
 
-import streamlit as st
-from agno.agent import Agent
-from agno.models.google.gemini import Gemini
-from agno.models.groq.groq import Groq
-
-# Configure logging
-import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('config/logs/config.log'),
-        logging.StreamHandler()
-    ]
-)
-logger = logging.getLogger(__name__)
+# STARTUP_PROFILE=true logs how long each module takes to import, including lazily loaded ones
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+if STARTUP_PROFILE:
+    from import_profiler import get_profiler
+    get_profiler().install()
 
+import streamlit as st
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 sys.path.append(str(Path(__file__).parent.parent.resolve()))
 
-from config.appconfig_cloud import (
-    GROQ_API_KEY,
-    GOOGLE_API_KEY,
+# Configure logging (queued, rotating, JSON; set up once per process, not per rerun)
+import logging
+from config.logging_config import SAMPLED, configure_logging, log_context, redact_prompt, set_log_context
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# plan_jobs (pydantic), nutrition and profile_analytics (NumPy) and the model provider SDKs
+# are imported where first used, so the profile form paints without loading them
+from plan_cache import create_plan_cache
+from storage import AGE_BANDS, create_store
+from profile_model import (
+    ACTIVITY_LEVEL_OPTIONS, DIETARY_PREFERENCE_OPTIONS, FITNESS_GOAL_OPTIONS, HEALTH_CONDITION_OPTIONS, SEX_OPTIONS,
 )
+from model_registry import GEMINI_MODEL_NAME, GROQ_MODEL_NAME, ModelRegistry, create_model
+from model_router import ModelRouter
+from scheduler import ModelCallScheduler
+from chat_context import ChatContextBuilder, RollingSummary
+from plan_retrieval import PlanIndex
+from plan_render import load_styles, plan_card
+from tracing import configure_tracing, get_tracer, traced
 
 #-----------------------------------------------------
 # Configs
 #-----------------------------------------------------
-GEMINI_MODEL_NAME = "gemini-2.5-pro-exp-03-25"
-GROQ_MODEL_NAME = "llama-3.3-70b-versatile"
+PLAN_AGENT_TIMEOUT = 120  # seconds per agent during plan generation
+STREAM_FLUSH_CHARS = 48  # flush streamed text to the UI once this many characters are buffered
+STREAM_FLUSH_INTERVAL = 0.08  # ...or once this many seconds have passed since the last flush
+PLAN_CACHE_BACKEND = os.getenv("PLAN_CACHE_BACKEND", "sqlite")  # "sqlite" or "memory"
+PLAN_CACHE_PATH = Path(__file__).parent.parent.resolve() / "data" / "plan_cache.db"
+PLAN_CACHE_TTL = 7 * 24 * 3600  # seconds
+STORE_BACKEND = os.getenv("STORE_BACKEND", "sqlite")  # "sqlite" or "memory"
+STORE_PATH = Path(__file__).parent.parent.resolve() / "data" / "app.db"
+STORE_MAX_PROFILES = int(os.getenv("STORE_MAX_PROFILES", "500000"))  # least recently used profiles evicted past this
+STORE_MAX_MESSAGES_PER_USER = 500
+PROFILES_PAGE_SIZE = 20  # profiles rendered per page of the profile browser
+DASHBOARD_CACHE_TTL = 30  # seconds the admin dashboard reuses an aggregate summary
+# Prompt token budget per model for chat requests (context window minus headroom)
+CHAT_TOKEN_BUDGETS = {
+    GEMINI_MODEL_NAME: 32000,
+    GROQ_MODEL_NAME: 8000,
+}
+PLAN_CONTEXT_SECTIONS = 4  # plan sections retrieved per chat question
+CHAT_OUTPUT_TOKENS = 800  # expected chat answer size charged against provider token quotas
+CHAT_TAIL_MESSAGES = 20  # newest messages held in the session and drawn per chat turn
+CHAT_PAGE_SIZE = 20  # older messages read back from the store per "Load earlier messages"
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "false").lower() == "true"  # duplicate slow requests to the other model
+ROUTER_FAILOVER_TIMEOUT = 60  # seconds before a silent model is failed over
+PLAN_JOB_WORKERS = 4  # plan generations running in the background at once
+PLAN_JOB_POLL_INTERVAL = 1.0  # seconds between progress refreshes while a plan job runs
+LATENCY_PANEL_REFRESH = 5.0  # seconds between refreshes of the admin latency panel
+
+CHAT_AGENT_INSTRUCTIONS = [
+    "Answer questions about the user's dietary and fitness plans.",
+    "Provide helpful, actionable advice.",
+    "Be friendly and encouraging.",
+    "If asked about something not in the plans, make reasonable recommendations based on their profile."
+]
+
+CHAT_AGENT = {
+    "name": "Health & Fitness Assistant",
+    "role": "Provides personalized health and fitness advice",
+    "instructions": CHAT_AGENT_INSTRUCTIONS,
+    "markdown": True,
+}
 
 #--------------------------------------
 # Streamlit App Initialization
@@ -45,265 +93,38 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-st.markdown("""
-<style>
-    @import url('https://fonts.googleapis.com/css2?family=Source+Sans+Pro:wght@300;400;500;600;700&display=swap');
-    
-    * {
-        font-family: 'Source Sans Pro', sans-serif;
-        font-size: 0.99rem;
-    }
-    
-    .main-header {
-        font-size: 2.5rem;
-        font-weight: 700;
-        # color: #4B3FFF;
-        margin-bottom: 1rem;
-    }
-    .sub-header {
-        font-size: 1.5rem;
-        font-weight: 500;
-        color: #6C63FF;
-        margin-bottom: 1rem;
-    }
-    
-    .sidebar {
-        background-color: #F5F7FA;
-        border-radius: 10px;
-        padding: 1.5rem;
-    }
-    
-    .sidebar-header {
-        font-size: 1.2rem;
-        font-weight: 600;
-        color: #6C5CE7;
-        margin-top: 1rem;
-    }
-    
-    .card {
-        padding: 1rem;
-        border-radius: 10px;
-        box-shadow: 0 4px 8px rgba(0, 0, 0, 0.2);
-        margin-bottom: 1rem;
-        background-color: #6C5CE7;
-        color: white;
-        transition: transform 0.3s ease;
-    }
-    .metric-card {
-        background-color: #6C5CE7;
-        color: white;
-        border-radius: 8px;
-        text-align: center;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-    }
-    
-    .card:hover {
-        transform: translateY(-5px);
-    }
-    
-    .chat-message {
-        padding: 1rem;
-        border-radius: 10px;
-        margin-bottom: 0.5rem;
-    }
-    .chat-message-user {
-        background-color: #E0E7FF;
-        border-left: 5px solid #4B3FFF;
-    }
-    
-    .chat-container {
-        display: flex;
-        flex-direction: column;
-        background-color: #FAFAFA;
-    }
-    
-    .footer {
-        margin-top: 2rem;
-        padding-top: 1rem;
-        text-align: center;
-        font-size: 0.85rem;
-    }
-    
-    .profile-card {
-        # border-radius: 12px;
-        # padding: 2rem;
-        # margin-bottom: 1.5rem;
-        # background-color: white;
-        # box-shadow: 0 5px 15px rgba(0, 0, 0, 0.05);
-        # border-top: 5px solid #FF6B6B;
-    }
-    
-    .stButton>button {
-        background: linear-gradient(90deg, #4ECDC4, #6C63FF);
-        color: white;
-        border: none;
-        border-radius: 8px;
-        padding: 0.8rem 1.2rem;
-        font-weight: 600;
-        box-shadow: 0 4px 6px rgba(108, 99, 255, 0.3);
-        transition: all 0.3s ease;
-    }
-    
-    .stButton>button:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 7px 14px rgba(108, 99, 255, 0.4);
-    }
-    
-    /* Plan Cards */
-    .plan-card {
-        border-radius: 12px;
-        box-shadow: 0 5px 15px rgba(0, 0, 0, 0.05);
-        margin-bottom: 1.5rem;
-        transition: transform 0.3s ease;
-    }
-    
-    .dietary-plan {
-        border-left: 5px solid #FF6B6B;
-    }
-    
-    .fitness-plan {
-        border-left: 5px solid #4ECDC4;
-    }
-    
-    .plan-card:hover {
-        transform: translateY(-5px);
-    }
-    
-    .plan-header {
-        font-size: 1.4rem;
-        font-weight: 600;
-        margin-bottom: 1rem;
-        color: #333;
-        border-bottom: 2px dashed rgba(0, 0, 0, 0.1);
-        padding-bottom: 0.5rem;
-    }
-    
-    .tip-box {
-        # background-color: #F1F9FE;
-        border-radius: 8px;
-        padding: 0.8rem;
-        margin-bottom: 0.8rem;
-        border-left: 3px solid #4ECDC4;
-    }
-    
-    .warning-box {
-        # background-color: #FFF5F5;
-        border-radius: 8px;
-        padding: 0.8rem;
-        margin-bottom: 0.8rem;
-        border-left: 3px solid #FF6B6B;
-    }
-    
-    .success-box {
-        border-radius: 8px;
-        padding: 0.8rem;
-        margin-bottom: 0.8rem;
-        border-left: 3px solid #48BB78;
-    }
-    
-    /* Custom avatar for chat */
-    .avatar-user {
-        # background-color: #6C63FF;
-        # color: white;
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-weight: 600;
-        font-size: 16px;
-    }
-    
-    .avatar-assistant {
-        # background-color: #4ECDC4;
-        # color: white;
-        width: 40px;
-        height: 40px;
-        border-radius: 50%;
-        display: flex;
-        align-items: center;
-        justify-content: center;
-        font-weight: 600;
-        font-size: 16px;
-    }
-    
-    /* Model selector */
-    .model-selector {
-        border-radius: 8px;
-        padding: 1rem;
-        margin-bottom: 1.5rem;
-        box-shadow: 0 2px 5px rgba(0, 0, 0, 0.05);
-    }
-    
-    .model-option {
-        display: flex;
-        align-items: center;
-        margin: 0.5rem 0;
-    }
-    
-    .model-icon {
-        margin-right: 0.5rem;
-        font-size: 1.2rem;
-    }
-    
-    /* Animation for generating plans */
-    @keyframes pulse {
-        0% { box-shadow: 0 0 0 0 rgba(78, 205, 196, 0.5); }
-        70% { box-shadow: 0 0 0 10px rgba(78, 205, 196, 0); }
-        100% { box-shadow: 0 0 0 0 rgba(78, 205, 196, 0); }
-    }
-    
-    .generating {
-        animation: pulse 2s infinite;
-    }
-    
-    .stSlider>div>div {
-        # background-color: #4ECDC4 !important;
-    }
-    
-    .stProgress>div>div>div>div {
-        background-color: #6C63FF !important;
-    }
-
-    .chat-area {
-        display: flex;
-        flex-direction: column;
-        # background-color: #FAFAFA; /* Match chat background */
-        # border: 1px solid #e0e0e0; /* Optional border */
-        # border-radius: 8px; /* Optional rounding */
-        # margin-bottom: 1rem; /* Space below chat area */
-    }
-
-    .messages-container {
-        flex-grow: 1; 
-        overflow-y: auto; /* Allows scrolling for messages */
-        padding: 1rem;
-    }
-
-    .input-container {
-        flex-shrink: 0;
-        # padding: 0.5rem 1rem; /* Padding around input */
-        # background-color: white; /* Input background */
-    }
-</style>
-""", unsafe_allow_html=True)
+# Static styles: read and minified once per process. Streamlit drops elements a rerun doesn't redraw,
+# so the <style> block is still sent every run, minified to about a third of its size
+st.markdown(load_styles(), unsafe_allow_html=True)
 
 
 #--------------------------------------
 # Session persistence
 #--------------------------------------
 @st.cache_resource
-def get_persistent_state():
-    """Return a persistent state object that will retain data across sessions."""
-    return {
-        "user_profiles": {},
-        "plans": {},
-        "chat_history": {}
-    }
+def get_store():
+    """Return the process-wide store that retains profiles, plans and chats across sessions."""
+    return create_store(
+        STORE_BACKEND,
+        path=STORE_PATH,
+        max_profiles=STORE_MAX_PROFILES,
+        max_messages_per_user=STORE_MAX_MESSAGES_PER_USER,
+    )
+
+@st.cache_resource
+def get_scheduler():
+    """Return the process-wide scheduler every model call goes through."""
+    return ModelCallScheduler()
+
+@st.cache_resource
+def get_plan_cache():
+    """Return the process-wide cache of generated plans."""
+    return create_plan_cache(PLAN_CACHE_BACKEND, path=PLAN_CACHE_PATH, ttl=PLAN_CACHE_TTL)
 
 # Initialize persistent state
-persistent_state = get_persistent_state()
+store = get_store()
+plan_cache = get_plan_cache()
+scheduler = get_scheduler()
 
 # Initialize session state variables
 if 'dietary_plan' not in st.session_state:
@@ -322,6 +143,19 @@ if 'chat_history' not in st.session_state:
     logger.debug("Initializing chat_history in session state")
     st.session_state.chat_history = []
 
+if 'chat_summary' not in st.session_state:
+    st.session_state.chat_summary = RollingSummary()
+
+if 'last_context_tokens' not in st.session_state:
+    st.session_state.last_context_tokens = None
+
+if 'chat_earlier_pages' not in st.session_state:
+    st.session_state.chat_earlier_pages = 0  # pages older than the tail shown above it
+
+if 'session_id' not in st.session_state:
+    # Identifies this browser session for fair queuing of model calls
+    st.session_state.session_id = str(uuid.uuid4())
+
 if 'user_id' not in st.session_state:
     logger.debug("Initializing user_id in session state")
     st.session_state.user_id = None
@@ -333,9 +167,24 @@ if 'selected_model' not in st.session_state:
 if 'view_profiles' not in st.session_state:
     st.session_state.view_profiles = False
 
+if 'view_dashboard' not in st.session_state:
+    st.session_state.view_dashboard = False
+
+if 'profile_page' not in st.session_state:
+    st.session_state.profile_page = 0
+
 if 'current_tab' not in st.session_state:
     st.session_state.current_tab = "Profile"
 
+if 'plan_index' not in st.session_state:
+    st.session_state.plan_index = None
+
+if 'plan_warnings' not in st.session_state:
+    st.session_state.plan_warnings = []
+
+if 'plan_job_id' not in st.session_state:
+    st.session_state.plan_job_id = None
+
 
 #--------------------------------------
 # Helper Functions
@@ -344,156 +193,414 @@ def initialize_model(model_name):
     """Initialize the selected AI model"""
     logger.info(f"Initializing model: {model_name}")
     try:
-        if model_name == GEMINI_MODEL_NAME:
-            logger.debug("Initializing Gemini model")
-            return Gemini(id=GEMINI_MODEL_NAME, api_key=GOOGLE_API_KEY)
-        elif model_name == GROQ_MODEL_NAME:
-            logger.debug("Initializing Groq model")
-            return Groq(id=GROQ_MODEL_NAME, api_key=GROQ_API_KEY)
-        else:
+        if model_name not in (GEMINI_MODEL_NAME, GROQ_MODEL_NAME):
             logger.error(f"Invalid model selection: {model_name}")
             st.error("Invalid model selection")
             return None
+        return create_model(model_name)
     except Exception as e:
         logger.error(f"Error initializing model {model_name}: {str(e)}", exc_info=True)
         raise
 
+@st.cache_resource
+def get_model_registry():
+    """Return the process-wide registry of model clients and pooled agents."""
+    return ModelRegistry(initialize_model)
+
+@st.cache_resource
+def get_router():
+    """Return the process-wide router that adds failover and hedging on top of the registry."""
+    return ModelRouter(
+        get_model_registry(),
+        get_scheduler(),
+        hedge=ROUTER_HEDGE,
+        failover_timeout=ROUTER_FAILOVER_TIMEOUT,
+    )
+
+@st.cache_resource
+def get_job_queue():
+    """Return the process-wide queue plan generation jobs run on, independent of script reruns."""
+    from plan_jobs import PlanJobQueue
+    return PlanJobQueue(
+        store, get_router(), cache=plan_cache, max_workers=PLAN_JOB_WORKERS, timeout=PLAN_AGENT_TIMEOUT,
+    )
+
+def display_chat_message(message):
+    """Render one chat bubble"""
+    if message["role"] == "user":
+        with st.chat_message("user", avatar="👤"):
+            st.write(message["content"])
+    else:
+        with st.chat_message("assistant", avatar="🤖"):
+            st.write(message["content"])
+
 def display_chat_history():
-    """Display chat history in a Streamlit chat interface"""
+    """Display the chat: the session's tail of recent messages, plus older pages from the store on request"""
     logger.debug("Displaying chat history")
-    if not st.session_state.chat_history:
+    history = st.session_state.chat_history
+    if not history:
         logger.debug("No chat history to display")
         return
-    
-    for message in st.session_state.chat_history:
-        if message["role"] == "user":
-            with st.chat_message("user", avatar="👤"):
-                st.write(message["content"])
-        else:
-            with st.chat_message("assistant", avatar="🤖"):
-                st.write(message["content"])
+
+    # Only the tail is redrawn per turn, so a turn costs the same however long the chat gets;
+    # older pages are read back from the store and not kept in the session
+    if st.session_state.user_id:
+        pages = st.session_state.chat_earlier_pages
+        earlier = store.load_messages(
+            st.session_state.user_id, before=history[0]["id"], limit=pages * CHAT_PAGE_SIZE,
+        ) if pages else []
+        hidden = store.count_messages(st.session_state.user_id, before=(earlier or history)[0]["id"])
+        if hidden:
+            st.button(f"⬆️ Load earlier messages ({hidden} more)", on_click=load_earlier_messages)
+        for message in earlier:
+            display_chat_message(message)
+    for message in history[-CHAT_TAIL_MESSAGES:]:
+        display_chat_message(message)
+
+def load_earlier_messages():
+    """Show one more page of older messages; a button callback, so it applies to the rerun the click starts"""
+    st.session_state.chat_earlier_pages += 1
+
+def clear_chat():
+    """Empty the chat and its stored history; a button callback"""
+    reset_chat()
+    if st.session_state.user_id:
+        store.clear_messages(st.session_state.user_id)
+
+def reset_chat(messages=None):
+    """Replace the session's chat history and drop the summary built from the old one"""
+    st.session_state.chat_history = messages if messages is not None else []
+    st.session_state.chat_earlier_pages = 0
+    st.session_state.chat_summary = RollingSummary()
+    st.session_state.last_context_tokens = None
 
 def add_message(role, content):
-    """Add a message to the chat history"""
+    """Append a message to the chat log and the session's tail of it"""
     logger.debug(f"Adding {role} message to chat history")
-    st.session_state.chat_history.append({"role": role, "content": content})
-    
+    history = st.session_state.chat_history
     if st.session_state.user_id:
         logger.debug(f"Persisting message for user {st.session_state.user_id}")
-        if st.session_state.user_id not in persistent_state["chat_history"]:
-            persistent_state["chat_history"][st.session_state.user_id] = []
-        persistent_state["chat_history"][st.session_state.user_id].append({"role": role, "content": content})
+        message_id = store.append_message(st.session_state.user_id, role, content)
+    else:
+        # Not persisted; ids only need to increase
+        message_id = history[-1]["id"] + 1 if history else 1
+    history.append({"id": message_id, "role": role, "content": content})
+    # The store holds the full chat; the session keeps one bounded window of it
+    del history[:-CHAT_TAIL_MESSAGES]
         
 def create_user_profile(user_data):
     """Create a user profile with a unique ID"""
     logger.info("Creating new user profile")
     try:
-        import uuid
-        user_id = str(uuid.uuid4())
-        persistent_state["user_profiles"][user_id] = user_data
+        user_id = store.create_profile(user_data)
         logger.debug(f"Created profile for user {user_id}")
         return user_id
     except Exception as e:
         logger.error(f"Error creating user profile: {str(e)}", exc_info=True)
         raise
 
+def display_nutrition_metrics(user_data):
+    """Display the profile's computed nutrition targets as metric cards"""
+    from nutrition import nutrition_metrics
+    try:
+        metrics = nutrition_metrics(user_data)
+    except (KeyError, TypeError, ValueError) as e:
+        logger.warning(f"Nutrition metrics unavailable for this profile: {str(e)}")
+        return
+
+    st.markdown("### 📐 Your Numbers")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("BMI", metrics.bmi, help=metrics.bmi_category)
+    col2.metric("BMR", f"{metrics.bmr:,} kcal", help="Mifflin-St Jeor resting energy expenditure")
+    col3.metric("TDEE", f"{metrics.tdee:,} kcal", help="Daily energy expenditure at your activity level")
+    col4.metric("Daily target", f"{metrics.target_calories:,} kcal", delta=metrics.target_calories - metrics.tdee)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Protein", f"{metrics.protein_g} g")
+    col2.metric("Fat", f"{metrics.fat_g} g")
+    col3.metric("Carbohydrates", f"{metrics.carbs_g} g")
+
+def display_plan_card(card):
+    """Render a precomputed plan card: title, then the plan and its side notes in two columns"""
+    with st.container():
+        st.markdown(card.header, unsafe_allow_html=True)
+        col1, col2 = st.columns([2, 1])
+        with col1:
+            st.markdown(card.intro, unsafe_allow_html=True)
+            st.markdown(card.body)
+        with col2:
+            st.markdown(card.side, unsafe_allow_html=True)
+
+@traced("render.plan_card", card="dietary")
 def display_dietary_plan(plan_content):
     """Display dietary plan in an attractive format"""
-    logger.info("Displaying dietary plan")
+    logger.info("Displaying dietary plan", extra=SAMPLED)
     try:
-        with st.container():
-            st.markdown("<div class='plan-card dietary-plan'>", unsafe_allow_html=True)
-            st.markdown("<h3 class='plan-header'>🍽️ Your Personalized Dietary Plan</h3>", unsafe_allow_html=True)
-            
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                st.markdown("### 🎯 Why this plan works")
-                st.markdown(f"<div class='success-box'>{plan_content.get('why_this_plan_works', 'Information not available')}</div>", unsafe_allow_html=True)
-                
-                st.markdown("### 🍽️ Meal Plan")
-                st.markdown(plan_content.get("meal_plan", "Plan not available"))
-            
-            with col2:
-                st.markdown("### ⚠️ Important Considerations")
-                considerations = plan_content.get("important_considerations", "").split('\n')
-                for consideration in considerations:
-                    if consideration.strip():
-                        st.markdown(f"<div class='warning-box'>{consideration}</div>", unsafe_allow_html=True)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+        display_plan_card(plan_card("dietary", plan_content))
     except Exception as e:
         logger.error(f"Error displaying dietary plan: {str(e)}", exc_info=True)
         raise
 
+@traced("render.plan_card", card="fitness")
 def display_fitness_plan(plan_content):
     """Display fitness plan in an attractive format"""
-    logger.info("Displaying fitness plan")
+    logger.info("Displaying fitness plan", extra=SAMPLED)
     try:
-        
-        with st.container():
-            st.markdown("<div class='plan-card fitness-plan'>", unsafe_allow_html=True)
-            st.markdown("<h3 class='plan-header'>💪 Your Personalized Fitness Plan</h3>", unsafe_allow_html=True)
-            
-            col1, col2 = st.columns([2, 1])
-            
-            with col1:
-                st.markdown("### 🎯 Goals")
-                st.markdown(f"<div class='success-box'>{plan_content.get('goals', 'Goals not specified')}</div>", unsafe_allow_html=True)
-                
-                st.markdown("### 🏋️‍♂️ Exercise Routine")
-                st.markdown(plan_content.get("routine", "Routine not available"))
-            
-            with col2:
-                st.markdown("### 💡 Pro Tips")
-                tips = plan_content.get("tips", "").split('\n')
-                for tip in tips:
-                    if tip.strip():
-                        st.markdown(f"<div class='tip-box'>{tip}</div>", unsafe_allow_html=True)
-            
-            st.markdown("</div>", unsafe_allow_html=True)
+        display_plan_card(plan_card("fitness", plan_content))
     except Exception as e:
         logger.error(f"Error displaying fitness plan: {str(e)}", exc_info=True)
         raise
 
-def stream_response(agent, context):
-    """Get the full response from the agent and yield it chunk by chunk."""
-    logger.info("Generating response using agent.run and simulating stream")
-    full_response = ""
+@st.fragment
+def display_plans_tab():
+    """The "My Plans" tab as its own fragment, so reruns scoped to other fragments leave it alone"""
+    st.markdown("<h2 class='sub-header'>Your Personalized Plans</h2>", unsafe_allow_html=True)
+    for warning in st.session_state.plan_warnings:
+        st.warning(warning)
+    if st.session_state.user_id:
+        profile = store.load_profile(st.session_state.user_id)
+        if profile:
+            display_nutrition_metrics(profile)
+    display_dietary_plan(st.session_state.dietary_plan)
+    display_fitness_plan(st.session_state.fitness_plan)
+
+def respond_to(prompt):
+    """Stream the assistant's answer to `prompt` (the newest history message) and add it to the history"""
+    # Create a budgeted context from the relevant plan sections and the conversation so far
+    if st.session_state.plan_index is None:
+        # Plans saved before sections were indexed
+        st.session_state.plan_index = PlanIndex.build(
+            st.session_state.dietary_plan.get("meal_plan", ""),
+            st.session_state.fitness_plan.get("routine", ""),
+        )
+    history = st.session_state.chat_history[:-1]
+    with get_tracer().span("prompt.assemble", kind="chat", model=st.session_state.selected_model):
+        plan_context = st.session_state.plan_index.render_context(prompt, k=PLAN_CONTEXT_SECTIONS)
+        context_builder = ChatContextBuilder(CHAT_TOKEN_BUDGETS[st.session_state.selected_model])
+        chat_context = context_builder.build(prompt, plan_context, history, st.session_state.chat_summary)
+    st.session_state.last_context_tokens = chat_context.tokens
+    summary = copy.deepcopy(st.session_state.chat_summary)
+
+    def fallback_request(model_id):
+        """The same request rebuilt for `model_id`'s budget, for the router to send if it fails over."""
+        fallback_context = ChatContextBuilder(CHAT_TOKEN_BUDGETS[model_id]).build(
+            prompt, plan_context, history, copy.deepcopy(summary)
+        )
+        return fallback_context.prompt, {"messages": fallback_context.messages}
+
+    # Use st.chat_message for the assistant's response area
+    with st.chat_message("assistant", avatar="🤖"):
+        try:
+            # Show thinking indicator
+            thinking_placeholder = st.empty()
+            thinking_placeholder.markdown("AI is thinking...")
+
+            logger.debug("Streaming agent response")
+            # A newer message sets this event so the in-flight stream stops early
+            cancel_event = threading.Event()
+            st.session_state.chat_cancel_event = cancel_event
+            agent = get_router().agent(
+                st.session_state.selected_model, CHAT_AGENT, st.session_state.session_id,
+                output_tokens=CHAT_OUTPUT_TOKENS, prepare=fallback_request,
+            )
+            response_generator = stream_response(agent, chat_context, cancel_event)
+            with log_context(request_id=str(uuid.uuid4())), get_tracer().span(
+                "render.chat_stream", model=st.session_state.selected_model,
+                session=st.session_state.session_id,
+            ):
+                try:
+                    full_response = st.write_stream(response_generator)
+                finally:
+                    response_generator.close()
+
+            # Clear thinking indicator
+            thinking_placeholder.empty()
+
+            # The streamed bubble stays on screen; the history only records it for later turns
+            add_message("assistant", full_response)
+            logger.info("Assistant response added to chat history")
+
+        except Exception as e:
+            logger.error(f"Error in response generation: {str(e)}", exc_info=True)
+            error_message = f"Sorry, I encountered an error: {str(e)}"
+            st.markdown(error_message)
+            add_message("assistant", error_message)
+
+@st.fragment
+def display_chat_tab():
+    """The chat assistant as its own fragment.
+
+    Sending a message reruns only this fragment, not the sidebar or the
+    other tabs, and the turn is appended in place (the question bubble, then
+    the streamed answer) without a further rerun.
+    """
+    st.markdown("<h2 class='sub-header'>💬 Chat with your Health & Fitness Assistant</h2>", unsafe_allow_html=True)
+
+    # New bubbles are added to this container, above the caption and the input
+    messages = st.container()
+    with messages:
+        display_chat_history()
+    context_caption = st.empty()
+
+    # Clear chat button (optional, can be placed elsewhere)
+    st.button("🗑️ Clear Chat", on_click=clear_chat)
+
+    if prompt := st.chat_input("Ask about your plan or for more personalized advice..."):
+        logger.info(f"User question received: {redact_prompt(prompt)}")
+        if st.session_state.get("chat_cancel_event") is not None:
+            st.session_state.chat_cancel_event.set()
+        add_message("user", prompt)
+        with messages:
+            display_chat_message(st.session_state.chat_history[-1])
+
+    # Answer the newest message if it is still waiting for one (just sent, or the last run was interrupted)
+    history = st.session_state.chat_history
+    if history and history[-1]["role"] == "user":
+        with messages:
+            respond_to(history[-1]["content"])
+
+    if st.session_state.last_context_tokens:
+        tokens = st.session_state.last_context_tokens
+        context_caption.caption(f"Last request used ~{tokens['total']:,} of {tokens['budget']:,} context tokens")
+
+def stream_response(agent, chat_context, cancel_event=None):
+    """Stream the agent's response as the model produces it.
+
+    Model deltas are coalesced into larger chunks so Streamlit gets a handful of
+    writes per answer instead of one per token. Setting `cancel_event` (or
+    closing the generator) stops reading and closes the provider stream.
+    """
+    logger.info("Streaming response from agent")
+    stream = None
+    buffer = []
+    buffered_chars = 0
+    received = False
+    last_flush = time.monotonic()
     try:
-        # Get the complete response first
-        response = agent.run(context)
-        
-        if hasattr(response, 'content') and response.content:
-            content = response.content
-            logger.debug(f"Got agent response content of length: {len(content)}")
-            # Yield the content chunk by chunk
-            chunk_size = 1 # Small chunk size for noticeable streaming effect
-            for i in range(0, len(content), chunk_size):
-                yield content[i:i+chunk_size]
-            full_response = content
-        else:
-            logger.warning("Agent response did not have valid content.")
+        stream = agent.run(chat_context.prompt, messages=chat_context.messages, stream=True)
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("Response stream cancelled by a newer message")
+                return
+
+            delta = getattr(chunk, "content", None)
+            if not isinstance(delta, str) or not delta:
+                continue
+            received = True
+            buffer.append(delta)
+            buffered_chars += len(delta)
+
+            now = time.monotonic()
+            if buffered_chars >= STREAM_FLUSH_CHARS or now - last_flush >= STREAM_FLUSH_INTERVAL:
+                yield "".join(buffer)
+                buffer, buffered_chars, last_flush = [], 0, now
+
+        if buffer:
+            yield "".join(buffer)
+        if not received:
+            logger.warning("Agent stream did not produce any content.")
             yield "Sorry, I couldn't generate a valid response."
-            full_response = "Sorry, I couldn't generate a valid response."
-            
+
     except Exception as e:
-        logger.error(f"Error during agent.run or streaming simulation: {str(e)}", exc_info=True)
-        error_msg = f"Sorry, an error occurred while generating the response: {str(e)}"
-        yield error_msg
-        full_response = error_msg
-    
-    # Note: The full_response is now implicitly returned by st.write_stream capturing the yields
+        logger.error(f"Error while streaming agent response: {str(e)}", exc_info=True)
+        if buffer:
+            yield "".join(buffer)
+        yield f"Sorry, an error occurred while generating the response: {str(e)}"
+
+    finally:
+        # Release the provider connection even when the consumer stops early
+        if stream is not None and hasattr(stream, "close"):
+            stream.close()
+
+def show_plan_result(result):
+    """Put a PlanResult in the session so the next run shows the plans"""
+    # Keep partial results and surface the failures after the rerun
+    st.session_state.plan_warnings = [
+        f"⚠️ The {key} plan could not be generated: {error}" for key, error in result.errors.items()
+    ]
+    st.session_state.dietary_plan = result.dietary_plan
+    st.session_state.fitness_plan = result.fitness_plan
+    st.session_state.plan_index = PlanIndex.from_dict(result.retrieval_index)
+    st.session_state.plans_generated = True
+
+@st.fragment(run_every=PLAN_JOB_POLL_INTERVAL)
+def display_plan_job_progress():
+    """Poll the session's background plan job and load its plans once it finishes"""
+    job = get_job_queue().get(st.session_state.plan_job_id)
+    if job is None:
+        # The job expired or the server restarted; fall back to the form
+        st.session_state.plan_job_id = None
+        st.rerun()
+        return
 
-def display_user_profiles():
-    """Display all user profiles in the system"""
-    logger.info("Displaying all user profiles")
-    if not persistent_state["user_profiles"]:
-        st.info("No user profiles found")
+    if job.status == "failed":
+        st.session_state.plan_job_id = None
+        st.session_state.plan_job_error = job.error
+        st.rerun()
         return
-    
+
+    if job.status == "done":
+        show_plan_result(job.result)
+        st.session_state.plan_job_id = None
+        st.rerun()
+        return
+
+    st.progress(job.progress, text=job.message)
+    st.caption("You can keep using the app; your plans are generated in the background.")
+    # Fill the plan cards in section by section as the agents stream them
+    partial = job.partial
+    if "dietary" in partial:
+        display_dietary_plan(partial["dietary"])
+    if "fitness" in partial:
+        display_fitness_plan(partial["fitness"])
+
+def display_user_profiles():
+    """Display one page of the stored user profiles, filtered by goal, diet and age band"""
+    logger.info("Displaying user profiles", extra=SAMPLED)
     with st.expander("👥 All User Profiles", expanded=True):
-        for user_id, profile in persistent_state["user_profiles"].items():
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            goal = st.selectbox("Goal", ["All"] + FITNESS_GOAL_OPTIONS, key="profile_filter_goal")
+        with col2:
+            diet = st.selectbox("Diet", ["All"] + DIETARY_PREFERENCE_OPTIONS, key="profile_filter_diet")
+        with col3:
+            band = st.selectbox("Age", ["All"] + [label for _, label in AGE_BANDS], key="profile_filter_age")
+
+        filters = (goal, diet, band)
+        if st.session_state.get("profile_filters") != filters:
+            # New filters start from the first page
+            st.session_state.profile_filters = filters
+            st.session_state.profile_page = 0
+
+        page = st.session_state.profile_page
+        total, profiles = store.search_profiles(
+            goal=None if goal == "All" else goal,
+            diet=None if diet == "All" else diet,
+            age_band=None if band == "All" else band,
+            offset=page * PROFILES_PAGE_SIZE,
+            limit=PROFILES_PAGE_SIZE,
+        )
+        if not profiles and page > 0:
+            # The last profile on this page was deleted
+            st.session_state.profile_page = max(0, (total - 1) // PROFILES_PAGE_SIZE)
+            st.rerun()
+        if not profiles:
+            st.info("No user profiles found")
+            return
+
+        pages = (total + PROFILES_PAGE_SIZE - 1) // PROFILES_PAGE_SIZE
+        col1, col2, col3 = st.columns([1, 3, 1])
+        with col1:
+            if st.button("◀ Previous", disabled=page == 0, key="profiles_prev"):
+                st.session_state.profile_page -= 1
+                st.rerun()
+        with col2:
+            st.caption(f"Page {page + 1} of {pages} ({total} profiles)")
+        with col3:
+            if st.button("Next ▶", disabled=page + 1 >= pages, key="profiles_next"):
+                st.session_state.profile_page += 1
+                st.rerun()
+
+        for user_id, profile in profiles:
             col1, col2, col3 = st.columns([1, 3, 1])
             
             with col1:
@@ -501,16 +608,19 @@ def display_user_profiles():
                     st.session_state.user_id = user_id
                     
                     # Load plans if they exist
-                    if user_id in persistent_state["plans"]:
-                        st.session_state.dietary_plan = persistent_state["plans"][user_id]["dietary_plan"]
-                        st.session_state.fitness_plan = persistent_state["plans"][user_id]["fitness_plan"]
+                    plans = store.load_plans(user_id)
+                    if plans:
+                        from plan_schema import normalize_plan
+                        st.session_state.dietary_plan = normalize_plan(plans["dietary_plan"])
+                        st.session_state.fitness_plan = normalize_plan(plans["fitness_plan"])
+                        if plans.get("retrieval_index"):
+                            st.session_state.plan_index = PlanIndex.from_dict(plans["retrieval_index"])
+                        else:
+                            st.session_state.plan_index = None
                         st.session_state.plans_generated = True
                     
                     # Load chat history if it exists
-                    if user_id in persistent_state["chat_history"]:
-                        st.session_state.chat_history = persistent_state["chat_history"][user_id]
-                    else:
-                        st.session_state.chat_history = []
+                    reset_chat(store.load_messages(user_id, limit=CHAT_TAIL_MESSAGES))
                     
                     st.rerun()
             
@@ -521,23 +631,106 @@ def display_user_profiles():
             with col3:
                 if st.button(f"Delete", key=f"delete_{user_id}"):
                     # Remove user from all persistent state
-                    persistent_state["user_profiles"].pop(user_id, None)
-                    persistent_state["plans"].pop(user_id, None)
-                    persistent_state["chat_history"].pop(user_id, None)
+                    store.delete_profile(user_id)
                     
                     # If current user is deleted, reset session
                     if st.session_state.user_id == user_id:
                         st.session_state.user_id = None
                         st.session_state.plans_generated = False
-                        st.session_state.chat_history = []
+                        reset_chat()
                     
                     st.rerun()
             
             st.divider()
 
 
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def load_profile_summary(goal=None, diet=None, condition=None):
+    """Aggregate profile summary for the admin dashboard, reused for a few seconds across sessions"""
+    from profile_analytics import profile_summary
+    return profile_summary(store, goal=goal, diet=diet, condition=condition)
+
+def display_admin_dashboard():
+    """Display aggregate statistics over all stored profiles"""
+    logger.info("Displaying admin dashboard", extra=SAMPLED)
+    with st.expander("📈 Admin Dashboard", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            goal = st.selectbox("Goal", ["All"] + FITNESS_GOAL_OPTIONS, key="dashboard_goal")
+        with col2:
+            diet = st.selectbox("Diet", ["All"] + DIETARY_PREFERENCE_OPTIONS, key="dashboard_diet")
+        with col3:
+            condition = st.selectbox("Condition", ["All"] + HEALTH_CONDITION_OPTIONS[1:], key="dashboard_condition")
+
+        try:
+            summary = load_profile_summary(
+                None if goal == "All" else goal,
+                None if diet == "All" else diet,
+                None if condition == "All" else condition,
+            )
+        except Exception as e:
+            logger.error(f"Error building profile summary: {str(e)}", exc_info=True)
+            st.error(f"❌ Could not load the dashboard: {str(e)}")
+            return
+
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Profiles", f"{summary['total']:,}")
+        col2.metric("Median age", summary["age"].get("median", "–"))
+        col3.metric("Median weight (kg)", summary["weight"].get("median", "–"))
+        col4.metric("Median BMI", summary["bmi"].get("median", "–"))
+        if not summary["total"]:
+            return
+
+        charts = [
+            ("Fitness goals", summary["facets"]["goal"]),
+            ("Dietary preferences", summary["facets"]["diet"]),
+            ("Activity levels", summary["facets"]["activity"]),
+            ("Health conditions", summary["facets"]["condition"]),
+            ("Age bands", summary["facets"]["age_band"]),
+            ("BMI categories", summary["bmi_categories"]),
+        ]
+        for (title, counts), column in zip(charts, st.columns(2) * 3):
+            with column:
+                st.markdown(f"**{title}**")
+                if counts:
+                    st.bar_chart({"profiles": counts})
+                else:
+                    st.caption("No data")
+
+@st.fragment(run_every=LATENCY_PANEL_REFRESH)
+def display_latency_panel():
+    """Live per-stage latency percentiles, time to first token and token totals from the tracer"""
+    tracer = get_tracer()
+    if not tracer.enabled:
+        st.caption("Tracing is off. Start the app with `TRACING=true` to record stage latencies.")
+        return
+
+    stats = tracer.stats()
+    to_ms = lambda seconds: None if seconds is None else round(seconds * 1000, 1)
+    rows = [
+        {
+            "stage": row.get("span") or row["metric"],
+            "model": row.get("model", ""),
+            "count": row["count"],
+            "p50 ms": to_ms(row["p50"]),
+            "p95 ms": to_ms(row["p95"]),
+            "p99 ms": to_ms(row["p99"]),
+        }
+        for row in stats["histograms"]
+    ]
+    if not rows:
+        st.caption("No traced requests yet")
+        return
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+    totals = [f"{row['metric']} ({row.get('model') or row.get('span', '')}): {row['value']:,.0f}"
+              for row in stats["counters"]]
+    if totals:
+        st.caption(" · ".join(totals))
+
+
 def main():
-    logger.info("Starting application main function")
+    set_log_context(session_id=st.session_state.session_id, user_id=st.session_state.user_id)
+    logger.info("Starting application main function", extra=SAMPLED)
     st.markdown("<h1 class='main-header'>🏋️ AI Health & Fitness Planner</h1>", unsafe_allow_html=True)
 
     # Sidebar
@@ -564,7 +757,7 @@ def main():
         st.markdown("<div class='sidebar-header'>👤 User Profile</div>", unsafe_allow_html=True)
         
         if st.session_state.user_id:
-            user_data = persistent_state["user_profiles"].get(st.session_state.user_id, {})
+            user_data = store.load_profile(st.session_state.user_id) or {}
             if user_data:
                 st.markdown(f"<div class='success-box'>Profile: {user_data.get('age')} years, {user_data.get('weight')}kg, {user_data.get('fitness_goals')}</div>", unsafe_allow_html=True)
                 
@@ -572,7 +765,7 @@ def main():
                     logger.info("User requested new profile creation")
                     st.session_state.user_id = None
                     st.session_state.plans_generated = False
-                    st.session_state.chat_history = []
+                    reset_chat()
                     st.rerun()
         
         # Button to view all profiles
@@ -586,23 +779,25 @@ def main():
                 st.session_state.view_profiles = False
                 st.rerun()
     
+        if st.button("📈 Admin Dashboard"):
+            st.session_state.view_dashboard = not st.session_state.view_dashboard
+            st.rerun()
+    
     # Display all profiles if requested
     if st.session_state.view_profiles:
         display_user_profiles()
 
-    # Initialize the selected model
-    try:
-        logger.info(f"Initializing model: {st.session_state.selected_model}")
-        model = initialize_model(st.session_state.selected_model)
-        
-    except Exception as e:
-        logger.error(f"Model initialization failed: {str(e)}", exc_info=True)
-        st.error(f"❌ Error initializing model: {e}")
-        return
+    if st.session_state.view_dashboard:
+        display_admin_dashboard()
+        with st.expander("⏱️ Latency", expanded=True):
+            display_latency_panel()
+
+    # The selected model's client (and its provider SDK) is built by the registry on first use,
+    # so the first page paints without waiting for it
     
     # Main content layout
     if not st.session_state.plans_generated:
-        logger.info("Displaying profile collection form")
+        logger.info("Displaying profile collection form", extra=SAMPLED)
         # Profile collection form
         st.markdown("<div class='profile-card'>", unsafe_allow_html=True)
         st.markdown("<h2 class='sub-header'>👤 Complete Your Health Profile</h2>", unsafe_allow_html=True)
@@ -614,29 +809,29 @@ def main():
             height = st.number_input("Height (cm)", min_value=100.0, max_value=250.0, step=0.1)
             activity_level = st.selectbox(
                 "Activity Level",
-                options=["Sedentary", "Lightly Active", "Moderately Active", "Very Active", "Extremely Active"],
+                options=ACTIVITY_LEVEL_OPTIONS,
                 help="Choose your typical activity level"
             )
         
         with col2:
             weight = st.number_input("Weight (kg)", min_value=20.0, max_value=300.0, step=0.1)
-            sex = st.selectbox("Sex", options=["Male", "Female", "Other"])
+            sex = st.selectbox("Sex", options=SEX_OPTIONS)
             fitness_goals = st.selectbox(
                 "Fitness Goals",
-                options=["Lose Weight", "Gain Muscle", "Endurance", "Stay Fit", "Strength Training"],
+                options=FITNESS_GOAL_OPTIONS,
                 help="What do you want to achieve?"
             )
             
         with col3:
             dietary_preferences = st.selectbox(
                 "Dietary Preferences",
-                options=["No Restrictions", "Vegetarian", "Vegan", "Keto", "Gluten Free", "Low Carb", "Dairy Free"],
+                options=DIETARY_PREFERENCE_OPTIONS,
                 help="Select your dietary preference"
             )
             
             health_conditions = st.multiselect(
                 "Health Conditions",
-                options=["None", "Diabetes", "Hypertension", "Heart Disease", "Joint Pain", "Obesity", "Other"],
+                options=HEALTH_CONDITION_OPTIONS,
                 default=["None"],
                 help="Select any relevant health conditions"
             )
@@ -672,189 +867,92 @@ def main():
                 logger.debug("Creating new user profile")
                 st.session_state.user_id = create_user_profile(user_data)
             
-            with st.spinner("Creating your perfect health and fitness routine..."):
-                try:
-                    logger.info("Initializing agents for plan generation")
-                    # Initialize dietary and fitness agents
-                    dietary_agent = Agent(
-                        name="Dietary Expert",
-                        role="Provides personalized dietary recommendations",
-                        model=model,
-                        instructions=[
-                            "Consider the user's input, including dietary restrictions and preferences.",
-                            "Suggest a detailed meal plan for the day, including breakfast, lunch, dinner, and snacks.",
-                            "Provide a brief explanation of why the plan is suited to the user's goals.",
-                            "Focus on clarity, coherence, and quality of the recommendations.",
-                        ]
-                    )
-
-                    fitness_agent = Agent(
-                        name="Fitness Expert",
-                        role="Provides personalized fitness recommendations",
-                        model=model,
-                        instructions=[
-                            "Provide exercises tailored to the user's goals.",
-                            "Include warm-up, main workout, and cool-down exercises.",
-                            "Explain the benefits of each recommended exercise.",
-                            "Ensure the plan is actionable and detailed.",
-                        ]
+            cached = None
+            try:
+                from plan_service import cached_plans
+                # A cache hit needs no model call, so show it now instead of waiting for a job poll
+                cached = cached_plans(user_data, st.session_state.selected_model, plan_cache)
+                if cached is not None:
+                    logger.info("Serving plans from the plan cache")
+                    store.save_plans(st.session_state.user_id, cached.dietary_plan, cached.fitness_plan,
+                                     retrieval_index=cached.retrieval_index)
+                    show_plan_result(cached)
+                else:
+                    # Generate in the background; the job writes the plans to the store when done
+                    job = get_job_queue().submit(
+                        st.session_state.user_id,
+                        user_data,
+                        st.session_state.selected_model,
+                        session_id=st.session_state.session_id,
                     )
+                    st.session_state.plan_job_id = job.job_id
+            except Exception as e:
+                logger.error(f"Plan generation failed: {str(e)}", exc_info=True)
+                st.error(f"❌ An error occurred: {str(e)}")
+            if cached is not None:
+                st.rerun()
 
-                    user_profile = f"""
-                    Age: {age}
-                    Weight: {weight}kg
-                    Height: {height}cm
-                    Sex: {sex}
-                    Activity Level: {activity_level}
-                    Dietary Preferences: {dietary_preferences}
-                    Fitness Goals: {fitness_goals}
-                    Health Conditions: {', '.join(health_conditions)}
-                    Time Available: {time_available} minutes per day
-                    """
-
-                    dietary_plan_response = dietary_agent.run(user_profile)
-                    dietary_plan = {
-                        "why_this_plan_works": "High Protein, Healthy Fats, Moderate Carbohydrates, and Caloric Balance",
-                        "meal_plan": dietary_plan_response.content,
-                        "important_considerations": """
-                        - Hydration: Drink plenty of water throughout the day
-                        - Electrolytes: Monitor sodium, potassium, and magnesium levels
-                        - Fiber: Ensure adequate intake through vegetables and fruits
-                        - Listen to your body: Adjust portion sizes as needed
-                        """
-                    }
-
-                    fitness_plan_response = fitness_agent.run(user_profile)
-                    fitness_plan = {
-                        "goals": "Build strength, improve endurance, and maintain overall fitness",
-                        "routine": fitness_plan_response.content,
-                        "tips": """
-                        - Track your progress regularly
-                        - Allow proper rest between workouts
-                        - Focus on proper form
-                        - Stay consistent with your routine
-                        """
-                    }
-
-                    st.session_state.dietary_plan = dietary_plan
-                    st.session_state.fitness_plan = fitness_plan
-                    st.session_state.plans_generated = True
-                    
-                    # Store plans in persistent state
-                    persistent_state["plans"][st.session_state.user_id] = {
-                        "dietary_plan": dietary_plan,
-                        "fitness_plan": fitness_plan
-                    }
-                    
-                    st.rerun()
-
-                except Exception as e:
-                    logger.error(f"Plan generation failed: {str(e)}", exc_info=True)
-                    st.error(f"❌ An error occurred: {str(e)}")
+        if st.session_state.plan_job_id:
+            display_plan_job_progress()
+        elif st.session_state.get("plan_job_error"):
+            st.error(f"❌ An error occurred: {st.session_state.pop('plan_job_error')}")
     
     else:
         # Use tabs for better navigation in the generated plans section
         tab1, tab2, tab3 = st.tabs(["📊 My Plans", "💬 Chat Assistant", "⚙️ Settings"])
         
         with tab1:
-            # Display generated plans
-            st.markdown("<h2 class='sub-header'>Your Personalized Plans</h2>", unsafe_allow_html=True)
-            display_dietary_plan(st.session_state.dietary_plan)
-            display_fitness_plan(st.session_state.fitness_plan)
+            display_plans_tab()
         
         with tab2:
-            st.markdown("<h2 class='sub-header'>💬 Chat with your Health & Fitness Assistant</h2>", unsafe_allow_html=True)
-
-            # Main chat area with flex layout
-            st.markdown("<div class='chat-area'>", unsafe_allow_html=True)
-
-            # Messages container (scrollable)
-            st.markdown("<div class='messages-container'>", unsafe_allow_html=True)
-            # Display existing chat history first
-            display_chat_history()
-
-            # --- Handle AI Response Generation --- 
-            if len(st.session_state.chat_history) > 0 and st.session_state.chat_history[-1]["role"] == "user":
-                prompt = st.session_state.chat_history[-1]["content"]
-                
-                # Create context from plans
-                dietary_plan = st.session_state.dietary_plan
-                fitness_plan = st.session_state.fitness_plan
-                
-                context = f"""
-                Dietary Plan: {dietary_plan.get('meal_plan', '')}
-                Fitness Plan: {fitness_plan.get('routine', '')}
-                User Question: {prompt}
-                Previous Chat History: {str(st.session_state.chat_history[:-1] if len(st.session_state.chat_history) > 1 else [])}
-                """
-                
-                # Use st.chat_message for the assistant's response area
-                with st.chat_message("assistant", avatar="🤖"):
-                    try:
-                        # Show thinking indicator
-                        thinking_placeholder = st.empty()
-                        thinking_placeholder.markdown("AI is thinking...")
-                        
-                        logger.info("Initializing agent for response generation")
-                        agent = Agent(
-                            name="Health & Fitness Assistant",
-                            role="Provides personalized health and fitness advice",
-                            model=model,
-                            markdown=True,
-                            instructions=[
-                                "Answer questions about the user's dietary and fitness plans.",
-                                "Provide helpful, actionable advice.",
-                                "Be friendly and encouraging.",
-                                "If asked about something not in the plans, make reasonable recommendations based on their profile."
-                            ]
-                        )
-                        
-                        logger.debug("Streaming agent response")
-                        # Use st.write_stream to display the response
-                        response_generator = stream_response(agent, context)
-                        full_response = st.write_stream(response_generator)
-                        
-                        # Clear thinking indicator
-                        thinking_placeholder.empty()
-                        
-                        # Add the complete assistant message to history *after* streaming
-                        add_message("assistant", full_response)
-                        logger.info("Assistant response added to chat history")
-                        # Crucially, trigger a rerun *after* adding the message to display it from history
-                        st.rerun()
-                        
-                    except Exception as e:
-                        logger.error(f"Error in response generation: {str(e)}", exc_info=True)
-                        error_message = f"Sorry, I encountered an error: {str(e)}"
-                        st.markdown(error_message)
-                        # Add error message to history and rerun
-                        if st.session_state.chat_history[-1]['content'] != error_message:
-                             add_message("assistant", error_message)
-                             st.rerun()
-
-            st.markdown("</div>", unsafe_allow_html=True) # Close messages-container
-
-            st.markdown("<div class='input-container'>", unsafe_allow_html=True)
-            # Clear chat button (optional, can be placed elsewhere)
-            if st.button("🗑️ Clear Chat"):
-                st.session_state.chat_history = []
-                if st.session_state.user_id:
-                    persistent_state["chat_history"][st.session_state.user_id] = []
-                st.rerun()
-                
-            if prompt := st.chat_input("Ask about your plan or for more personalized advice..."):
-                logger.info(f"User question received: {prompt}")
-                add_message("user", prompt)
-                # Rerun immediately to display user message and trigger AI response generation above
-                st.rerun()
-            st.markdown("</div>", unsafe_allow_html=True) # Close input-container
+            display_chat_tab()
 
-            st.markdown("</div>", unsafe_allow_html=True) # Close chat-area
-        
         with tab3:
             st.markdown("<h2 class='sub-header'>⚙️ Settings & Management</h2>", unsafe_allow_html=True)
             st.markdown("Manage your profile and sessions here.")
             
+            cache_stats = plan_cache.stats()
+            st.caption(
+                f"Plan cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                f"({cache_stats['hit_rate']:.0%} hit rate), {cache_stats['entries']} cached plans"
+            )
+
+            model_registry = get_model_registry()
+            registry_stats = model_registry.stats
+            st.caption(
+                f"Model registry: {registry_stats['models_built']} clients built, "
+                f"{registry_stats['models_reused'] + registry_stats['agents_reused']} reuses, "
+                f"~{model_registry.saved_seconds() * 1000:.0f}ms of setup time saved"
+            )
+
+            for provider, metrics in scheduler.metrics().items():
+                st.caption(
+                    f"{provider}: queue depth {metrics['queue_depth']}, "
+                    f"wait avg {metrics['wait_avg']:.2f}s / p95 {metrics['wait_p95']:.2f}s, "
+                    f"{metrics['retries']} retries, circuit {metrics['breaker']}"
+                )
+
+            router_stats = get_router().stats()
+            counters = router_stats["counters"]
+            st.caption(
+                f"Routing: {counters.get('served_by_primary', 0)} served by the selected model, "
+                f"{counters.get('served_by_fallback', 0)} by the fallback "
+                f"({counters.get('error_failover', 0)} error failovers, {counters.get('timeout_failover', 0)} timeouts, "
+                f"{counters.get('hedge', 0)} hedges, avg hedge gain {router_stats['hedge_gain_avg']:.2f}s)"
+            )
+            coalescing = router_stats["coalescing"]
+            if coalescing:
+                st.caption(
+                    f"Request coalescing: {coalescing['coalesced']} of {coalescing['calls']} model requests "
+                    f"shared an identical in-flight call"
+                )
+
+            job_stats = get_job_queue().stats
+            st.caption(
+                f"Plan jobs: {job_stats['submitted']} started, {job_stats['attached']} attached to a running job, "
+                f"{job_stats['succeeded']} succeeded, {job_stats['failed']} failed"
+            )
+
             if st.button("🔄 Generate New Plans"):
                 # Keep user profile but regenerate plans
                 st.session_state.plans_generated = False
@@ -864,7 +962,7 @@ def main():
                 # Reset everything
                 st.session_state.user_id = None
                 st.session_state.plans_generated = False
-                st.session_state.chat_history = []
+                reset_chat()
                 st.rerun()
 
     # Footer
@@ -878,6 +976,11 @@ def main():
 
 if __name__ == "__main__":
     logger.info("Application starting")
-    main()
+    configure_tracing()
+    with get_tracer().span("streamlit.rerun", session=st.session_state.session_id):
+        main()
+    if STARTUP_PROFILE:
+        # The first run reports startup imports; later runs report anything loaded lazily since
+        get_profiler().report()
     logger.info("Application shutting down")
 
@@ -0,0 +1,150 @@
+import time
+import queue
+import logging
+import threading
+from contextlib import contextmanager
+
+from tracing import get_tracer
+
+# The provider SDKs (agno, httpx, google-genai, groq) and the secrets file are
+# loaded on first use, so importing this module stays cheap at app startup
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+GEMINI_MODEL_NAME = "gemini-2.5-pro-exp-03-25"
+GROQ_MODEL_NAME = "llama-3.3-70b-versatile"
+
+# Provider behind each model id, used for per-provider limits
+MODEL_PROVIDERS = {
+    GEMINI_MODEL_NAME: "google",
+    GROQ_MODEL_NAME: "groq",
+}
+
+# Model tried when the selected one fails or is too slow
+MODEL_FALLBACKS = {
+    GEMINI_MODEL_NAME: GROQ_MODEL_NAME,
+    GROQ_MODEL_NAME: GEMINI_MODEL_NAME,
+}
+
+# Keep-alive pool shared by every session talking to Groq (httpx.Limits arguments)
+GROQ_HTTP_LIMITS = {"max_connections": 50, "max_keepalive_connections": 20, "keepalive_expiry": 120}
+
+
+def create_model(model_id):
+    """Build a new client for `model_id`, importing only that provider's SDK; raises ValueError for unknown ids."""
+    if model_id == GEMINI_MODEL_NAME:
+        from agno.models.google.gemini import Gemini
+        from config.appconfig_cloud import GOOGLE_API_KEY
+        return Gemini(id=GEMINI_MODEL_NAME, api_key=GOOGLE_API_KEY)
+    if model_id == GROQ_MODEL_NAME:
+        import httpx
+        from agno.models.groq.groq import Groq
+        from config.appconfig_cloud import GROQ_API_KEY
+        http_client = httpx.Client(limits=httpx.Limits(**GROQ_HTTP_LIMITS))
+        return Groq(id=GROQ_MODEL_NAME, api_key=GROQ_API_KEY, http_client=http_client)
+    raise ValueError(f"Unknown model id: {model_id}")
+
+
+def build_agent(model, name, role, instructions, markdown=False):
+    """Build an agno Agent around a model client."""
+    from agno.agent import Agent
+    return Agent(name=name, role=role, model=model, markdown=markdown, instructions=list(instructions))
+
+
+class ModelRegistry:
+    """Process-wide registry of model clients and pooled agents.
+
+    Model clients are built once per model id by `model_factory` and shared by
+    every session, so their HTTP connection pools stay warm between reruns.
+    `agent_factory(model, name, role, instructions, markdown)` builds agents
+    (agno Agents by default).
+    Agents are not safe to run concurrently, so each template (model id plus
+    agent definition) keeps a pool of idle agents; `agent()` checks one out for
+    the duration of a call and returns it with its run memory cleared.
+    """
+
+    def __init__(self, model_factory=create_model, agent_factory=None):
+        self.model_factory = model_factory
+        self.agent_factory = agent_factory or build_agent
+        self._models = {}
+        self._agent_pools = {}
+        self._lock = threading.Lock()
+        self._model_locks = {}
+        self.stats = {
+            "models_built": 0,
+            "models_reused": 0,
+            "agents_built": 0,
+            "agents_reused": 0,
+            "model_build_seconds": 0.0,
+            "agent_build_seconds": 0.0,
+        }
+
+    def get_model(self, model_id):
+        """Return the shared client for `model_id`, building it on first use."""
+        model = self._models.get(model_id)
+        if model is not None:
+            self._count("models_reused")
+            return model
+
+        with self._lock:
+            model_lock = self._model_locks.setdefault(model_id, threading.Lock())
+        # Build each model at most once even if several sessions ask at the same time
+        with model_lock:
+            model = self._models.get(model_id)
+            if model is not None:
+                self._count("models_reused")
+                return model
+            started = time.perf_counter()
+            with get_tracer().span("model.init", model=model_id):
+                model = self.model_factory(model_id)
+            elapsed = time.perf_counter() - started
+            if model is None:
+                return None
+            self._models[model_id] = model
+            self._count("models_built", elapsed, "model_build_seconds")
+            logger.info(f"Built model client for {model_id} in {elapsed * 1000:.1f}ms")
+            return model
+
+    @contextmanager
+    def agent(self, model_id, name, role, instructions, markdown=False):
+        """Check out an agent for one run, reusing an idle one from the template's pool."""
+        key = (model_id, name, role, tuple(instructions), markdown)
+        with self._lock:
+            pool = self._agent_pools.setdefault(key, queue.SimpleQueue())
+
+        try:
+            agent = pool.get_nowait()
+            self._count("agents_reused")
+        except queue.Empty:
+            started = time.perf_counter()
+            agent = self.agent_factory(self.get_model(model_id), name, role, instructions, markdown=markdown)
+            self._count("agents_built", time.perf_counter() - started, "agent_build_seconds")
+
+        try:
+            yield agent
+        finally:
+            # Drop per-run history so pooled agents don't accumulate memory across users
+            memory = getattr(agent, "memory", None)
+            if memory is not None and hasattr(memory, "clear"):
+                memory.clear()
+            pool.put(agent)
+
+    def saved_seconds(self):
+        """Estimate the setup time avoided by reusing models and agents."""
+        with self._lock:
+            stats = dict(self.stats)
+        saved = 0.0
+        for kind in ("model", "agent"):
+            built = stats[f"{kind}s_built"]
+            if built:
+                saved += stats[f"{kind}s_reused"] * stats[f"{kind}_build_seconds"] / built
+        return saved
+
+    def _count(self, counter, elapsed=None, timer=None):
+        with self._lock:
+            self.stats[counter] += 1
+            if timer is not None:
+                self.stats[timer] += elapsed
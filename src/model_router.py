@@ -0,0 +1,403 @@
+import math
+import time
+import logging
+import threading
+import contextvars
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from chat_context import CHARS_PER_TOKEN, count_tokens
+from scheduler import DEFAULT_OUTPUT_TOKENS
+from tracing import get_tracer
+from model_registry import MODEL_FALLBACKS, MODEL_PROVIDERS
+from single_flight import SingleFlight, request_key
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+DEFAULT_HEDGE_QUANTILE = 0.95  # hedge once the primary is slower than this share of its recent calls
+MIN_HEDGE_DELAY = 2.0  # seconds; never hedge earlier than this
+MIN_LATENCY_SAMPLES = 20  # samples needed before the hedge threshold is trusted
+DEFAULT_FAILOVER_TIMEOUT = 90.0  # seconds before a silent primary is failed over
+LATENCY_SAMPLES = 200
+DECISION_SAMPLES = 200
+MAX_WORKERS = 32  # per provider, so a throttled provider can't take the other's threads
+
+
+class LatencyTracker:
+    """Rolling window of call latencies for one model."""
+
+    def __init__(self, size=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def percentile(self, quantile):
+        with self._lock:
+            ordered = sorted(self.samples)
+        if not ordered:
+            return None
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class ModelRouter:
+    """Routes agent calls to the selected model with failover and optional hedging.
+
+    A call first goes to the session's model. If it fails, or has not answered
+    within `failover_timeout`, the request is sent to the fallback model, rebuilt
+    for it by the agent's `prepare` hook when one is given.
+    With `hedge` enabled, a duplicate request is also sent to the fallback once
+    the primary has been running longer than its recent p95 latency, and the
+    first successful answer wins. Streams get the same treatment until they
+    produce content, with the p95 taken over time to first content. Every
+    decision is recorded so thresholds can be tuned from real traffic.
+
+    With `coalesce` enabled, identical requests (same model, agent, prompt and
+    history) that arrive while one is in flight share its answer, whichever
+    session sent them.
+    """
+
+    def __init__(self, registry, scheduler=None, fallbacks=None, hedge=False,
+                 hedge_quantile=DEFAULT_HEDGE_QUANTILE, failover_timeout=DEFAULT_FAILOVER_TIMEOUT, coalesce=True):
+        self.registry = registry
+        self.scheduler = scheduler
+        self.fallbacks = MODEL_FALLBACKS if fallbacks is None else fallbacks
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.failover_timeout = failover_timeout
+        self.latencies = {}
+        self.first_chunk_latencies = {}  # streams hedge on time to first content, not total time
+        self.decisions = deque(maxlen=DECISION_SAMPLES)
+        self.counters = Counter()
+        self.hedge_gains = deque(maxlen=DECISION_SAMPLES)
+        self.flights = SingleFlight() if coalesce else None
+        self._executors = {}  # provider -> its own worker pool
+        self._lock = threading.Lock()
+
+    def agent(self, model_id, spec, session_id="default", output_tokens=DEFAULT_OUTPUT_TOKENS, prepare=None):
+        """Return an agent look-alike for `spec` whose `run` is routed by this router.
+
+        `prepare(model_id)`, if given, returns the `(message, kwargs)` to send
+        when failing over to `model_id`, e.g. a context rebuilt for its token
+        budget; without it the fallback gets the primary's request unchanged.
+        """
+        return RoutedAgent(self, model_id, spec, session_id, output_tokens, prepare)
+
+    def hedge_delay(self, model_id, latencies=None):
+        """Seconds after which a duplicate request is sent, or None when hedging is off."""
+        if not self.hedge or not self.fallbacks.get(model_id):
+            return None
+        tracker = (self.latencies if latencies is None else latencies).get(model_id)
+        if tracker is None or len(tracker) < MIN_LATENCY_SAMPLES:
+            return None
+        return max(MIN_HEDGE_DELAY, tracker.percentile(self.hedge_quantile))
+
+    def stats(self):
+        """Routing counters, latency percentiles per model and the tail latency saved by hedging."""
+        with self._lock:
+            counters = dict(self.counters)
+            gains = list(self.hedge_gains)
+        summary = lambda trackers: {
+            model_id: {"p50": tracker.percentile(0.5), "p95": tracker.percentile(0.95), "samples": len(tracker)}
+            for model_id, tracker in trackers.items()
+        }
+        return {
+            "counters": counters,
+            "latency": summary(self.latencies),
+            "first_chunk_latency": summary(self.first_chunk_latencies),
+            "hedge_gain_avg": sum(gains) / len(gains) if gains else 0.0,
+            "recent_decisions": list(self.decisions)[-20:],
+            "coalescing": dict(self.flights.stats) if self.flights is not None else {},
+        }
+
+    def _tracker(self, model_id, latencies=None):
+        with self._lock:
+            return (self.latencies if latencies is None else latencies).setdefault(model_id, LatencyTracker())
+
+    def _record(self, decision, **details):
+        with self._lock:
+            self.counters[decision] += 1
+            self.decisions.append({"decision": decision, "at": time.time(), **details})
+        logger.info(f"Routing decision: {decision} {details}")
+
+    def _call(self, model_id, spec, session_id, output_tokens, message, kwargs):
+        """One complete attempt against `model_id`; runs on a router worker thread."""
+        started = time.perf_counter()
+        tracer = get_tracer()
+        with tracer.span("provider.call", model=model_id, session=session_id, agent=spec.get("name")):
+            with self.registry.agent(model_id, **spec) as agent:
+                if self.scheduler is not None:
+                    agent = self.scheduler.wrap(agent, MODEL_PROVIDERS.get(model_id), session_id, output_tokens)
+                response = agent.run(message, **kwargs)
+            if not getattr(response, "content", None):
+                raise ValueError(f"{model_id} returned an empty response")
+        self._tracker(model_id).record(time.perf_counter() - started)
+        if tracer.enabled:
+            tracer.count("tokens_in_total", _prompt_tokens(message, kwargs), model=model_id)
+            tracer.count("tokens_out_total", count_tokens(str(response.content)), model=model_id)
+        return response
+
+    def _executor(self, model_id):
+        """Worker pool for `model_id`'s provider; scheduler admission waits only hold that provider's threads."""
+        provider = MODEL_PROVIDERS.get(model_id, model_id)
+        with self._lock:
+            executor = self._executors.get(provider)
+            if executor is None:
+                executor = self._executors[provider] = ThreadPoolExecutor(
+                    max_workers=MAX_WORKERS, thread_name_prefix=f"model-router-{provider}"
+                )
+        return executor
+
+    def _submit(self, model_id, *args):
+        # Carry the caller's tracing context so provider spans nest under the request's span
+        return self._executor(model_id).submit(contextvars.copy_context().run, self._call, model_id, *args)
+
+    @staticmethod
+    def _fallback_request(fallback, message, kwargs, prepare):
+        """The `(message, kwargs)` to send to `fallback`: rebuilt by `prepare` when given."""
+        return prepare(fallback) if prepare is not None else (message, kwargs)
+
+    def run(self, model_id, spec, session_id, output_tokens, message, kwargs, prepare=None, on_served=None):
+        """Run the request with failover and hedging; `on_served(model_id)` is told which model answered."""
+        fallback = self.fallbacks.get(model_id)
+        started = time.perf_counter()
+        primary = self._submit(model_id, spec, session_id, output_tokens, message, kwargs)
+        pending = {primary: model_id}
+        hedge_at = self.hedge_delay(model_id)
+        failover_at = self.failover_timeout if fallback else None
+        secondary = None
+        last_error = None
+
+        while pending:
+            elapsed = time.perf_counter() - started
+            next_event = [t for t in (hedge_at, failover_at) if t is not None and secondary is None]
+            timeout = max(0.0, min(next_event) - elapsed) if next_event else None
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # Primary is slow: hedge at the p95 threshold, fail over at the hard timeout
+                hedged = hedge_at is not None and (failover_at is None or hedge_at <= failover_at)
+                reason = "hedge" if hedged else "timeout_failover"
+                secondary = self._submit(
+                    fallback, spec, session_id, output_tokens,
+                    *self._fallback_request(fallback, message, kwargs, prepare),
+                )
+                pending[secondary] = fallback
+                self._record(reason, primary=model_id, fallback=fallback, after=round(elapsed, 2))
+                continue
+
+            for future in done:
+                served_by = pending.pop(future)
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    logger.warning(f"{served_by} failed: {str(e)}")
+                    if future is primary and secondary is None and fallback:
+                        secondary = self._submit(
+                            fallback, spec, session_id, output_tokens,
+                            *self._fallback_request(fallback, message, kwargs, prepare),
+                        )
+                        pending[secondary] = fallback
+                        self._record("error_failover", primary=model_id, fallback=fallback, error=str(e)[:200])
+                    continue
+
+                latency = time.perf_counter() - started
+                if future is secondary:
+                    self._record("served_by_fallback", primary=model_id, fallback=served_by, latency=round(latency, 2))
+                    if not primary.done():
+                        # Measure how much tail latency the hedge saved once the primary finishes
+                        primary.add_done_callback(lambda f, won=latency: self._hedge_finished(f, started, won))
+                else:
+                    with self._lock:
+                        self.counters["served_by_primary"] += 1
+                if on_served is not None:
+                    on_served(served_by)
+                return response
+
+        raise last_error
+
+    def _open_stream(self, model_id, spec, session_id, output_tokens, message, kwargs):
+        """One streamed attempt against `model_id`."""
+        tracer = get_tracer()
+        # A generator can't hold a `with` span across yields, so this one is ended explicitly
+        span = tracer.span("provider.stream", model=model_id, session=session_id, agent=spec.get("name"))
+        started, output_chars, produced = time.perf_counter(), 0, False
+        try:
+            with self.registry.agent(model_id, **spec) as agent:
+                if self.scheduler is not None:
+                    agent = self.scheduler.wrap(agent, MODEL_PROVIDERS.get(model_id), session_id, output_tokens)
+                stream = agent.run(message, stream=True, **kwargs)
+                try:
+                    for chunk in stream:
+                        content = getattr(chunk, "content", None)
+                        if content:
+                            if not produced:
+                                first_chunk = time.perf_counter() - started
+                                self._tracker(model_id, self.first_chunk_latencies).record(first_chunk)
+                                tracer.observe("ttft_seconds", first_chunk, model=model_id)
+                            produced = True
+                            if isinstance(content, str):
+                                output_chars += len(content)
+                        yield chunk
+                finally:
+                    if hasattr(stream, "close"):
+                        stream.close()
+            span.end()
+            if tracer.enabled:
+                tracer.count("tokens_in_total", _prompt_tokens(message, kwargs), model=model_id)
+                tracer.count("tokens_out_total", math.ceil(output_chars / CHARS_PER_TOKEN), model=model_id)
+        except Exception as e:
+            span.end(error=e)
+            raise
+        finally:
+            # Also covers the consumer closing the stream early
+            span.end()
+
+    def _start_stream(self, model_id, spec, session_id, output_tokens, message, kwargs):
+        """Open a stream and read it up to its first content on a router worker thread.
+
+        Returns `(stream, future)`; the future resolves to the chunks read so far.
+        """
+        stream = self._open_stream(model_id, spec, session_id, output_tokens, message, kwargs)
+
+        def read_head():
+            head = []
+            for chunk in stream:
+                head.append(chunk)
+                if getattr(chunk, "content", None):
+                    return head
+            raise ValueError(f"{model_id} returned an empty response")
+
+        return stream, self._executor(model_id).submit(contextvars.copy_context().run, read_head)
+
+    def stream(self, model_id, spec, session_id, output_tokens, message, kwargs, prepare=None, on_served=None):
+        """Stream from the session's model, with the same failover and hedging as `run` until content arrives.
+
+        Until a stream has produced content it fails over on error or after
+        `failover_timeout`, and with `hedge` a duplicate is opened once the
+        primary's time to first content passes its recent p95; the first one
+        to produce content is kept. Errors after that are raised as they are.
+        `prepare` and `on_served` are as for `run`.
+        """
+        fallback = self.fallbacks.get(model_id)
+        started = time.perf_counter()
+        primary_stream, primary = self._start_stream(model_id, spec, session_id, output_tokens, message, kwargs)
+        fallback_args = lambda: (
+            spec, session_id, output_tokens, *self._fallback_request(fallback, message, kwargs, prepare)
+        )
+        pending = {primary: (model_id, primary_stream)}
+        hedge_at = self.hedge_delay(model_id, self.first_chunk_latencies)
+        failover_at = self.failover_timeout if fallback else None
+        secondary = None
+        last_error = None
+        winner = None
+
+        try:
+            while pending and winner is None:
+                elapsed = time.perf_counter() - started
+                next_event = [t for t in (hedge_at, failover_at) if t is not None and secondary is None]
+                timeout = max(0.0, min(next_event) - elapsed) if next_event else None
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+                if not done:
+                    hedged = hedge_at is not None and (failover_at is None or hedge_at <= failover_at)
+                    reason = "hedge" if hedged else "timeout_failover"
+                    secondary_stream, secondary = self._start_stream(fallback, *fallback_args())
+                    pending[secondary] = (fallback, secondary_stream)
+                    self._record(reason, primary=model_id, fallback=fallback, after=round(elapsed, 2))
+                    continue
+
+                for future in done:
+                    served_by, stream = pending.pop(future)
+                    try:
+                        head = future.result()
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"{served_by} failed before streaming: {str(e)}")
+                        if future is primary and secondary is None and fallback:
+                            secondary_stream, secondary = self._start_stream(fallback, *fallback_args())
+                            pending[secondary] = (fallback, secondary_stream)
+                            self._record("error_failover", primary=model_id, fallback=fallback, error=str(e)[:200])
+                        continue
+                    winner = (future, served_by, stream, head)
+                    break
+        finally:
+            # Losing streams are closed once their worker has stopped reading them
+            for future, (_, stream) in pending.items():
+                future.add_done_callback(lambda _, stream=stream: stream.close())
+
+        if winner is None:
+            raise last_error
+        future, served_by, stream, head = winner
+        latency = time.perf_counter() - started
+        if future is secondary:
+            self._record("served_by_fallback", primary=model_id, fallback=served_by, latency=round(latency, 2))
+            if not primary.done():
+                primary.add_done_callback(lambda f, won=latency: self._hedge_finished(f, started, won))
+        else:
+            with self._lock:
+                self.counters["served_by_primary"] += 1
+        if on_served is not None:
+            on_served(served_by)
+
+        try:
+            yield from head
+            yield from stream
+        finally:
+            stream.close()
+
+    def _hedge_finished(self, future, started, winner_latency):
+        if future.exception() is None:
+            gain = (time.perf_counter() - started) - winner_latency
+            with self._lock:
+                self.hedge_gains.append(gain)
+            logger.info(f"Hedge saved {gain:.2f}s over the primary")
+
+
+def _prompt_tokens(message, kwargs):
+    """Estimated prompt size: the message plus any history passed alongside it."""
+    history = kwargs.get("messages") or []
+    return count_tokens(message or "") + sum(
+        count_tokens(str(m.get("content", "") if isinstance(m, dict) else getattr(m, "content", ""))) for m in history
+    )
+
+
+class RoutedAgent:
+    """Agent look-alike that sends every run through a ModelRouter.
+
+    `served_by` is the model that answered the last run, or None when it
+    isn't known (not finished, or coalesced onto another caller's request).
+    """
+
+    def __init__(self, router, model_id, spec, session_id, output_tokens, prepare=None):
+        self.router = router
+        self.model_id = model_id
+        self.spec = spec
+        self.session_id = session_id
+        self.output_tokens = output_tokens
+        self.prepare = prepare
+        self.served_by = None
+
+    def _served(self, model_id):
+        self.served_by = model_id
+
+    def run(self, message, stream=False, **kwargs):
+        router, args = self.router, (self.model_id, self.spec, self.session_id, self.output_tokens, message, kwargs)
+        routed = {"prepare": self.prepare, "on_served": self._served}
+        self.served_by = None
+        if router.flights is None:
+            return router.stream(*args, **routed) if stream else router.run(*args, **routed)
+
+        key = request_key(self.model_id, self.spec, message, kwargs.get("messages"))
+        if stream:
+            return router.flights.stream(key, lambda: router.stream(*args, **routed))
+        return router.flights.do(key, lambda: router.run(*args, **routed))
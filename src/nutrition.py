@@ -0,0 +1,161 @@
+import logging
+from functools import lru_cache
+from dataclasses import dataclass, asdict
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+# TDEE = BMR x activity multiplier (standard Harris-Benedict activity factors)
+ACTIVITY_MULTIPLIERS = {
+    "Sedentary": 1.2,
+    "Lightly Active": 1.375,
+    "Moderately Active": 1.55,
+    "Very Active": 1.725,
+    "Extremely Active": 1.9,
+}
+DEFAULT_ACTIVITY_MULTIPLIER = 1.375
+# Mifflin-St Jeor sex constant; "Other" uses the midpoint
+SEX_CONSTANTS = {"Male": 5.0, "Female": -161.0}
+DEFAULT_SEX_CONSTANT = -78.0
+# Daily calorie adjustment relative to TDEE, and protein in g per kg bodyweight, per fitness goal
+GOAL_CALORIE_ADJUSTMENTS = {
+    "Lose Weight": -500,
+    "Gain Muscle": 300,
+    "Endurance": 200,
+    "Stay Fit": 0,
+    "Strength Training": 200,
+}
+GOAL_PROTEIN_PER_KG = {
+    "Lose Weight": 2.0,
+    "Gain Muscle": 1.8,
+    "Endurance": 1.4,
+    "Stay Fit": 1.4,
+    "Strength Training": 1.8,
+}
+DEFAULT_PROTEIN_PER_KG = 1.6
+# Share of calories from fat per dietary preference; carbohydrates fill the rest
+DIET_FAT_SHARES = {"Keto": 0.70, "Low Carb": 0.45}
+DEFAULT_FAT_SHARE = 0.28
+MIN_CALORIES = 1200
+# BMI categories (lower bound, label), WHO adult cut-offs
+BMI_CATEGORIES = [(0, "Underweight"), (18.5, "Healthy"), (25, "Overweight"), (30, "Obese")]
+METRICS_CACHE_SIZE = 4096
+
+
+@dataclass(frozen=True)
+class NutritionMetrics:
+    bmi: float
+    bmi_category: str
+    bmr: int
+    tdee: int
+    target_calories: int
+    protein_g: int
+    fat_g: int
+    carbs_g: int
+
+    def to_dict(self):
+        return asdict(self)
+
+    def to_facts(self):
+        """Render the metrics as the structured facts the plan agents receive."""
+        return (
+            f"BMI: {self.bmi} ({self.bmi_category})\n"
+            f"BMR (Mifflin-St Jeor): {self.bmr} kcal/day\n"
+            f"TDEE: {self.tdee} kcal/day\n"
+            f"Daily calorie target: {self.target_calories} kcal\n"
+            f"Macro targets: protein {self.protein_g}g, fat {self.fat_g}g, carbohydrates {self.carbs_g}g"
+        )
+
+
+#--------------------------------------
+# Vectorised formulas
+#--------------------------------------
+def bmi(weights, heights):
+    """BMI for arrays of weights (kg) and heights (cm)."""
+    heights_m = np.asarray(heights, dtype=np.float64) / 100.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.asarray(weights, dtype=np.float64) / heights_m ** 2
+
+
+def bmi_category_codes(values):
+    """Index into BMI_CATEGORIES for each BMI value."""
+    lowers = np.array([lower for lower, _ in BMI_CATEGORIES])
+    return np.searchsorted(lowers, values, side="right") - 1
+
+
+def compute_metrics_batch(ages, weights, heights, sexes, activity_levels, fitness_goals, dietary_preferences):
+    """Nutrition metrics for many profiles at once; each argument is a sequence with one entry per profile.
+
+    Returns a dict of NumPy arrays keyed like NutritionMetrics' fields
+    (`bmi_category` holds indexes into BMI_CATEGORIES).
+    """
+    ages = np.asarray(ages, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+    heights = np.asarray(heights, dtype=np.float64)
+    sex_constants = np.array([SEX_CONSTANTS.get(s, DEFAULT_SEX_CONSTANT) for s in sexes])
+    multipliers = np.array([ACTIVITY_MULTIPLIERS.get(a, DEFAULT_ACTIVITY_MULTIPLIER) for a in activity_levels])
+    adjustments = np.array([GOAL_CALORIE_ADJUSTMENTS.get(g, 0) for g in fitness_goals], dtype=np.float64)
+    protein_per_kg = np.array([GOAL_PROTEIN_PER_KG.get(g, DEFAULT_PROTEIN_PER_KG) for g in fitness_goals])
+    fat_shares = np.array([DIET_FAT_SHARES.get(d, DEFAULT_FAT_SHARE) for d in dietary_preferences])
+
+    bmi_values = bmi(weights, heights)
+    bmr = 10 * weights + 6.25 * heights - 5 * ages + sex_constants
+    tdee = bmr * multipliers
+    target = np.maximum(tdee + adjustments, MIN_CALORIES)
+    protein = protein_per_kg * weights
+    # 4 kcal/g protein and carbs, 9 kcal/g fat; fat never pushes the total past the target
+    fat = np.minimum(target * fat_shares, np.maximum(target - protein * 4, 0)) / 9
+    # Carbohydrates take the remaining calories
+    carbs = np.maximum(target - protein * 4 - fat * 9, 0) / 4
+
+    return {
+        "bmi": np.round(bmi_values, 1),
+        "bmi_category": bmi_category_codes(bmi_values),
+        "bmr": np.rint(bmr).astype(int),
+        "tdee": np.rint(tdee).astype(int),
+        "target_calories": np.rint(target).astype(int),
+        "protein_g": np.rint(protein).astype(int),
+        "fat_g": np.rint(fat).astype(int),
+        "carbs_g": np.rint(carbs).astype(int),
+    }
+
+
+def metrics_from_batch(batch, i):
+    """The `i`-th profile's NutritionMetrics out of a `compute_metrics_batch` result."""
+    return NutritionMetrics(
+        bmi=float(batch["bmi"][i]),
+        bmi_category=BMI_CATEGORIES[int(batch["bmi_category"][i])][1],
+        **{field: int(batch[field][i]) for field in ("bmr", "tdee", "target_calories", "protein_g", "fat_g", "carbs_g")},
+    )
+
+
+#--------------------------------------
+# Per-profile entry points
+#--------------------------------------
+def _metrics_key(user_data):
+    return (
+        float(user_data["age"]), float(user_data["weight"]), float(user_data["height"]), user_data.get("sex"),
+        user_data.get("activity_level"), user_data.get("fitness_goals"), user_data.get("dietary_preferences"),
+    )
+
+
+@lru_cache(maxsize=METRICS_CACHE_SIZE)
+def _cached_metrics(key):
+    return metrics_from_batch(compute_metrics_batch(*([value] for value in key)), 0)
+
+
+def nutrition_metrics(user_data):
+    """NutritionMetrics for one profile dict, memoized on the fields the formulas use."""
+    return _cached_metrics(_metrics_key(user_data))
+
+
+def nutrition_metrics_many(profiles):
+    """NutritionMetrics for a list of profile dicts, computed in one vectorised pass."""
+    if not profiles:
+        return []
+    batch = compute_metrics_batch(*zip(*(_metrics_key(p) for p in profiles)))
+    return [metrics_from_batch(batch, i) for i in range(len(profiles))]
@@ -0,0 +1,188 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+DEFAULT_TTL = 7 * 24 * 3600  # seconds
+DEFAULT_MAX_ENTRIES = 5000
+
+
+#--------------------------------------
+# Cache keys
+#--------------------------------------
+def normalize_profile(user_data):
+    """Return a canonical copy of a profile so equivalent form inputs compare equal."""
+    normalized = {}
+    for key, value in user_data.items():
+        if isinstance(value, float):
+            value = round(value, 1)
+        elif isinstance(value, str):
+            value = value.strip()
+        elif isinstance(value, (list, tuple, set)):
+            value = sorted({str(item).strip() for item in value})
+        normalized[key] = value
+    return normalized
+
+
+def plan_cache_key(user_data, model_id, instructions):
+    """Content hash of the normalized profile, the model id and the agent instructions."""
+    payload = {
+        "profile": normalize_profile(user_data),
+        "model": model_id,
+        "instructions": list(instructions),
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+#--------------------------------------
+# Backends
+#--------------------------------------
+class MemoryCacheBackend:
+    """In-process LRU backend."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, value, created_at):
+        with self._lock:
+            self._entries[key] = (value, created_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """Local disk backend so cached plans survive restarts and are shared by processes on one host."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS plan_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_plan_cache_access ON plan_cache(last_access)")
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM plan_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE plan_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, created_at):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), created_at, time.time()),
+            )
+            # Evict least recently used entries beyond the size limit
+            self._conn.execute(
+                "DELETE FROM plan_cache WHERE key IN ("
+                " SELECT key FROM plan_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0]
+
+
+#--------------------------------------
+# Plan cache
+#--------------------------------------
+class PlanCache:
+    """TTL cache for generated plans on top of a pluggable backend."""
+
+    def __init__(self, backend, ttl=DEFAULT_TTL):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss or an expired entry."""
+        entry = self.backend.get(key)
+        if entry is not None and time.time() - entry[1] > self.ttl:
+            logger.debug(f"Plan cache entry {key[:12]} expired")
+            self.backend.delete(key)
+            entry = None
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        logger.info(f"Plan cache {'hit' if entry else 'miss'} for {key[:12]}")
+        return entry[0] if entry else None
+
+    def set(self, key, value):
+        self.backend.set(key, value, time.time())
+
+    def stats(self):
+        """Return hit/miss counters and the current number of entries."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self.backend),
+        }
+
+
+def create_plan_cache(backend="memory", path=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """Build a PlanCache from a backend name ("memory" or "sqlite")."""
+    if backend == "memory":
+        return PlanCache(MemoryCacheBackend(max_entries), ttl=ttl)
+    if backend == "sqlite":
+        if path is None:
+            raise ValueError("The sqlite plan cache backend needs a path")
+        return PlanCache(SQLiteCacheBackend(path, max_entries), ttl=ttl)
+    raise ValueError(f"Unknown plan cache backend: {backend}")
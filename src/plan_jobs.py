@@ -0,0 +1,137 @@
+import time
+import uuid
+import logging
+import threading
+import contextvars
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+
+from plan_service import DEFAULT_AGENT_TIMEOUT, generate_plans, plan_key
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+DEFAULT_JOB_WORKERS = 4
+DEFAULT_JOB_RETENTION = 3600  # seconds a finished job stays available to pollers
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+@dataclass
+class PlanJob:
+    job_id: str
+    key: str
+    model_id: str
+    user_ids: set = field(default_factory=set)
+    status: str = QUEUED
+    progress: float = 0.0
+    message: str = "Waiting for a worker..."
+    result: object = None  # PlanResult once done
+    partial: dict = field(default_factory=dict)  # "dietary"/"fitness" -> plan parsed so far while running
+    error: str = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+
+class PlanJobQueue:
+    """Runs plan generation as background jobs that outlive Streamlit reruns.
+
+    Jobs run on a small worker pool and write their plans to `store` for every
+    user attached to them. Submitting a profile that already has a queued or
+    running job returns that job instead of starting (and paying for) another.
+    """
+
+    def __init__(self, store, router, cache=None, max_workers=DEFAULT_JOB_WORKERS,
+                 timeout=DEFAULT_AGENT_TIMEOUT, retention=DEFAULT_JOB_RETENTION):
+        self.store = store
+        self.router = router
+        self.cache = cache
+        self.timeout = timeout
+        self.retention = retention
+        self.jobs = {}
+        self._active = {}  # plan key -> job still queued or running
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="plan-job")
+        self.stats = {"submitted": 0, "attached": 0, "succeeded": 0, "failed": 0}
+
+    def submit(self, user_id, user_data, model_id, session_id="default"):
+        """Queue plan generation for `user_id` and return its job, reusing an identical running one."""
+        key = plan_key(user_data, model_id)
+        with self._lock:
+            self._prune()
+            job = self._active.get(key)
+            if job is not None:
+                job.user_ids.add(user_id)
+                self.stats["attached"] += 1
+                logger.info(f"Attached user {user_id} to running plan job {job.job_id}")
+                return job
+
+            job = PlanJob(job_id=str(uuid.uuid4()), key=key, model_id=model_id, user_ids={user_id})
+            self.jobs[job.job_id] = job
+            self._active[key] = job
+            self.stats["submitted"] += 1
+
+        logger.info(f"Queued plan job {job.job_id} for user {user_id}")
+        # Run with the submitter's logging context so the job's records carry its session and user ids
+        self._executor.submit(contextvars.copy_context().run, self._run, job, user_data, session_id)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def _run(self, job, user_data, session_id):
+        job.status = RUNNING
+        started = time.perf_counter()
+
+        def progress(message, fraction):
+            job.message, job.progress = message, fraction
+
+        def on_partial(key, plan):
+            # Both agents report from their own threads
+            with self._lock:
+                job.partial = {**job.partial, key: plan}
+
+        try:
+            result = generate_plans(
+                user_data, job.model_id, self.router, cache=self.cache, timeout=self.timeout,
+                session_id=session_id, progress=progress, on_partial=on_partial,
+            )
+            # Detach before saving so users attaching from now on start a fresh job
+            with self._lock:
+                self._active.pop(job.key, None)
+                user_ids = set(job.user_ids)
+            for user_id in user_ids:
+                self.store.save_plans(user_id, result.dietary_plan, result.fitness_plan,
+                                      retrieval_index=result.retrieval_index)
+            job.result = result
+            # Status and finish time change together so _prune never sees a finished job without one
+            with self._lock:
+                job.status, job.progress, job.message = DONE, 1.0, "Your plans are ready"
+                job.finished_at = time.time()
+                self.stats["succeeded"] += 1
+            logger.info(f"Plan job {job.job_id} finished in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            logger.error(f"Plan job {job.job_id} failed: {str(e)}", exc_info=True)
+            with self._lock:
+                self._active.pop(job.key, None)
+                job.error = str(e)
+                job.status, job.message = FAILED, "Plan generation failed"
+                job.finished_at = time.time()
+                self.stats["failed"] += 1
+
+    def _prune(self):
+        """Forget finished jobs nobody has polled for a while."""
+        cutoff = time.time() - self.retention
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished and job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
@@ -0,0 +1,79 @@
+import re
+import json
+import logging
+import functools
+from pathlib import Path
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+STYLES_PATH = Path(__file__).parent / "styles.css"
+PLAN_CARD_CACHE_SIZE = 256  # rendered plan versions kept per process
+
+
+class PlanCard(NamedTuple):
+    """A plan card's markdown, one string per Streamlit element."""
+    header: str  # HTML title
+    intro: str  # section heading and summary box (HTML allowed)
+    body: str  # model-written markdown (meal plan or routine)
+    side: str  # side column heading and boxes (HTML allowed)
+
+
+CARD_LAYOUTS = {
+    "dietary": {
+        "title": "🍽️ Your Personalized Dietary Plan",
+        "intro": ("🎯 Why this plan works", "why_this_plan_works", "Information not available"),
+        "body": ("🍽️ Meal Plan", "meal_plan", "Plan not available"),
+        "side": ("⚠️ Important Considerations", "important_considerations", "warning-box"),
+    },
+    "fitness": {
+        "title": "💪 Your Personalized Fitness Plan",
+        "intro": ("🎯 Goals", "goals", "Goals not specified"),
+        "body": ("🏋️‍♂️ Exercise Routine", "routine", "Routine not available"),
+        "side": ("💡 Pro Tips", "tips", "tip-box"),
+    },
+}
+
+
+def plan_card(kind, plan):
+    """Rendered markdown for a "dietary" or "fitness" plan, built once per plan version."""
+    # The serialized plan is the version: an unchanged plan hits the cache on every rerun
+    return _build_card(kind, json.dumps(plan, sort_keys=True, default=str))
+
+
+@functools.lru_cache(maxsize=PLAN_CARD_CACHE_SIZE)
+def _build_card(kind, plan_json):
+    plan = json.loads(plan_json)
+    layout = CARD_LAYOUTS[kind]
+    intro_heading, intro_key, intro_default = layout["intro"]
+    body_heading, body_key, body_default = layout["body"]
+    side_heading, side_key, box_class = layout["side"]
+
+    items = plan.get(side_key, [])
+    if isinstance(items, str):
+        # Plans saved before considerations/tips were lists
+        items = [line.strip() for line in items.split("\n") if line.strip()]
+    boxes = "\n\n".join(f"<div class='{box_class}'>{item}</div>" for item in items)
+
+    return PlanCard(
+        header=f"<h3 class='plan-header'>{layout['title']}</h3>",
+        intro=(
+            f"### {intro_heading}\n\n<div class='success-box'>{plan.get(intro_key, intro_default)}</div>\n\n"
+            f"### {body_heading}"
+        ),
+        body=plan.get(body_key, body_default),
+        side=f"### {side_heading}\n\n{boxes}",
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def load_styles():
+    """The app's stylesheet as a minified <style> block, read once per process."""
+    css = STYLES_PATH.read_text(encoding="utf-8")
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{}:;,])\s*", r"\1", css).replace(";}", "}")
+    return f"<style>{css.strip()}</style>"
@@ -0,0 +1,177 @@
+import os
+import re
+import math
+import logging
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+BM25_K1 = 1.5
+BM25_B = 0.75
+EMBEDDING_MODEL_NAME = os.getenv("PLAN_EMBEDDING_MODEL")  # e.g. "all-MiniLM-L6-v2"; unset disables embeddings
+EMBEDDING_WEIGHT = 0.5  # share of the hybrid score coming from embeddings
+
+STOPWORDS = frozenset("""
+a an and are as at be but by can do does for from have how i in is it my of on or should so that the
+this to was what when which with you your me about any there their they them we our
+""".split())
+
+# Markdown headings, bold lines ("**Breakfast (7:00 AM):**") and short "Title:" lines start a section
+HEADING_PATTERN = re.compile(r"^\s*(#{1,6}\s+.+|\*\*[^*]{2,80}\*\*:?\s*|[A-Z][\w ()/&,-]{2,60}:)\s*$")
+
+
+#--------------------------------------
+# Sectioning
+#--------------------------------------
+def split_sections(text, source):
+    """Split a generated plan into titled sections (meals, warm-up/main/cool-down blocks, ...)."""
+    sections = []
+    title, lines = None, []
+
+    def close():
+        body = "\n".join(lines).strip()
+        if body or title:
+            sections.append({"source": source, "title": title or source.title(), "text": body})
+
+    for line in (text or "").splitlines():
+        if HEADING_PATTERN.match(line):
+            close()
+            title, lines = line.strip().strip("#* :").strip(), []
+        else:
+            lines.append(line)
+    close()
+    return sections
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords and with a light plural strip."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+#--------------------------------------
+# Optional embeddings
+#--------------------------------------
+_embedding_model = None
+
+
+def _get_embedding_model():
+    """Load the local sentence-transformers model on first use, or return None if unavailable."""
+    global _embedding_model
+    if not EMBEDDING_MODEL_NAME:
+        return None
+    if _embedding_model is None:
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            logger.warning("PLAN_EMBEDDING_MODEL is set but sentence-transformers is not installed")
+            return None
+        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        logger.info(f"Loaded embedding model {EMBEDDING_MODEL_NAME}")
+    return _embedding_model
+
+
+def _embed(texts):
+    model = _get_embedding_model()
+    if model is None:
+        return None
+    return [list(map(float, vector)) for vector in model.encode(texts, normalize_embeddings=True)]
+
+
+#--------------------------------------
+# Index
+#--------------------------------------
+class PlanIndex:
+    """BM25 index over plan sections, optionally blended with embedding similarity.
+
+    The index is plain data (`to_dict`/`from_dict`) so it can be stored with
+    the plans and restored without re-tokenizing anything.
+    """
+
+    def __init__(self, sections, term_freqs, doc_freqs, doc_lengths, embeddings=None):
+        self.sections = sections
+        self.term_freqs = term_freqs
+        self.doc_freqs = doc_freqs
+        self.doc_lengths = doc_lengths
+        self.avg_length = sum(doc_lengths) / len(doc_lengths) if doc_lengths else 0.0
+        self.embeddings = embeddings
+
+    @classmethod
+    def build(cls, dietary_text, fitness_text):
+        sections = split_sections(dietary_text, "dietary") + split_sections(fitness_text, "fitness")
+        term_freqs, doc_freqs, doc_lengths = [], Counter(), []
+        for section in sections:
+            tokens = tokenize(f"{section['title']} {section['title']} {section['text']}")
+            counts = Counter(tokens)
+            term_freqs.append(dict(counts))
+            doc_freqs.update(counts.keys())
+            doc_lengths.append(len(tokens))
+        embeddings = _embed([f"{s['title']}\n{s['text']}" for s in sections]) if sections else None
+        logger.info(f"Indexed {len(sections)} plan sections")
+        return cls(sections, term_freqs, dict(doc_freqs), doc_lengths, embeddings)
+
+    def to_dict(self):
+        return {
+            "sections": self.sections,
+            "term_freqs": self.term_freqs,
+            "doc_freqs": self.doc_freqs,
+            "doc_lengths": self.doc_lengths,
+            "embeddings": self.embeddings,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["sections"], data["term_freqs"], data["doc_freqs"], data["doc_lengths"],
+                   data.get("embeddings"))
+
+    def search(self, query, k=4):
+        """Return up to `k` `(score, section)` pairs most relevant to `query`, best first."""
+        if not self.sections:
+            return []
+        scores = self._bm25_scores(tokenize(query))
+
+        if self.embeddings:
+            query_vector = _embed([query])
+            if query_vector:
+                top = max(scores) or 1.0
+                scores = [
+                    (1 - EMBEDDING_WEIGHT) * score / top
+                    + EMBEDDING_WEIGHT * sum(a * b for a, b in zip(query_vector[0], vector))
+                    for score, vector in zip(scores, self.embeddings)
+                ]
+
+        ranked = sorted(range(len(self.sections)), key=lambda i: scores[i], reverse=True)
+        return [(scores[i], self.sections[i]) for i in ranked[:k] if scores[i] > 0]
+
+    def _bm25_scores(self, query_tokens):
+        total = len(self.sections)
+        scores = [0.0] * total
+        for token in set(query_tokens):
+            df = self.doc_freqs.get(token)
+            if not df:
+                continue
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for i, freqs in enumerate(self.term_freqs):
+                tf = freqs.get(token)
+                if tf:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[i] / (self.avg_length or 1))
+                    scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def render_context(self, query, k=4):
+        """Plan context for a chat question: the top-k sections, or an outline if nothing matches."""
+        hits = self.search(query, k)
+        if not hits:
+            outline = ", ".join(f"{s['title']} ({s['source']})" for s in self.sections)
+            return f"Plan sections available: {outline}" if outline else ""
+        parts = [f"[{section['source'].title()} Plan - {section['title']}]\n{section['text']}" for _, section in hits]
+        return "\n\n".join(parts)
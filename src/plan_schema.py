@@ -0,0 +1,237 @@
+import json
+import logging
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+# Used when a plan comes back as free text rather than the requested JSON
+DEFAULT_WHY_THIS_PLAN_WORKS = "High Protein, Healthy Fats, Moderate Carbohydrates, and Caloric Balance"
+DEFAULT_CONSIDERATIONS = [
+    "Hydration: Drink plenty of water throughout the day",
+    "Electrolytes: Monitor sodium, potassium, and magnesium levels",
+    "Fiber: Ensure adequate intake through vegetables and fruits",
+    "Listen to your body: Adjust portion sizes as needed",
+]
+DEFAULT_GOALS = "Build strength, improve endurance, and maintain overall fitness"
+DEFAULT_TIPS = [
+    "Track your progress regularly",
+    "Allow proper rest between workouts",
+    "Focus on proper form",
+    "Stay consistent with your routine",
+]
+MEAL_SLOTS = ("breakfast", "lunch", "dinner", "snack")
+PHASES = ("warm-up", "main", "cool-down")
+
+
+#--------------------------------------
+# Schemas
+#--------------------------------------
+class Meal(BaseModel):
+    slot: str = Field(description="breakfast, lunch, dinner or snack")
+    name: str
+    portion: str = Field("", description="amount to eat, e.g. '1 bowl (350g)'")
+    calories: Optional[int] = None
+    notes: str = ""
+
+
+class DietaryPlanSchema(BaseModel):
+    why_this_plan_works: str = Field(description="two or three sentences")
+    meals: List[Meal]
+    important_considerations: List[str] = Field(default_factory=list)
+
+
+class Exercise(BaseModel):
+    phase: str = Field(description="warm-up, main or cool-down")
+    name: str
+    prescription: str = Field(description="sets x reps, or duration")
+    notes: str = ""
+
+
+class FitnessPlanSchema(BaseModel):
+    goals: str = Field(description="one or two sentences")
+    routine: List[Exercise]
+    tips: List[str] = Field(default_factory=list)
+
+
+def schema_instruction(schema):
+    """Agent instruction asking for a JSON answer matching a pydantic schema."""
+    return ("Respond with a single JSON object and nothing else (no markdown fences) matching this JSON schema: "
+            + json.dumps(schema.model_json_schema(), separators=(",", ":")))
+
+
+#--------------------------------------
+# Incremental parsing
+#--------------------------------------
+class IncrementalJSONParser:
+    """Parses a JSON object as it streams in, returning the complete part seen so far.
+
+    Characters are scanned once, tracking open containers and strings, and the
+    last position where everything before it is a complete value is
+    remembered. Feeding text returns that prefix, with its open containers
+    closed, parsed into a dict, or None if nothing new became complete.
+    Anything before the first `{` (e.g. a markdown fence) is skipped.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._start = None
+        self._stack = []  # open containers, "{" or "["
+        self._expect_key = []  # per open container: whether the next string is an object key
+        self._in_string = False
+        self._escaped = False
+        self._string_is_key = False
+        self._cut = None  # (end index, closing brackets) of the last complete prefix
+        self._emitted = None
+
+    def feed(self, delta):
+        self.text += delta
+        while self._pos < len(self.text) and not self.done:
+            self._scan(self.text[self._pos], self._pos)
+            self._pos += 1
+
+        if self._cut is None or self._cut == self._emitted:
+            return None
+        end, closers = self._cut
+        try:
+            partial = json.loads(self.text[self._start:end] + closers)
+        except ValueError:
+            return None
+        self._emitted = self._cut
+        return partial
+
+    def _scan(self, ch, i):
+        if self._start is None:
+            if ch == "{":
+                self._start = i
+                self._stack.append("{")
+                self._expect_key.append(True)
+            return
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif ch == "\\":
+                self._escaped = True
+            elif ch == '"':
+                self._in_string = False
+                if not self._string_is_key:
+                    self._mark(i + 1)
+            return
+
+        if ch == '"':
+            self._in_string = True
+            self._string_is_key = self._stack[-1] == "{" and self._expect_key[-1]
+        elif ch in "{[":
+            self._stack.append(ch)
+            self._expect_key.append(ch == "{")
+        elif ch in "}]":
+            self._stack.pop()
+            self._expect_key.pop()
+            self._mark(i + 1)
+            self.done = not self._stack
+        elif ch == ":":
+            self._expect_key[-1] = False
+        elif ch == ",":
+            # Whatever preceded the comma (including numbers and literals) is complete
+            self._mark(i)
+            self._expect_key[-1] = self._stack[-1] == "{"
+
+    def _mark(self, end):
+        self._cut = (end, "".join("}" if c == "{" else "]" for c in reversed(self._stack)))
+
+
+def parse_plan(text, schema):
+    """Validate a complete JSON answer against `schema`; returns a plain dict, or None if it doesn't conform."""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        return None
+    try:
+        return schema.model_validate_json(text[start:end + 1]).model_dump()
+    except ValidationError as e:
+        logger.warning(f"Plan did not match {schema.__name__}: {str(e)[:300]}")
+        return None
+
+
+#--------------------------------------
+# Plan dicts
+#--------------------------------------
+def render_meals_markdown(meals):
+    lines = []
+    for slot in MEAL_SLOTS + tuple(sorted({m.get("slot", "") for m in meals} - set(MEAL_SLOTS))):
+        slot_meals = [m for m in meals if (m.get("slot") or "").lower() == slot]
+        if not slot_meals:
+            continue
+        lines.append(f"## {slot.title() or 'Other'}")
+        for meal in slot_meals:
+            details = ", ".join(part for part in (
+                meal.get("portion"), f"{meal['calories']} kcal" if meal.get("calories") else None
+            ) if part)
+            line = f"- **{meal.get('name', '')}**" + (f" ({details})" if details else "")
+            lines.append(line + (f": {meal['notes']}" if meal.get("notes") else ""))
+    return "\n".join(lines)
+
+
+def render_routine_markdown(routine):
+    lines = []
+    for phase in PHASES + tuple(sorted({e.get("phase", "") for e in routine} - set(PHASES))):
+        phase_exercises = [e for e in routine if (e.get("phase") or "").lower() == phase]
+        if not phase_exercises:
+            continue
+        lines.append(f"## {phase.title() or 'Other'}")
+        for exercise in phase_exercises:
+            line = f"- **{exercise.get('name', '')}**"
+            if exercise.get("prescription"):
+                line += f": {exercise['prescription']}"
+            lines.append(line + (f" ({exercise['notes']})" if exercise.get("notes") else ""))
+    return "\n".join(lines)
+
+
+def build_dietary_plan(content):
+    """Dietary plan dict from a structured answer (dict) or a free-text one (str).
+
+    Structured fields are kept as parsed; `meal_plan` always holds a markdown
+    rendering for search and chat context.
+    """
+    if isinstance(content, dict):
+        meals = [m for m in content.get("meals") or [] if isinstance(m, dict)]
+        return {
+            "why_this_plan_works": content.get("why_this_plan_works") or "",
+            "meals": meals,
+            "important_considerations": list(content.get("important_considerations") or []),
+            "meal_plan": render_meals_markdown(meals),
+        }
+    plan = {"why_this_plan_works": DEFAULT_WHY_THIS_PLAN_WORKS, "important_considerations": list(DEFAULT_CONSIDERATIONS)}
+    if content:
+        plan["meal_plan"] = content
+    return plan
+
+
+def build_fitness_plan(content):
+    """Fitness plan dict from a structured answer (dict) or a free-text one (str); `routine` is markdown."""
+    if isinstance(content, dict):
+        exercises = [e for e in content.get("routine") or [] if isinstance(e, dict)]
+        return {
+            "goals": content.get("goals") or "",
+            "exercises": exercises,
+            "tips": list(content.get("tips") or []),
+            "routine": render_routine_markdown(exercises),
+        }
+    plan = {"goals": DEFAULT_GOALS, "tips": list(DEFAULT_TIPS)}
+    if content:
+        plan["routine"] = content
+    return plan
+
+
+def normalize_plan(plan, list_fields=("important_considerations", "tips")):
+    """Convert plans saved before structured output (bullet lists stored as one string) to list fields."""
+    plan = dict(plan or {})
+    for field in list_fields:
+        if isinstance(plan.get(field), str):
+            plan[field] = [line.strip().lstrip("-").strip() for line in plan[field].splitlines() if line.strip()]
+    return plan
@@ -0,0 +1,280 @@
+import time
+import logging
+import contextvars
+from types import SimpleNamespace
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from plan_cache import plan_cache_key
+from plan_retrieval import PlanIndex
+from nutrition import nutrition_metrics
+from tracing import get_tracer
+from template_library import get_library, render_exercise_candidates, render_meal_candidates
+from plan_schema import (
+    DietaryPlanSchema, FitnessPlanSchema, IncrementalJSONParser, build_dietary_plan, build_fitness_plan, parse_plan,
+    schema_instruction,
+)
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+DEFAULT_AGENT_TIMEOUT = 120  # seconds
+PLAN_OUTPUT_TOKENS = 800  # expected plan size now that agents build from library candidates
+
+DIETARY_AGENT_INSTRUCTIONS = [
+    "Consider the user's input, including dietary restrictions and preferences.",
+    "Suggest a detailed meal plan for the day, including breakfast, lunch, dinner, and snacks.",
+    "Use the calorie and macro targets given in the profile; do not recalculate them.",
+    "Build the plan from the candidate meals listed, referring to them by name and adjusting portions to the targets.",
+    "Keep it concise: one entry per meal with its portion, and short notes.",
+    "Provide a brief explanation of why the plan is suited to the user's goals.",
+    "Focus on clarity, coherence, and quality of the recommendations.",
+    schema_instruction(DietaryPlanSchema),
+]
+FITNESS_AGENT_INSTRUCTIONS = [
+    "Provide exercises tailored to the user's goals.",
+    "Include warm-up, main workout, and cool-down exercises.",
+    "Use the BMI and energy figures given in the profile when choosing intensity.",
+    "Build the routine from the candidate exercises listed, referring to them by name, within the time available.",
+    "Keep it concise: one entry per exercise with sets, reps or duration.",
+    "Explain the benefits of each recommended exercise in its notes.",
+    "Ensure the plan is actionable and detailed.",
+    schema_instruction(FitnessPlanSchema),
+]
+
+DIETARY_AGENT = {
+    "name": "Dietary Expert",
+    "role": "Provides personalized dietary recommendations",
+    "instructions": DIETARY_AGENT_INSTRUCTIONS,
+}
+FITNESS_AGENT = {
+    "name": "Fitness Expert",
+    "role": "Provides personalized fitness recommendations",
+    "instructions": FITNESS_AGENT_INSTRUCTIONS,
+}
+
+
+PLAN_SCHEMAS = {"dietary": DietaryPlanSchema, "fitness": FitnessPlanSchema}
+
+
+#--------------------------------------
+# Structured output
+#--------------------------------------
+class StructuredPlanAgent:
+    """Agent look-alike that streams a JSON plan and returns it validated against `schema`.
+
+    The answer is parsed incrementally as it streams; `on_partial(plan)` is
+    called with the complete part parsed so far whenever it grows. `run`
+    returns the validated plan dict as the response content, or the raw text
+    if the answer doesn't match the schema, so a malformed reply still
+    yields a (free-text) plan.
+    """
+
+    def __init__(self, agent, schema, on_partial=None):
+        self.agent = agent
+        self.schema = schema
+        self.on_partial = on_partial
+
+    def run(self, message, **kwargs):
+        parser = IncrementalJSONParser()
+        stream = self.agent.run(message, stream=True, **kwargs)
+        try:
+            for chunk in stream:
+                delta = getattr(chunk, "content", None)
+                if not delta:
+                    continue
+                partial = parser.feed(delta)
+                if partial is not None and self.on_partial is not None:
+                    try:
+                        self.on_partial(partial)
+                    except Exception as e:
+                        logger.error(f"Partial plan callback failed: {str(e)}", exc_info=True)
+        finally:
+            if hasattr(stream, "close"):
+                stream.close()
+
+        plan = parse_plan(parser.text, self.schema)
+        return SimpleNamespace(content=plan if plan is not None else parser.text.strip())
+
+
+#--------------------------------------
+# Concurrent agent dispatch
+#--------------------------------------
+def run_agents_concurrently(agents, prompt, timeout=DEFAULT_AGENT_TIMEOUT, on_done=None):
+    """Run independent agents in parallel.
+
+    `agents` maps a key (e.g. "dietary") to an object exposing `run(prompt)`.
+    `prompt` is either one prompt for every agent or a dict of prompts keyed
+    like `agents`.
+    `timeout` is either a number of seconds applied to every agent or a dict
+    of per-agent timeouts keyed like `agents`.
+
+    Returns a `(results, errors)` pair: `results` maps each successful key to
+    its response content, `errors` maps each failed or timed out key to the
+    exception that prevented a result. Callers decide how to handle partial
+    results. `on_done(key)`, if given, is called as each agent finishes.
+    """
+    if not agents:
+        return {}, {}
+
+    results, errors = {}, {}
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(agents), thread_name_prefix="plan-agent")
+    try:
+        futures = {
+            # Each agent runs in a copy of the caller's context so its spans nest under the caller's
+            key: executor.submit(
+                contextvars.copy_context().run, agent.run, prompt[key] if isinstance(prompt, dict) else prompt
+            )
+            for key, agent in agents.items()
+        }
+        if on_done is not None:
+            for key, future in futures.items():
+                future.add_done_callback(lambda _, key=key: on_done(key))
+
+        # Every agent starts at the same time, so each one gets an absolute deadline
+        for key, future in futures.items():
+            agent_timeout = timeout.get(key, DEFAULT_AGENT_TIMEOUT) if isinstance(timeout, dict) else timeout
+            remaining = max(0.0, started + agent_timeout - time.perf_counter())
+            try:
+                response = future.result(timeout=remaining)
+                content = getattr(response, "content", None)
+                if not content:
+                    raise ValueError(f"{key} agent returned an empty response")
+                results[key] = content
+                logger.info(f"{key} agent finished in {time.perf_counter() - started:.2f}s")
+            except FutureTimeoutError:
+                future.cancel()
+                errors[key] = TimeoutError(f"{key} agent timed out after {agent_timeout}s")
+                logger.warning(f"{key} agent timed out after {agent_timeout}s")
+            except Exception as e:
+                errors[key] = e
+                logger.error(f"{key} agent failed: {str(e)}", exc_info=True)
+    finally:
+        # Don't block on agents that blew their deadline; their threads finish in the background
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    logger.info(f"Concurrent agent run finished in {time.perf_counter() - started:.2f}s "
+                f"({len(results)} succeeded, {len(errors)} failed)")
+    return results, errors
+
+
+#--------------------------------------
+# Plan generation
+#--------------------------------------
+@dataclass
+class PlanResult:
+    dietary_plan: dict
+    fitness_plan: dict
+    retrieval_index: dict
+    errors: dict = field(default_factory=dict)
+    cached: bool = False
+
+
+def build_user_profile(user_data):
+    """Render a profile dict, plus its computed nutrition metrics, as the prompt both plan agents receive."""
+    return f"""
+    Age: {user_data['age']}
+    Weight: {user_data['weight']}kg
+    Height: {user_data['height']}cm
+    Sex: {user_data['sex']}
+    Activity Level: {user_data['activity_level']}
+    Dietary Preferences: {user_data['dietary_preferences']}
+    Fitness Goals: {user_data['fitness_goals']}
+    Health Conditions: {', '.join(user_data['health_conditions'])}
+    Time Available: {user_data['time_available']} minutes per day
+
+    Computed metrics:
+    {nutrition_metrics(user_data).to_facts()}
+    """
+
+
+def build_agent_prompts(user_data):
+    """Per-agent prompts: the shared profile plus the library candidates each agent builds from."""
+    with get_tracer().span("prompt.assemble", kind="plan"):
+        user_profile = build_user_profile(user_data)
+        library = get_library()
+        meals = library.select_meals(user_data, nutrition_metrics(user_data).target_calories)
+        exercises = library.select_exercises(user_data)
+        return {
+            "dietary": f"{user_profile}\nCandidate meals:\n{render_meal_candidates(meals)}",
+            "fitness": f"{user_profile}\nCandidate exercises:\n{render_exercise_candidates(exercises)}",
+        }
+
+
+def plan_key(user_data, model_id):
+    """Key identifying the plans generated for a profile: profile, model, instructions and template library."""
+    instructions = DIETARY_AGENT_INSTRUCTIONS + FITNESS_AGENT_INSTRUCTIONS + [f"library {get_library().get_version()}"]
+    return plan_cache_key(user_data, model_id, instructions)
+
+
+def assemble_plans(results):
+    """Turn the agents' outputs (structured dicts, or free text) into the dietary/fitness plan dicts the UI displays."""
+    return build_dietary_plan(results.get("dietary")), build_fitness_plan(results.get("fitness"))
+
+
+def plan_result(results, errors=None, cached=False):
+    """PlanResult for the agents' outputs: the displayed plan dicts and the section index chat retrieves from."""
+    dietary_plan, fitness_plan = assemble_plans(results)
+    # Index the plan sections once so chat questions only send the relevant ones
+    plan_index = PlanIndex.build(dietary_plan.get("meal_plan", ""), fitness_plan.get("routine", ""))
+    return PlanResult(dietary_plan, fitness_plan, plan_index.to_dict(), errors=errors or {}, cached=cached)
+
+
+def cached_plans(user_data, model_id, cache):
+    """PlanResult for a profile whose plans are already in `cache`, or None. Never calls a model."""
+    results = cache.get(plan_key(user_data, model_id)) if cache is not None else None
+    return plan_result(results, cached=True) if results is not None else None
+
+
+def generate_plans(user_data, model_id, router, cache=None, timeout=DEFAULT_AGENT_TIMEOUT, session_id="default",
+                   progress=None, on_partial=None):
+    """Generate the dietary and fitness plans for one profile.
+
+    Uses `cache` (a PlanCache) when given, runs both agents concurrently on a
+    miss through `router` (a ModelRouter) on behalf of `session_id`, and keeps
+    partial results: failed agents are reported in `PlanResult.errors`.
+    Raises RuntimeError if neither plan could be generated. `progress(message,
+    fraction)`, if given, is called as the work advances, and `on_partial(key,
+    plan)` with each plan (a dict shaped like the final one) as it streams in.
+    """
+    with get_tracer().span("plan.generate", model=model_id, session=session_id) as span:
+        report = progress or (lambda message, fraction: None)
+        cache_key = plan_key(user_data, model_id)
+        results = cache.get(cache_key) if cache is not None else None
+        errors, cached = {}, results is not None
+
+        if results is None:
+            prompts = build_agent_prompts(user_data)
+            partial_builders = {"dietary": build_dietary_plan, "fitness": build_fitness_plan}
+            agents = {
+                key: StructuredPlanAgent(
+                    router.agent(model_id, spec, session_id, output_tokens=PLAN_OUTPUT_TOKENS), PLAN_SCHEMAS[key],
+                    on_partial=None if on_partial is None else
+                    (lambda plan, key=key: on_partial(key, partial_builders[key](plan))),
+                )
+                for key, spec in (("dietary", DIETARY_AGENT), ("fitness", FITNESS_AGENT))
+            }
+            finished = []
+
+            def agent_done(key):
+                finished.append(key)
+                report(f"The {key} plan is ready", 0.1 + 0.8 * len(finished) / len(agents))
+
+            report("Generating your dietary and fitness plans...", 0.1)
+            # Both agents are independent, so run them side by side
+            results, errors = run_agents_concurrently(agents, prompts, timeout=timeout, on_done=agent_done)
+
+            if not results:
+                raise RuntimeError("; ".join(str(e) for e in errors.values()))
+            # Only cache complete results so a transient failure is retried next time, and only when
+            # `model_id` wrote them: a fallback's plans don't belong under this model's key
+            served_by = {getattr(agent.agent, "served_by", None) for agent in agents.values()}
+            if cache is not None and not errors and served_by == {model_id}:
+                cache.set(cache_key, results)
+
+        report("Preparing your plans...", 0.95)
+        span.set(cached=cached, failed_agents=len(errors))
+        return plan_result(results, errors, cached)
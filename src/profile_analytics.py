@@ -0,0 +1,59 @@
+import logging
+
+import numpy as np
+
+from nutrition import BMI_CATEGORIES, bmi, bmi_category_codes
+from storage import FILTER_FIELDS, NUMERIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+PERCENTILES = (10, 50, 90)
+
+
+def column_stats(values):
+    """Count, mean and percentiles of a numeric column, ignoring missing values."""
+    values = values[~np.isnan(values)]
+    if not values.size:
+        return {"count": 0}
+    p10, p50, p90 = np.percentile(values, PERCENTILES)
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 1),
+        "p10": round(float(p10), 1),
+        "median": round(float(p50), 1),
+        "p90": round(float(p90), 1),
+    }
+
+
+def summarize_columns(columns):
+    """Vectorised summary of the numeric profile columns returned by `ProfileStore.profile_columns`."""
+    arrays = {
+        field: np.array([np.nan if v is None else v for v in columns.get(field, [])], dtype=np.float64)
+        for field in NUMERIC_FIELDS
+    }
+    summary = {field: column_stats(values) for field, values in arrays.items()}
+
+    bmi_values = bmi(arrays["weight"], arrays["height"])
+    bmi_values = bmi_values[np.isfinite(bmi_values)]
+    summary["bmi"] = column_stats(bmi_values)
+
+    counts = np.bincount(bmi_category_codes(bmi_values), minlength=len(BMI_CATEGORIES))
+    summary["bmi_categories"] = {label: int(count) for (_, label), count in zip(BMI_CATEGORIES, counts)}
+    return summary
+
+
+def profile_summary(store, **filters):
+    """Aggregate view of the profiles matching `filters`: totals, facet counts and numeric statistics.
+
+    Counts come straight from the store's indexes; only the numeric columns of
+    the matching profiles are loaded, and they are summarised with NumPy.
+    """
+    summary = {
+        "total": store.count_profiles(**filters),
+        "facets": {field: store.facet_counts(field, **filters) for field in FILTER_FIELDS},
+    }
+    summary.update(summarize_columns(store.profile_columns(**filters)))
+    return summary
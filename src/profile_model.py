@@ -0,0 +1,273 @@
+"""Compact in-memory representations of user profiles.
+
+The app passes profiles around as plain dicts (the shape built by the profile
+form). Holding many of them that way repeats the same category strings in
+every record, so this module provides two denser forms that convert losslessly
+to and from that dict shape:
+
+- `CompactProfile`, a `__slots__` record with categorical fields stored as
+  small integer codes, for holding individual profiles;
+- `ColumnarProfiles`, an array-backed column store for holding many profiles.
+"""
+import math
+import threading
+from array import array
+from dataclasses import dataclass
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+SEX_OPTIONS = ["Male", "Female", "Other"]
+ACTIVITY_LEVEL_OPTIONS = ["Sedentary", "Lightly Active", "Moderately Active", "Very Active", "Extremely Active"]
+FITNESS_GOAL_OPTIONS = ["Lose Weight", "Gain Muscle", "Endurance", "Stay Fit", "Strength Training"]
+DIETARY_PREFERENCE_OPTIONS = ["No Restrictions", "Vegetarian", "Vegan", "Keto", "Gluten Free", "Low Carb", "Dairy Free"]
+HEALTH_CONDITION_OPTIONS = ["None", "Diabetes", "Hypertension", "Heart Disease", "Joint Pain", "Obesity", "Other"]
+
+MISSING = 0  # category code of an absent field
+INT_MISSING = -1  # stored for an absent integer field
+
+
+class Category:
+    """Maps the values of one categorical field to small integer codes.
+
+    Codes for the known options are fixed; values outside them (e.g. from a
+    batch import) are assigned the next free code on first use, so encoding
+    never loses information.
+    """
+
+    def __init__(self, name, options):
+        self.name = name
+        self.values = [None] + list(options)
+        self.codes = {value: code for code, value in enumerate(self.values) if code != MISSING}
+        self._lock = threading.Lock()
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    if len(self.values) > 255:
+                        raise ValueError(f"Too many distinct {self.name} values")
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+    def decode(self, code):
+        return self.values[code]
+
+
+SEX = Category("sex", SEX_OPTIONS)
+ACTIVITY = Category("activity_level", ACTIVITY_LEVEL_OPTIONS)
+GOAL = Category("fitness_goals", FITNESS_GOAL_OPTIONS)
+DIET = Category("dietary_preferences", DIETARY_PREFERENCE_OPTIONS)
+CONDITION = Category("health_conditions", HEALTH_CONDITION_OPTIONS)
+
+CATEGORY_FIELDS = {
+    "sex": SEX,
+    "activity_level": ACTIVITY,
+    "fitness_goals": GOAL,
+    "dietary_preferences": DIET,
+}
+INT_FIELDS = ("age", "time_available")
+FLOAT_FIELDS = ("weight", "height")
+PROFILE_FIELDS = INT_FIELDS + FLOAT_FIELDS + tuple(CATEGORY_FIELDS) + ("health_conditions",)
+
+
+def _split(user_data):
+    """Separate the values the compact encodings can hold from those they can't (kept verbatim)."""
+    compact, extra = {}, {}
+    for key, value in user_data.items():
+        if key in INT_FIELDS:
+            fits = type(value) is int and 0 <= value < 2 ** 31
+        elif key in FLOAT_FIELDS:
+            fits = type(value) is float and not math.isnan(value)
+        elif key in CATEGORY_FIELDS:
+            fits = isinstance(value, str)
+        elif key == "health_conditions":
+            fits = type(value) is list and all(isinstance(c, str) for c in value)
+        else:
+            fits = False
+        (compact if fits else extra)[key] = value
+    return compact, extra or None
+
+
+#--------------------------------------
+# Single records
+#--------------------------------------
+@dataclass
+class CompactProfile:
+    __slots__ = ("age", "weight", "height", "time_available", "sex", "activity", "goal", "diet",
+                 "conditions", "extra")
+
+    age: int
+    weight: float
+    height: float
+    time_available: int
+    sex: int
+    activity: int
+    goal: int
+    diet: int
+    conditions: tuple
+    extra: dict
+
+    @classmethod
+    def from_dict(cls, user_data):
+        compact, extra = _split(user_data)
+        conditions = compact.get("health_conditions")
+        return cls(
+            age=compact.get("age", INT_MISSING),
+            weight=compact.get("weight", math.nan),
+            height=compact.get("height", math.nan),
+            time_available=compact.get("time_available", INT_MISSING),
+            sex=SEX.encode(compact["sex"]) if "sex" in compact else MISSING,
+            activity=ACTIVITY.encode(compact["activity_level"]) if "activity_level" in compact else MISSING,
+            goal=GOAL.encode(compact["fitness_goals"]) if "fitness_goals" in compact else MISSING,
+            diet=DIET.encode(compact["dietary_preferences"]) if "dietary_preferences" in compact else MISSING,
+            conditions=tuple(CONDITION.encode(c) for c in conditions) if conditions is not None else None,
+            extra=extra,
+        )
+
+    def to_dict(self):
+        user_data = {}
+        for key, value in (("age", self.age), ("time_available", self.time_available)):
+            if value != INT_MISSING:
+                user_data[key] = value
+        for key, value in (("weight", self.weight), ("height", self.height)):
+            if not math.isnan(value):
+                user_data[key] = value
+        for (key, category), code in zip(CATEGORY_FIELDS.items(), (self.sex, self.activity, self.goal, self.diet)):
+            if code != MISSING:
+                user_data[key] = category.decode(code)
+        if self.conditions is not None:
+            user_data["health_conditions"] = [CONDITION.decode(code) for code in self.conditions]
+        if self.extra:
+            user_data.update(self.extra)
+        return user_data
+
+
+#--------------------------------------
+# Column store
+#--------------------------------------
+class ColumnarProfiles:
+    """Array-backed storage for many profiles, addressed by user id.
+
+    Each field is one typed `array` column; health conditions use an offsets
+    column into a flat code column. Deleted rows are tombstoned and reclaimed
+    by `compact()`, which runs automatically once half the rows are dead.
+    Not thread-safe; callers hold their own lock.
+    """
+
+    def __init__(self):
+        self._rows = {}  # user_id -> row
+        self._ids = []
+        self._alive = bytearray()
+        self._ints = {field: array("i") for field in INT_FIELDS}
+        self._floats = {field: array("d") for field in FLOAT_FIELDS}
+        self._categories = {field: array("B") for field in CATEGORY_FIELDS}
+        self._condition_offsets = array("I", [0])
+        self._condition_codes = array("B")
+        self._has_conditions = bytearray()
+        self._extra = {}  # row -> dict of values kept verbatim
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, user_id):
+        return user_id in self._rows
+
+    def put(self, user_id, user_data):
+        """Store (or replace) a profile.
+
+        Every field is encoded before any column is touched, so a value that
+        can't be encoded raises with the store (and any previous profile for
+        `user_id`) unchanged.
+        """
+        compact, extra = _split(user_data)
+        categories = [
+            CATEGORY_FIELDS[field].encode(compact[field]) if field in compact else MISSING for field in self._categories
+        ]
+        conditions = compact.get("health_conditions")
+        condition_codes = array("B", (CONDITION.encode(c) for c in conditions or []))
+
+        if user_id in self._rows:
+            self.remove(user_id)
+        row = len(self._ids)
+        self._ids.append(user_id)
+        self._alive.append(1)
+        for field, column in self._ints.items():
+            column.append(compact.get(field, INT_MISSING))
+        for field, column in self._floats.items():
+            column.append(compact.get(field, math.nan))
+        for column, code in zip(self._categories.values(), categories):
+            column.append(code)
+        self._condition_codes.extend(condition_codes)
+        self._condition_offsets.append(len(self._condition_codes))
+        self._has_conditions.append(conditions is not None)
+        if extra:
+            self._extra[row] = extra
+        self._rows[user_id] = row
+
+    def get(self, user_id):
+        """Return the profile dict for `user_id`, or None."""
+        row = self._rows.get(user_id)
+        return None if row is None else self._decode(row)
+
+    def remove(self, user_id):
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return
+        self._alive[row] = 0
+        self._extra.pop(row, None)
+        if len(self._ids) > 64 and len(self._rows) < len(self._ids) // 2:
+            self.compact()
+
+    def items(self):
+        """Yield `(user_id, profile)` for every stored profile."""
+        for user_id, row in self._rows.items():
+            yield user_id, self._decode(row)
+
+    def column(self, field, user_ids=None):
+        """Values of a numeric field for all (or the given) profiles; missing values are None."""
+        values = self._ints[field] if field in self._ints else self._floats.get(field)
+        if values is None:
+            raise ValueError(f"{field} is not a numeric column")
+        rows = self._rows.values() if user_ids is None else (self._rows[u] for u in user_ids if u in self._rows)
+        missing = INT_MISSING if field in self._ints else None
+        result = []
+        for row in rows:
+            value = values[row]
+            result.append(None if value == missing or (missing is None and math.isnan(value)) else value)
+        return result
+
+    def compact(self):
+        """Rewrite the columns without deleted rows."""
+        fresh = ColumnarProfiles()
+        for user_id, row in self._rows.items():
+            fresh.put(user_id, self._decode(row))
+        self.__dict__.update(fresh.__dict__)
+
+    def nbytes(self):
+        """Approximate bytes held by the column buffers."""
+        columns = list(self._ints.values()) + list(self._floats.values()) + list(self._categories.values())
+        columns += [self._condition_offsets, self._condition_codes]
+        return sum(c.itemsize * len(c) for c in columns) + len(self._alive) + len(self._has_conditions)
+
+    def _decode(self, row):
+        user_data = {}
+        for field, column in self._ints.items():
+            if column[row] != INT_MISSING:
+                user_data[field] = column[row]
+        for field, column in self._floats.items():
+            if not math.isnan(column[row]):
+                user_data[field] = column[row]
+        for field, column in self._categories.items():
+            if column[row] != MISSING:
+                user_data[field] = CATEGORY_FIELDS[field].decode(column[row])
+        if self._has_conditions[row]:
+            start, end = self._condition_offsets[row], self._condition_offsets[row + 1]
+            user_data["health_conditions"] = [CONDITION.decode(code) for code in self._condition_codes[start:end]]
+        if row in self._extra:
+            user_data.update(self._extra[row])
+        return user_data
@@ -0,0 +1,335 @@
+import time
+import random
+import logging
+import threading
+import itertools
+from collections import OrderedDict, deque
+
+from chat_context import count_tokens
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+# Per-provider quotas: requests per minute and tokens per minute
+DEFAULT_PROVIDER_LIMITS = {
+    "google": {"rpm": 10, "tpm": 250000},
+    "groq": {"rpm": 30, "tpm": 12000},
+}
+DEFAULT_OUTPUT_TOKENS = 1500  # expected completion size charged up front
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0  # seconds
+BACKOFF_CAP = 30.0  # seconds
+BREAKER_FAILURE_THRESHOLD = 5  # consecutive failures before the circuit opens
+BREAKER_RESET_TIMEOUT = 30.0  # seconds before a half-open probe is allowed
+WAIT_SAMPLES = 500  # recent wait times kept for percentiles
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open."""
+
+
+def is_rate_limit_error(error):
+    """True for provider 429 / quota errors, whatever SDK raised them."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if status == 429:
+        return True
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "resource_exhausted" in message
+
+
+#--------------------------------------
+# Building blocks
+#--------------------------------------
+class TokenBucket:
+    """Classic token bucket refilled continuously at `per_minute / 60` tokens per second."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount):
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.tokens -= min(amount, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class CircuitBreaker:
+    """Stops calling a failing provider for a while, then lets one probe through."""
+
+    def __init__(self, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """"closed" if calls may go ahead, "probe" for the single half-open trial call, else None."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self.probing:
+                self.probing = True
+                return "probe"
+            return None
+
+    def release_probe(self):
+        """Free the probe slot when the probe ended without a verdict (e.g. a stream closed early)."""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning(f"Circuit opened after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+#--------------------------------------
+# Provider queue
+#--------------------------------------
+class ProviderQueue:
+    """Fair admission queue for one provider.
+
+    Waiting requests are grouped per session and granted round-robin across
+    sessions, so one busy session cannot starve the others. A request is
+    admitted once both the request and token buckets can cover it.
+    """
+
+    def __init__(self, name, rpm, tpm):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.breaker = CircuitBreaker()
+        self._sessions = OrderedDict()  # session_id -> deque of waiting tickets
+        self._tickets = itertools.count()
+        self._cond = threading.Condition()
+        self.waits = deque(maxlen=WAIT_SAMPLES)
+        self.counters = {"admitted": 0, "retries": 0, "rate_limited": 0, "failures": 0, "rejected": 0}
+
+    def count(self, counter):
+        with self._cond:
+            self.counters[counter] += 1
+
+    @property
+    def depth(self):
+        with self._cond:
+            return sum(len(tickets) for tickets in self._sessions.values())
+
+    def acquire(self, session_id, tokens):
+        """Block until this request may be sent; returns the time spent waiting."""
+        started = time.monotonic()
+        ticket = next(self._tickets)
+        with self._cond:
+            self._sessions.setdefault(session_id, deque()).append(ticket)
+            while True:
+                head_session, head_tickets = next(iter(self._sessions.items()))
+                if head_tickets[0] == ticket:
+                    delay = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+                    if delay == 0:
+                        break
+                else:
+                    delay = None
+                self._cond.wait(timeout=delay)
+
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            head_tickets.popleft()
+            # Rotate: this session goes to the back of the line if it has more requests waiting
+            del self._sessions[head_session]
+            if head_tickets:
+                self._sessions[head_session] = head_tickets
+            self.counters["admitted"] += 1
+            self._cond.notify_all()
+
+            waited = time.monotonic() - started
+            self.waits.append(waited)
+        return waited
+
+    def metrics(self):
+        with self._cond:
+            waits = sorted(self.waits)
+            counters = dict(self.counters)
+        return {
+            "queue_depth": self.depth,
+            "breaker": self.breaker.state,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            "wait_max": waits[-1] if waits else 0.0,
+            **counters,
+        }
+
+
+#--------------------------------------
+# Scheduler
+#--------------------------------------
+class ModelCallScheduler:
+    """Shared gate in front of every model call.
+
+    Applies per-provider request/token rate limits with fair queuing across
+    sessions, retries rate-limited calls with jittered exponential backoff, and
+    trips a circuit breaker when a provider keeps failing.
+    """
+
+    def __init__(self, limits=None, max_retries=MAX_RETRIES, sleep=time.sleep):
+        limits = limits or DEFAULT_PROVIDER_LIMITS
+        self.queues = {name: ProviderQueue(name, **limit) for name, limit in limits.items()}
+        self.max_retries = max_retries
+        self._sleep = sleep
+
+    def call(self, provider, session_id, fn, estimated_tokens=DEFAULT_OUTPUT_TOKENS):
+        """Run `fn()` against `provider` once admitted, retrying rate-limit errors."""
+        queue = self.queues.get(provider)
+        if queue is None:
+            return fn()
+
+        probe = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                # A half-open probe keeps its slot across its own rate-limit retries
+                if not probe:
+                    probe = self._check_breaker(queue) == "probe"
+                self._acquire(queue, session_id, estimated_tokens)
+                try:
+                    result = fn()
+                except Exception as e:
+                    if not is_rate_limit_error(e) or attempt == self.max_retries:
+                        queue.count("failures")
+                        queue.breaker.record_failure()
+                        raise
+                    queue.count("rate_limited")
+                else:
+                    queue.breaker.record_success()
+                    return result
+
+                queue.count("retries")
+                backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"{provider} rate limited; retry {attempt + 1}/{self.max_retries} in {backoff:.1f}s")
+                self._sleep(backoff)
+        finally:
+            if probe:
+                queue.breaker.release_probe()
+
+    def stream(self, provider, session_id, open_stream, estimated_tokens=DEFAULT_OUTPUT_TOKENS):
+        """Yield the chunks of `open_stream()` once admitted, retrying rate-limit errors raised before any content.
+
+        Once content has been yielded the stream can't be replayed, so later errors are raised as they are.
+        A stream closed early by its consumer counts as neither a success nor a failure.
+        """
+        queue = self.queues.get(provider)
+        if queue is None:
+            yield from open_stream()
+            return
+
+        probe = False
+        try:
+            for attempt in range(self.max_retries + 1):
+                if not probe:
+                    probe = self._check_breaker(queue) == "probe"
+                self._acquire(queue, session_id, estimated_tokens)
+                produced = False
+                stream = open_stream()
+                try:
+                    for chunk in stream:
+                        produced = produced or bool(getattr(chunk, "content", None))
+                        yield chunk
+                except Exception as e:
+                    if produced or not is_rate_limit_error(e) or attempt == self.max_retries:
+                        queue.count("failures")
+                        queue.breaker.record_failure()
+                        raise
+                    queue.count("rate_limited")
+                else:
+                    queue.breaker.record_success()
+                    return
+                finally:
+                    if hasattr(stream, "close"):
+                        stream.close()
+
+                queue.count("retries")
+                backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"{provider} rate limited before streaming; retry {attempt + 1}/{self.max_retries} "
+                               f"in {backoff:.1f}s")
+                self._sleep(backoff)
+        finally:
+            # Also runs on GeneratorExit, so an abandoned probe doesn't hold the breaker half-open forever
+            if probe:
+                queue.breaker.release_probe()
+
+    def wrap(self, agent, provider, session_id, output_tokens=DEFAULT_OUTPUT_TOKENS):
+        """Return an agent look-alike whose `run` goes through this scheduler."""
+        return ScheduledAgent(self, agent, provider, session_id, output_tokens)
+
+    def metrics(self):
+        """Queue depth, wait-time and retry/breaker metrics per provider."""
+        return {name: queue.metrics() for name, queue in self.queues.items()}
+
+    def _check_breaker(self, queue):
+        verdict = queue.breaker.allow()
+        if verdict is None:
+            queue.count("rejected")
+            raise CircuitOpenError(f"{queue.name} is temporarily unavailable after repeated failures")
+        return verdict
+
+    def _acquire(self, queue, session_id, estimated_tokens):
+        waited = queue.acquire(session_id, estimated_tokens)
+        if waited > 1:
+            logger.info(f"Waited {waited:.1f}s for {queue.name} capacity (session {session_id})")
+
+
+class ScheduledAgent:
+    """Agent wrapper that routes `run` through a ModelCallScheduler."""
+
+    def __init__(self, scheduler, agent, provider, session_id, output_tokens):
+        self.scheduler = scheduler
+        self.agent = agent
+        self.provider = provider
+        self.session_id = session_id
+        self.output_tokens = output_tokens
+
+    def run(self, message, stream=False, **kwargs):
+        tokens = count_tokens(str(message)) + sum(
+            count_tokens(m.get("content", "")) for m in kwargs.get("messages") or []
+        ) + self.output_tokens
+        if stream:
+            return self.scheduler.stream(
+                self.provider, self.session_id, lambda: self.agent.run(message, stream=True, **kwargs), tokens
+            )
+        return self.scheduler.call(
+            self.provider, self.session_id, lambda: self.agent.run(message, **kwargs), tokens
+        )
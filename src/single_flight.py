@@ -0,0 +1,149 @@
+import json
+import hashlib
+import logging
+import threading
+import contextvars
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+def request_key(model_id, spec, message, messages=None):
+    """Stable key for a model request: same model, agent, prompt and history give the same key."""
+    payload = {
+        "model": model_id,
+        "agent": spec.get("name"),
+        "instructions": spec.get("instructions"),
+        # Whitespace differences (e.g. from prompt templates) don't change the answer
+        "message": " ".join(str(message).split()),
+        "messages": [(m.get("role"), " ".join(str(m.get("content", "")).split())) for m in messages or []],
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _StreamFlight:
+    """One in-flight stream whose chunks are replayed to every subscriber."""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.cond = threading.Condition()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one.
+
+    The first caller for a key runs the call; callers arriving with the same key
+    while it is in flight wait for and share its result (or exception). Once the
+    call finishes the key is released, so later calls run again.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._streams = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key, fn):
+        """Return `fn()`, sharing the result with identical calls already in flight."""
+        with self._lock:
+            self.stats["calls"] += 1
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+                self.stats["executed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            logger.info(f"Coalesced request {key[:12]} onto an in-flight call")
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stream(self, key, factory):
+        """Yield the chunks of `factory()`, sharing one underlying stream with identical callers.
+
+        The stream is consumed on a background thread and buffered, so every
+        subscriber sees it from the first chunk. It is closed early only when
+        every subscriber has stopped reading.
+        """
+        with self._lock:
+            self.stats["calls"] += 1
+            flight = self._streams.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._streams[key] = _StreamFlight()
+                self.stats["executed"] += 1
+            else:
+                self.stats["coalesced"] += 1
+            with flight.cond:
+                flight.subscribers += 1
+
+        if leader:
+            # The producer runs in the leader's context so its tracing spans nest under the leader's request
+            threading.Thread(target=contextvars.copy_context().run, args=(self._produce, key, flight, factory),
+                             daemon=True, name="single-flight-stream").start()
+        else:
+            logger.info(f"Coalesced stream {key[:12]} onto an in-flight stream")
+
+        position = 0
+        try:
+            while True:
+                with flight.cond:
+                    while position >= len(flight.chunks) and not flight.done:
+                        flight.cond.wait()
+                    if position < len(flight.chunks):
+                        chunk = flight.chunks[position]
+                        position += 1
+                    elif flight.error is not None:
+                        raise flight.error
+                    else:
+                        return
+                yield chunk
+        finally:
+            with flight.cond:
+                flight.subscribers -= 1
+            with self._lock:
+                # An abandoned stream is about to stop; make sure nobody new joins it
+                if flight.subscribers == 0 and self._streams.get(key) is flight:
+                    del self._streams[key]
+
+    def _produce(self, key, flight, factory):
+        stream = None
+        try:
+            stream = factory()
+            for chunk in stream:
+                with flight.cond:
+                    if flight.subscribers == 0:
+                        # Everyone stopped reading; don't pay for the rest of the answer
+                        break
+                    flight.chunks.append(chunk)
+                    flight.cond.notify_all()
+        except BaseException as e:
+            # Subscribers get every failure, not an empty stream
+            flight.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            with self._lock:
+                if self._streams.get(key) is flight:
+                    del self._streams[key]
+            with flight.cond:
+                flight.done = True
+                flight.cond.notify_all()
@@ -0,0 +1,620 @@
+import json
+import time
+import uuid
+import atexit
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from itertools import count, islice
+from collections import OrderedDict, deque
+
+from profile_model import ColumnarProfiles
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+DEFAULT_MAX_PROFILES = 10000
+DEFAULT_MAX_MESSAGES_PER_USER = 500
+DEFAULT_COMPACT_INTERVAL = 30.0  # seconds between background trims of chat logs to their retention
+DEFAULT_PAGE_SIZE = 20
+LAST_ACCESS_RESOLUTION = 300.0  # seconds; a read only rewrites last_access once it is older than this
+# Lower bound of each age / weight band profiles are indexed by
+AGE_BANDS = [(0, "Under 18"), (18, "18-29"), (30, "30-44"), (45, "45-59"), (60, "60+")]
+WEIGHT_BANDS = [(0, "Under 60kg"), (60, "60-79kg"), (80, "80-99kg"), (100, "100kg+")]
+# Single-valued indexed fields; "condition" is indexed too but a profile can have several
+INDEXED_FIELDS = ("goal", "diet", "activity", "age_band", "weight_band")
+FILTER_FIELDS = INDEXED_FIELDS + ("condition",)
+NUMERIC_FIELDS = ("age", "weight", "height")
+
+
+def _band(value, bands):
+    label = bands[0][1]
+    for lower, band in bands:
+        if value is not None and float(value) >= lower:
+            label = band
+    return label
+
+
+def age_band(age):
+    """Label of the AGE_BANDS band `age` falls in."""
+    return _band(age, AGE_BANDS)
+
+
+def weight_band(weight):
+    """Label of the WEIGHT_BANDS band `weight` (kg) falls in."""
+    return _band(weight, WEIGHT_BANDS)
+
+
+def profile_facets(profile):
+    """Indexed values of a profile, keyed by filter name."""
+    return {
+        "goal": profile.get("fitness_goals"),
+        "diet": profile.get("dietary_preferences"),
+        "activity": profile.get("activity_level"),
+        "age_band": age_band(profile.get("age")),
+        "weight_band": weight_band(profile.get("weight")),
+    }
+
+
+def profile_conditions(profile):
+    """Health conditions of a profile worth indexing ("None" is not one)."""
+    return sorted({c for c in profile.get("health_conditions") or [] if c and c != "None"})
+
+
+def _check_filters(filters):
+    unknown = set(filters) - set(FILTER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown profile filters: {', '.join(sorted(unknown))}")
+    return {field: value for field, value in filters.items() if value is not None}
+
+
+#--------------------------------------
+# Store interface
+#--------------------------------------
+class ProfileStore:
+    """Storage for user profiles, their generated plans and chat history.
+
+    `max_profiles` bounds the number of stored profiles; the least recently
+    used profile is evicted together with its plans and messages.
+    `max_messages_per_user` keeps only the most recent messages of each chat.
+    Chats are append-only logs read a page at a time; each message carries an
+    `id` that increases with every append.
+    `max_profile_age` (seconds, optional) drops profiles not used for that long.
+    """
+
+    def __init__(self, max_profiles=DEFAULT_MAX_PROFILES, max_messages_per_user=DEFAULT_MAX_MESSAGES_PER_USER,
+                 max_profile_age=None):
+        self.max_profiles = max_profiles
+        self.max_messages_per_user = max_messages_per_user
+        self.max_profile_age = max_profile_age
+
+    def create_profile(self, user_data):
+        """Store a new profile and return its generated user id."""
+        raise NotImplementedError
+
+    def load_profile(self, user_id):
+        """Return the profile dict for `user_id`, or None if it does not exist."""
+        raise NotImplementedError
+
+    def list_profiles(self):
+        """Return `(user_id, profile)` pairs, most recently used first."""
+        raise NotImplementedError
+
+    def delete_profile(self, user_id):
+        """Remove a profile together with its plans and chat history."""
+        raise NotImplementedError
+
+    def search_profiles(self, offset=0, limit=DEFAULT_PAGE_SIZE, **filters):
+        """Return `(total, page)` for profiles matching every given filter.
+
+        Filters are keyword arguments named in FILTER_FIELDS (e.g. `goal="Keto"`,
+        `condition="Hypertension"`); None means "any". `page` holds at most
+        `limit` `(user_id, profile)` pairs starting at `offset`, most recently
+        used first. Filters use the profile indexes, so a page costs the same
+        however many profiles are stored.
+        """
+        raise NotImplementedError
+
+    def count_profiles(self, **filters):
+        """Number of profiles matching the filters."""
+        raise NotImplementedError
+
+    def facet_counts(self, field, **filters):
+        """`{value: count}` of `field` (one of FILTER_FIELDS) over profiles matching the filters."""
+        raise NotImplementedError
+
+    def profile_columns(self, **filters):
+        """Numeric columns (`{"age": [...], "weight": [...], "height": [...]}`) of matching profiles."""
+        raise NotImplementedError
+
+    def save_plans(self, user_id, dietary_plan, fitness_plan, retrieval_index=None):
+        """Store a user's plans, optionally with the serialized section index built from them."""
+        raise NotImplementedError
+
+    def load_plans(self, user_id):
+        """Return `{"dietary_plan": ..., "fitness_plan": ..., "retrieval_index": ...}` or None."""
+        raise NotImplementedError
+
+    def append_message(self, user_id, role, content):
+        """Append a message to the user's chat log and return its id."""
+        raise NotImplementedError
+
+    def load_messages(self, user_id, before=None, limit=None):
+        """Return `{"id", "role", "content"}` messages, oldest first.
+
+        With `limit`, only the newest `limit` messages are returned; with
+        `before`, only messages older than that id, so older pages can be
+        fetched one at a time.
+        """
+        raise NotImplementedError
+
+    def count_messages(self, user_id, before=None):
+        """Number of messages in the user's chat (older than id `before`, if given)."""
+        raise NotImplementedError
+
+    def clear_messages(self, user_id):
+        raise NotImplementedError
+
+    def flush(self):
+        """Persist any buffered writes."""
+
+    def close(self):
+        self.flush()
+
+
+#--------------------------------------
+# In-memory backend
+#--------------------------------------
+class MemoryStore(ProfileStore):
+    """Process-local store, mainly for tests and single-replica development.
+
+    Profiles are held in a ColumnarProfiles column store rather than as dicts.
+    """
+
+    def __init__(self, **retention):
+        super().__init__(**retention)
+        self._profiles = OrderedDict()  # user_id -> last_access, least recently used first
+        self._data = ColumnarProfiles()
+        self._plans = {}
+        self._messages = {}
+        self._message_ids = count(1)
+        self._index = {field: {} for field in FILTER_FIELDS}  # field -> value -> set of user ids
+        self._lock = threading.RLock()
+
+    def create_profile(self, user_data):
+        user_id = str(uuid.uuid4())
+        with self._lock:
+            self._profiles[user_id] = time.time()
+            self._data.put(user_id, user_data)
+            for field, value in self._indexed_values(user_data):
+                self._index[field].setdefault(value, set()).add(user_id)
+            self._evict()
+        return user_id
+
+    def load_profile(self, user_id):
+        with self._lock:
+            if user_id not in self._profiles:
+                return None
+            self._profiles[user_id] = time.time()
+            self._profiles.move_to_end(user_id)
+            return self._data.get(user_id)
+
+    def list_profiles(self):
+        with self._lock:
+            return [(user_id, self._data.get(user_id)) for user_id in reversed(self._profiles)]
+
+    def delete_profile(self, user_id):
+        with self._lock:
+            if self._profiles.pop(user_id, None) is not None:
+                for field, value in self._indexed_values(self._data.get(user_id)):
+                    self._index[field].get(value, set()).discard(user_id)
+                self._data.remove(user_id)
+            self._plans.pop(user_id, None)
+            self._messages.pop(user_id, None)
+
+    def search_profiles(self, offset=0, limit=DEFAULT_PAGE_SIZE, **filters):
+        with self._lock:
+            user_ids = self._match(filters)
+            if user_ids is None:
+                # No filter: walk the recency order and stop at the end of the page
+                page = islice(reversed(self._profiles), offset, offset + limit)
+                return len(self._profiles), [(user_id, self._data.get(user_id)) for user_id in page]
+
+            ordered = sorted(user_ids, key=self._profiles.__getitem__, reverse=True)
+            return len(ordered), [(user_id, self._data.get(user_id)) for user_id in ordered[offset:offset + limit]]
+
+    def count_profiles(self, **filters):
+        with self._lock:
+            user_ids = self._match(filters)
+            return len(self._profiles) if user_ids is None else len(user_ids)
+
+    def facet_counts(self, field, **filters):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown profile field: {field}")
+        with self._lock:
+            user_ids = self._match(filters)
+            counts = {
+                value: len(ids) if user_ids is None else len(ids & user_ids)
+                for value, ids in self._index[field].items()
+            }
+        return {value: count for value, count in counts.items() if count}
+
+    def profile_columns(self, **filters):
+        with self._lock:
+            user_ids = self._match(filters)
+            return {field: self._data.column(field, user_ids) for field in NUMERIC_FIELDS}
+
+    def _match(self, filters):
+        """Ids matching every filter, or None when nothing is filtered."""
+        filters = _check_filters(filters)
+        if not filters:
+            return None
+        matches = [self._index[field].get(value, set()) for field, value in filters.items()]
+        # Intersect starting from the smallest posting set
+        return set.intersection(*sorted(matches, key=len))
+
+    @staticmethod
+    def _indexed_values(profile):
+        yield from profile_facets(profile).items()
+        for condition in profile_conditions(profile):
+            yield "condition", condition
+
+    def save_plans(self, user_id, dietary_plan, fitness_plan, retrieval_index=None):
+        with self._lock:
+            self._plans[user_id] = {
+                "dietary_plan": dietary_plan,
+                "fitness_plan": fitness_plan,
+                "retrieval_index": retrieval_index,
+            }
+
+    def load_plans(self, user_id):
+        with self._lock:
+            return self._plans.get(user_id)
+
+    def append_message(self, user_id, role, content):
+        with self._lock:
+            if user_id not in self._messages:
+                self._messages[user_id] = deque(maxlen=self.max_messages_per_user)
+            message_id = next(self._message_ids)
+            self._messages[user_id].append({"id": message_id, "role": role, "content": content})
+            return message_id
+
+    def load_messages(self, user_id, before=None, limit=None):
+        with self._lock:
+            messages = [dict(m) for m in self._messages.get(user_id, ()) if before is None or m["id"] < before]
+        return messages[-limit:] if limit else messages
+
+    def count_messages(self, user_id, before=None):
+        with self._lock:
+            return sum(1 for m in self._messages.get(user_id, ()) if before is None or m["id"] < before)
+
+    def clear_messages(self, user_id):
+        with self._lock:
+            self._messages.pop(user_id, None)
+
+    def _evict(self):
+        if self.max_profile_age is not None:
+            cutoff = time.time() - self.max_profile_age
+            for user_id in [uid for uid, last_access in self._profiles.items() if last_access < cutoff]:
+                self.delete_profile(user_id)
+        while len(self._profiles) > self.max_profiles:
+            user_id = next(iter(self._profiles))
+            logger.info(f"Evicting least recently used profile {user_id}")
+            self.delete_profile(user_id)
+
+
+#--------------------------------------
+# SQLite backend
+#--------------------------------------
+class SQLiteStore(ProfileStore):
+    """Durable store backed by a SQLite database in WAL mode.
+
+    Each operation commits in its own short write transaction, so replicas on
+    the same host can share one database file: they see each other's writes
+    at once and only wait on the write lock for the length of one operation.
+    Reads refresh a profile's `last_access` at most every
+    LAST_ACCESS_RESOLUTION seconds, so reruns don't write on every load.
+
+    Appending a chat message is a single insert; chats that grew past
+    `max_messages_per_user` are trimmed by the background thread every
+    `compact_interval` seconds.
+    """
+
+    def __init__(self, path, compact_interval=DEFAULT_COMPACT_INTERVAL, **retention):
+        super().__init__(**retention)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.compact_interval = compact_interval
+        self._depth = 0  # nesting of _transaction blocks on this connection
+        self._grown_chats = set()  # users with messages appended since the last compaction
+        self._lock = threading.RLock()
+        self._closed = threading.Event()
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS profiles (
+                user_id TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_profiles_access ON profiles(last_access);
+            CREATE TABLE IF NOT EXISTS profile_conditions (
+                user_id TEXT NOT NULL,
+                condition TEXT NOT NULL,
+                PRIMARY KEY (condition, user_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_profile_conditions_user ON profile_conditions(user_id);
+            CREATE TABLE IF NOT EXISTS plans (
+                user_id TEXT PRIMARY KEY,
+                dietary_plan TEXT NOT NULL,
+                fitness_plan TEXT NOT NULL,
+                retrieval_index TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_user ON messages(user_id, id);
+        """)
+        # Databases created before plans carried a retrieval index
+        plan_columns = {row[1] for row in self._conn.execute("PRAGMA table_info(plans)")}
+        if "retrieval_index" not in plan_columns:
+            self._conn.execute("ALTER TABLE plans ADD COLUMN retrieval_index TEXT")
+        # ...and before profiles had indexed columns; add them and backfill from the JSON data
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(profiles)")}
+        missing = [field for field in INDEXED_FIELDS + NUMERIC_FIELDS if field not in existing]
+        for field in missing:
+            self._conn.execute(f"ALTER TABLE profiles ADD COLUMN {field} {'REAL' if field in NUMERIC_FIELDS else 'TEXT'}")
+        if missing:
+            rows = self._conn.execute("SELECT user_id, data FROM profiles").fetchall()
+            logger.info(f"Indexing {len(rows)} existing profiles")
+            for user_id, data in rows:
+                self._index_profile(user_id, json.loads(data))
+        for field in INDEXED_FIELDS:
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_profiles_{field} ON profiles({field}, last_access)")
+        self._conn.commit()
+
+        self._compactor = threading.Thread(target=self._compact_loop, name="sqlite-store-compact", daemon=True)
+        self._compactor.start()
+        atexit.register(self.close)
+
+    def create_profile(self, user_data):
+        user_id = str(uuid.uuid4())
+        now = time.time()
+        with self._transaction():
+            self._write(
+                "INSERT INTO profiles (user_id, data, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (user_id, json.dumps(user_data), now, now),
+            )
+            self._index_profile(user_id, user_data)
+        # Eviction is its own transaction so the insert's write lock is held as briefly as possible
+        self._evict()
+        return user_id
+
+    def load_profile(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, last_access FROM profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] >= LAST_ACCESS_RESOLUTION:
+                with self._transaction():
+                    self._write("UPDATE profiles SET last_access = ? WHERE user_id = ?", (now, user_id))
+        return json.loads(row[0])
+
+    def list_profiles(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT user_id, data FROM profiles ORDER BY last_access DESC").fetchall()
+        return [(user_id, json.loads(data)) for user_id, data in rows]
+
+    def search_profiles(self, offset=0, limit=DEFAULT_PAGE_SIZE, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM profiles{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT user_id, data FROM profiles{where} ORDER BY last_access DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return total, [(user_id, json.loads(data)) for user_id, data in rows]
+
+    def count_profiles(self, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM profiles{where}", params).fetchone()[0]
+
+    def facet_counts(self, field, **filters):
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Unknown profile field: {field}")
+        where, params = self._where(filters)
+        if field == "condition":
+            sql = ("SELECT profile_conditions.condition, COUNT(*) FROM profile_conditions"
+                   f" JOIN profiles ON profiles.user_id = profile_conditions.user_id{where} GROUP BY 1")
+        else:
+            sql = f"SELECT profiles.{field}, COUNT(*) FROM profiles{where} GROUP BY 1"
+        with self._lock:
+            return dict(self._conn.execute(sql, params).fetchall())
+
+    def profile_columns(self, **filters):
+        where, params = self._where(filters)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(NUMERIC_FIELDS)} FROM profiles{where}", params).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(NUMERIC_FIELDS)
+        return {field: list(values) for field, values in zip(NUMERIC_FIELDS, columns)}
+
+    def delete_profile(self, user_id):
+        with self._transaction():
+            self._write("DELETE FROM profiles WHERE user_id = ?", (user_id,))
+            self._write("DELETE FROM profile_conditions WHERE user_id = ?", (user_id,))
+            self._write("DELETE FROM plans WHERE user_id = ?", (user_id,))
+            self._write("DELETE FROM messages WHERE user_id = ?", (user_id,))
+
+    def save_plans(self, user_id, dietary_plan, fitness_plan, retrieval_index=None):
+        with self._transaction():
+            self._write(
+                "INSERT OR REPLACE INTO plans (user_id, dietary_plan, fitness_plan, retrieval_index, updated_at)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (user_id, json.dumps(dietary_plan), json.dumps(fitness_plan),
+                 json.dumps(retrieval_index) if retrieval_index is not None else None, time.time()),
+            )
+
+    def load_plans(self, user_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dietary_plan, fitness_plan, retrieval_index FROM plans WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "dietary_plan": json.loads(row[0]),
+            "fitness_plan": json.loads(row[1]),
+            "retrieval_index": json.loads(row[2]) if row[2] else None,
+        }
+
+    def append_message(self, user_id, role, content):
+        with self._transaction():
+            cursor = self._write(
+                "INSERT INTO messages (user_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                (user_id, role, content, time.time()),
+            )
+            self._grown_chats.add(user_id)
+            return cursor.lastrowid
+
+    def load_messages(self, user_id, before=None, limit=None):
+        # Newest first so LIMIT picks the latest page, then flipped to oldest first
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, role, content FROM messages WHERE user_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (user_id, before if before is not None else 2 ** 63 - 1, limit if limit else -1),
+            ).fetchall()
+        return [{"id": message_id, "role": role, "content": content} for message_id, role, content in reversed(rows)]
+
+    def count_messages(self, user_id, before=None):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE user_id = ? AND id < ?",
+                (user_id, before if before is not None else 2 ** 63 - 1),
+            ).fetchone()[0]
+
+    def compact_messages(self):
+        """Trim the chats appended to since the last compaction to their newest `max_messages_per_user`."""
+        with self._lock:
+            grown, self._grown_chats = self._grown_chats, set()
+            for user_id in grown:
+                with self._transaction():
+                    self._write(
+                        "DELETE FROM messages WHERE user_id = ? AND id IN ("
+                        " SELECT id FROM messages WHERE user_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?)",
+                        (user_id, user_id, self.max_messages_per_user),
+                    )
+        if grown:
+            logger.debug(f"Compacted {len(grown)} chat logs")
+
+    def clear_messages(self, user_id):
+        with self._transaction():
+            self._write("DELETE FROM messages WHERE user_id = ?", (user_id,))
+            self._grown_chats.discard(user_id)
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self.compact_messages()
+        with self._lock:
+            self._conn.close()
+
+    def _index_profile(self, user_id, profile):
+        facets = profile_facets(profile)
+        columns = list(INDEXED_FIELDS + NUMERIC_FIELDS)
+        self._write(
+            f"UPDATE profiles SET {', '.join(f'{field} = ?' for field in columns)} WHERE user_id = ?",
+            [facets[field] for field in INDEXED_FIELDS] + [profile.get(field) for field in NUMERIC_FIELDS] + [user_id],
+        )
+        for condition in profile_conditions(profile):
+            self._write(
+                "INSERT OR IGNORE INTO profile_conditions (user_id, condition) VALUES (?, ?)", (user_id, condition)
+            )
+
+    @staticmethod
+    def _where(filters):
+        """SQL WHERE clause and parameters for profile filters."""
+        filters = _check_filters(filters)
+        clauses, params = [], []
+        for field, value in filters.items():
+            if field == "condition":
+                clauses.append("profiles.user_id IN (SELECT user_id FROM profile_conditions WHERE condition = ?)")
+            else:
+                clauses.append(f"profiles.{field} = ?")
+            params.append(value)
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    @contextmanager
+    def _transaction(self):
+        """Run the block as one write transaction, committed when the outermost block exits."""
+        with self._lock:
+            if self._depth == 0:
+                # Take the write lock up front so a busy database is waited on, not failed mid-transaction
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.rollback()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.commit()
+
+    def _write(self, sql, params):
+        return self._conn.execute(sql, params)
+
+    def _compact_loop(self):
+        while not self._closed.wait(self.compact_interval):
+            try:
+                self.compact_messages()
+            except Exception as e:
+                logger.error(f"Background chat compaction failed: {str(e)}", exc_info=True)
+
+    def _evict(self):
+        with self._transaction():
+            if self.max_profile_age is not None:
+                cutoff = time.time() - self.max_profile_age
+                for (user_id,) in self._conn.execute(
+                    "SELECT user_id FROM profiles WHERE last_access < ?", (cutoff,)
+                ).fetchall():
+                    self.delete_profile(user_id)
+            # Counted in the transaction, not cached: other replicas add and evict profiles too
+            excess = self._conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0] - self.max_profiles
+            if excess <= 0:
+                return
+            for (user_id,) in self._conn.execute(
+                "SELECT user_id FROM profiles ORDER BY last_access LIMIT ?", (excess,)
+            ).fetchall():
+                logger.info(f"Evicting least recently used profile {user_id}")
+                self.delete_profile(user_id)
+
+
+def create_store(backend="memory", path=None, **options):
+    """Build a ProfileStore from a backend name ("memory" or "sqlite")."""
+    if backend == "memory":
+        options.pop("compact_interval", None)
+        return MemoryStore(**options)
+    if backend == "sqlite":
+        if path is None:
+            raise ValueError("The sqlite store backend needs a path")
+        return SQLiteStore(path, **options)
+    raise ValueError(f"Unknown store backend: {backend}")
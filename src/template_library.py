@@ -0,0 +1,144 @@
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+LIBRARY_DIR = Path(__file__).parent / "library"
+# Candidates offered to the agents per phase / meal slot
+PHASE_CANDIDATES = {"warm_up": 3, "main": 8, "cool_down": 3}
+MEAL_CANDIDATES = 3
+# Share of the daily calorie target per meal slot
+MEAL_SLOT_SHARES = {"breakfast": 0.25, "lunch": 0.35, "dinner": 0.30, "snack": 0.10}
+# Preferred exercise intensity (1 = low, 3 = high) per activity level
+ACTIVITY_INTENSITY = {
+    "Sedentary": 1,
+    "Lightly Active": 1,
+    "Moderately Active": 2,
+    "Very Active": 3,
+    "Extremely Active": 3,
+}
+INTENSITY_LABELS = {1: "low", 2: "moderate", 3: "high"}
+PHASE_LABELS = {"warm_up": "Warm-up", "main": "Main workout", "cool_down": "Cool-down"}
+
+
+def _index(items, field):
+    """Map each value of a (possibly list-valued) field to the set of item ids carrying it."""
+    index = {}
+    for item in items.values():
+        values = item[field] if isinstance(item[field], list) else [item[field]]
+        for value in values:
+            index.setdefault(value, set()).add(item["id"])
+    return index
+
+
+class TemplateLibrary:
+    """Local exercise and meal templates the plan agents build from.
+
+    The JSON files are read on first use; lookups by goal, phase, diet, meal
+    slot and contraindicated health condition go through indexes built once
+    at load time.
+    """
+
+    def __init__(self, directory=LIBRARY_DIR):
+        self.directory = Path(directory)
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            raw = {name: (self.directory / f"{name}.json").read_bytes() for name in ("exercises", "meals")}
+            self.exercises = {e["id"]: e for e in json.loads(raw["exercises"])["exercises"]}
+            self.meals = {m["id"]: m for m in json.loads(raw["meals"])["meals"]}
+            self.version = hashlib.sha256(raw["exercises"] + raw["meals"]).hexdigest()[:12]
+
+            self.exercises_by_goal = _index(self.exercises, "goals")
+            self.exercises_by_phase = _index(self.exercises, "phase")
+            self.exercises_avoided = _index(self.exercises, "avoid")
+            self.meals_by_diet = _index(self.meals, "diets")
+            self.meals_by_slot = _index(self.meals, "slot")
+            self.meals_avoided = _index(self.meals, "avoid")
+            self._loaded = True
+            logger.info(f"Loaded template library {self.version}: "
+                        f"{len(self.exercises)} exercises, {len(self.meals)} meals")
+
+    def get_version(self):
+        """Content hash of the library files, used in plan cache keys."""
+        self._ensure_loaded()
+        return self.version
+
+    def select_exercises(self, user_data):
+        """`{phase: [exercise, ...]}` suited to the profile's goal, conditions and activity level."""
+        self._ensure_loaded()
+        avoided = set().union(*(self.exercises_avoided.get(c, set()) for c in user_data.get("health_conditions", [])))
+        goal_ids = self.exercises_by_goal.get(user_data.get("fitness_goals"), set(self.exercises))
+        target = ACTIVITY_INTENSITY.get(user_data.get("activity_level"), 2)
+        time_available = user_data.get("time_available") or 45
+
+        selection = {}
+        for phase, count in PHASE_CANDIDATES.items():
+            ids = (self.exercises_by_phase.get(phase, set()) & goal_ids) - avoided
+            # Closest to the preferred intensity first, then exercises that fit the session
+            ranked = sorted(
+                (self.exercises[i] for i in ids),
+                key=lambda e: (abs(e["intensity"] - target), e["minutes"] > time_available, e["id"]),
+            )
+            selection[phase] = ranked[:count]
+        return selection
+
+    def select_meals(self, user_data, target_calories):
+        """`{slot: [meal, ...]}` matching the dietary preference, closest to each slot's calorie budget."""
+        self._ensure_loaded()
+        avoided = set().union(*(self.meals_avoided.get(c, set()) for c in user_data.get("health_conditions", [])))
+        diet = user_data.get("dietary_preferences")
+        diet_ids = set(self.meals) if diet in (None, "No Restrictions") else self.meals_by_diet.get(diet, set())
+
+        selection = {}
+        for slot, share in MEAL_SLOT_SHARES.items():
+            budget = target_calories * share
+            ids = (self.meals_by_slot.get(slot, set()) & diet_ids) - avoided
+            ranked = sorted((self.meals[i] for i in ids), key=lambda m: (abs(m["calories"] - budget), m["id"]))
+            selection[slot] = ranked[:MEAL_CANDIDATES]
+        return selection
+
+
+def render_exercise_candidates(selection):
+    """Compact text listing of selected exercises for the fitness agent."""
+    lines = []
+    for phase, exercises in selection.items():
+        if exercises:
+            items = "; ".join(
+                f"{e['name']} ({e['minutes']} min, {INTENSITY_LABELS[e['intensity']]}): {e['cue'].rstrip('.')}"
+                for e in exercises
+            )
+            lines.append(f"{PHASE_LABELS[phase]}: {items}")
+    return "\n".join(lines)
+
+
+def render_meal_candidates(selection):
+    """Compact text listing of selected meals for the dietary agent."""
+    lines = []
+    for slot, meals in selection.items():
+        if meals:
+            items = "; ".join(
+                f"{m['name']} ({m['calories']} kcal, P{m['protein_g']}/F{m['fat_g']}/C{m['carbs_g']}g)" for m in meals
+            )
+            lines.append(f"{slot.title()}: {items}")
+    return "\n".join(lines)
+
+
+_library = TemplateLibrary()
+
+
+def get_library():
+    """Return the process-wide template library (loaded on first use)."""
+    return _library
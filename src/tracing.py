@@ -0,0 +1,353 @@
+import os
+import json
+import time
+import queue
+import atexit
+import bisect
+import logging
+import secrets
+import functools
+import threading
+import contextvars
+from pathlib import Path
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+#-----------------------------------------------------
+# Configs
+#-----------------------------------------------------
+TRACING_ENABLED = os.getenv("TRACING", "false").lower() == "true"
+# OTLP/JSON span file (one ExportTraceServiceRequest per line, as the OpenTelemetry collector's file exporter writes)
+TRACE_FILE = os.getenv("TRACE_FILE", str(Path(__file__).parent.parent.resolve() / "data" / "traces.jsonl"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve Prometheus text on /metrics when set
+SERVICE_NAME = "ai-health-and-fitness-planner"
+# Histogram bucket upper bounds in seconds (Prometheus `le` labels)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+QUANTILE_SAMPLES = 2048  # most recent observations kept per series for p50/p95/p99
+EXPORT_QUEUE_SIZE = 10000  # finished spans waiting for the file writer; beyond this they are dropped
+EXPORT_INTERVAL = 2.0  # seconds between span file writes
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Histogram:
+    """Cumulative Prometheus-style buckets plus a window of recent values for quantiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=QUANTILE_SAMPLES)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.total += value
+            self.count += 1
+            self.recent.append(value)
+
+    def quantiles(self, qs=(0.5, 0.95, 0.99)):
+        with self._lock:
+            ordered = sorted(self.recent)
+        if not ordered:
+            return {q: None for q in qs}
+        return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] for q in qs}
+
+
+class Span:
+    """One timed stage. Ends on leaving its `with` block, or on `end()` for spans that outlive one."""
+
+    def __init__(self, tracer, name, attributes, parent):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter()
+        self.error = None
+        self._token = None
+        self._ended = False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self._ended:
+            return
+        self._ended = True
+        self.error = error
+        self.tracer._finish(self, time.perf_counter() - self.started)
+
+    def __enter__(self):
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        # BaseExceptions (Streamlit's rerun/stop signals, GeneratorExit) are control flow, not errors
+        self.end(error=exc if isinstance(exc, Exception) else None)
+        return False
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is off, so instrumented code costs one attribute check."""
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, error=None):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """Spans and metrics for the app's hot paths.
+
+    Span durations feed per-(span, model) latency histograms; `observe` and
+    `count` record other distributions (time to first token) and totals
+    (tokens in/out). Metrics are exposed as Prometheus text, finished spans
+    are optionally written to an OTLP/JSON file by a background thread.
+    When disabled, `span` returns a shared no-op and nothing is recorded.
+    """
+
+    def __init__(self, enabled=TRACING_ENABLED):
+        self.enabled = enabled
+        self.histograms = {}  # (metric, labels) -> Histogram
+        self.counters = {}  # (metric, labels) -> float
+        self._lock = threading.Lock()
+        self._export_queue = None
+
+    def span(self, name, **attributes):
+        """Time a stage; use as a context manager, or call `.end()` when it spans a generator."""
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes, _current_span.get())
+
+    def observe(self, metric, value, **labels):
+        if self.enabled:
+            self._histogram(metric, labels).observe(value)
+
+    def count(self, metric, value=1, **labels):
+        if self.enabled:
+            key = (metric, tuple(sorted(labels.items())))
+            with self._lock:
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def _histogram(self, metric, labels):
+        key = (metric, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def _finish(self, span, seconds):
+        self._histogram("span_seconds", {"span": span.name, "model": span.attributes.get("model", "")}).observe(seconds)
+        if span.error is not None:
+            self.count("span_errors_total", span=span.name)
+        if self._export_queue is not None:
+            try:
+                self._export_queue.put_nowait((span, time.time_ns()))
+            except queue.Full:
+                pass
+
+    #--------------------------------------
+    # Reporting
+    #--------------------------------------
+    def stats(self):
+        """Rows of count, mean and p50/p95/p99 (seconds) per histogram series, plus counter totals."""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = dict(self.counters)
+        rows = []
+        for (metric, labels), histogram in sorted(histograms, key=lambda item: item[0]):
+            quantiles = histogram.quantiles()
+            rows.append({
+                "metric": metric, **dict(labels), "count": histogram.count,
+                "mean": histogram.total / histogram.count if histogram.count else None,
+                "p50": quantiles[0.5], "p95": quantiles[0.95], "p99": quantiles[0.99],
+            })
+        totals = [
+            {"metric": metric, **dict(labels), "value": value} for (metric, labels), value in sorted(counters.items())
+        ]
+        return {"histograms": rows, "counters": totals}
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = list(self.histograms.items())
+            counters = dict(self.counters)
+        lines, typed = [], set()
+        for (metric, labels), histogram in sorted(histograms, key=lambda item: item[0]):
+            name = f"app_{metric}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            with histogram._lock:
+                counts, total, count = list(histogram.counts), histogram.total, histogram.count
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_labels(labels, le=le)} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {total}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        for (metric, labels), value in sorted(counters.items()):
+            name = f"app_{metric}"
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    #--------------------------------------
+    # Exporters
+    #--------------------------------------
+    def start_file_export(self, path=TRACE_FILE):
+        """Write finished spans to `path` as OTLP/JSON lines from a background thread."""
+        if self._export_queue is not None:
+            return
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._export_queue = queue.Queue(EXPORT_QUEUE_SIZE)
+        thread = threading.Thread(target=self._export_loop, args=(path,), name="trace-export", daemon=True)
+        thread.start()
+        atexit.register(self._flush, path)
+
+    def _export_loop(self, path):
+        while True:
+            time.sleep(EXPORT_INTERVAL)
+            try:
+                self._flush(path)
+            except Exception as e:
+                logger.error(f"Span export failed: {str(e)}", exc_info=True)
+
+    def _flush(self, path):
+        spans = []
+        while True:
+            try:
+                spans.append(self._export_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not spans:
+            return
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [_attribute("service.name", SERVICE_NAME)]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [_otlp_span(span, end_ns) for span, end_ns in spans],
+            }],
+        }]}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request, separators=(",", ":")) + "\n")
+
+    def start_metrics_server(self, port=METRICS_PORT):
+        """Serve `render_prometheus()` on http://0.0.0.0:<port>/metrics from a daemon thread."""
+        tracer = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        logger.info(f"Serving Prometheus metrics on port {port}")
+        return server
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span, end_ns):
+    record = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(end_ns),
+        "attributes": [_attribute(k, v) for k, v in span.attributes.items() if v is not None],
+        "status": {"code": 2, "message": str(span.error)} if span.error is not None else {"code": 1},
+    }
+    if span.parent_id:
+        record["parentSpanId"] = span.parent_id
+    return record
+
+
+_tracer = Tracer()
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the process-wide tracer."""
+    return _tracer
+
+
+def traced(name, **attributes):
+    """Decorator timing every call of a function as span `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _tracer.enabled:
+                return func(*args, **kwargs)
+            with _tracer.span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def configure_tracing(trace_file=TRACE_FILE, metrics_port=METRICS_PORT):
+    """Start the span file writer and, if `metrics_port` is set, the Prometheus endpoint; once per process."""
+    global _configured
+    with _configure_lock:
+        if _configured or not _tracer.enabled:
+            return
+        _configured = True
+        if trace_file:
+            _tracer.start_file_export(trace_file)
+        if metrics_port:
+            try:
+                _tracer.start_metrics_server(metrics_port)
+            except OSError as e:
+                logger.error(f"Could not serve metrics on port {metrics_port}: {str(e)}", exc_info=True)
@@ -0,0 +1,110 @@
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import model_router
+from model_registry import GEMINI_MODEL_NAME, GROQ_MODEL_NAME, ModelRegistry
+from model_router import ModelRouter
+from plan_service import generate_plans
+
+SPEC = {"name": "Tester", "role": "Answers questions", "instructions": ["Answer briefly."]}
+PROFILE = {
+    "age": 30, "weight": 70.0, "height": 175.0, "sex": "Male", "activity_level": "Moderately Active",
+    "dietary_preferences": "Vegetarian", "fitness_goals": "Weight Loss", "health_conditions": ["None"],
+    "time_available": 30,
+}
+
+
+class FakeAgent:
+    """Answers with its model id, or fails when its model is in `failing`; records every request."""
+
+    def __init__(self, model_id, failing, requests, gate=None):
+        self.model_id = model_id
+        self.failing = failing
+        self.requests = requests
+        self.gate = gate
+
+    def run(self, message, stream=False, **kwargs):
+        self.requests.append((self.model_id, message, kwargs))
+        if self.gate is not None:
+            self.gate.wait()
+        if self.model_id in self.failing:
+            raise RuntimeError(f"{self.model_id} is down")
+        response = SimpleNamespace(content=f"answer from {self.model_id}")
+        return iter([response]) if stream else response
+
+
+def make_router(failing=(), gates=None, **router_options):
+    requests = []
+    registry = ModelRegistry(
+        model_factory=lambda model_id: model_id,
+        agent_factory=lambda model_id, *args, **kwargs: FakeAgent(
+            model_id, failing, requests, (gates or {}).get(model_id)
+        ),
+    )
+    return ModelRouter(registry, coalesce=False, **router_options), requests
+
+
+def rebuilt_for(model_id):
+    return f"short prompt for {model_id}", {"messages": []}
+
+
+def test_failover_sends_the_request_prepared_for_the_fallback():
+    router, requests = make_router(failing={GEMINI_MODEL_NAME})
+    agent = router.agent(GEMINI_MODEL_NAME, SPEC, prepare=rebuilt_for)
+
+    response = agent.run("long prompt", messages=[{"role": "user", "content": "earlier"}])
+
+    assert response.content == f"answer from {GROQ_MODEL_NAME}"
+    assert requests[-1] == (GROQ_MODEL_NAME, f"short prompt for {GROQ_MODEL_NAME}", {"messages": []})
+    assert agent.served_by == GROQ_MODEL_NAME
+
+
+def test_stream_failover_sends_the_request_prepared_for_the_fallback():
+    router, requests = make_router(failing={GEMINI_MODEL_NAME})
+    agent = router.agent(GEMINI_MODEL_NAME, SPEC, prepare=rebuilt_for)
+
+    chunks = [chunk.content for chunk in agent.run("long prompt", stream=True)]
+
+    assert chunks == [f"answer from {GROQ_MODEL_NAME}"]
+    assert requests[-1][1] == f"short prompt for {GROQ_MODEL_NAME}"
+    assert agent.served_by == GROQ_MODEL_NAME
+
+
+def test_failover_without_prepare_resends_the_request():
+    router, requests = make_router(failing={GEMINI_MODEL_NAME})
+    router.agent(GEMINI_MODEL_NAME, SPEC).run("prompt", messages=[])
+    assert requests[-1] == (GROQ_MODEL_NAME, "prompt", {"messages": []})
+
+
+class DictCache(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def test_plans_from_the_fallback_are_not_cached():
+    router, _ = make_router(failing={GEMINI_MODEL_NAME})
+    cache = DictCache()
+    result = generate_plans(PROFILE, GEMINI_MODEL_NAME, router, cache=cache)
+    assert not result.errors
+    assert not cache
+
+    router, _ = make_router()
+    generate_plans(PROFILE, GEMINI_MODEL_NAME, router, cache=cache)
+    assert len(cache) == 1
+
+
+def test_throttled_provider_does_not_starve_the_other(monkeypatch):
+    monkeypatch.setattr(model_router, "MAX_WORKERS", 2)
+    gate = threading.Event()
+    router, _ = make_router(gates={GEMINI_MODEL_NAME: gate}, fallbacks={})
+    try:
+        with ThreadPoolExecutor(max_workers=2) as callers:
+            # Both of the throttled provider's workers are stuck waiting
+            stuck = [callers.submit(router.agent(GEMINI_MODEL_NAME, SPEC).run, "prompt") for _ in range(2)]
+            response = router.agent(GROQ_MODEL_NAME, SPEC).run("prompt")
+            assert response.content == f"answer from {GROQ_MODEL_NAME}"
+            assert not any(future.done() for future in stuck)
+            gate.set()
+    finally:
+        gate.set()
@@ -0,0 +1,48 @@
+import pytest
+
+import profile_model
+from profile_model import Category, ColumnarProfiles
+
+PROFILE = {
+    "age": 30, "weight": 70.0, "height": 175.0, "sex": "Male", "activity_level": "Sedentary",
+    "fitness_goals": "Stay Fit", "dietary_preferences": "Vegan", "health_conditions": ["None"], "time_available": 30,
+}
+
+
+def column_lengths(profiles):
+    columns = [*profiles._ints.values(), *profiles._floats.values(), *profiles._categories.values()]
+    return {len(profiles._ids), len(profiles._alive), len(profiles._has_conditions),
+            len(profiles._condition_offsets) - 1, *map(len, columns)}
+
+
+@pytest.fixture
+def full_diet(monkeypatch):
+    """A dietary preference category with no codes left."""
+    category = Category("dietary_preferences", [f"diet {i}" for i in range(255)])
+    monkeypatch.setitem(profile_model.CATEGORY_FIELDS, "dietary_preferences", category)
+    return category
+
+
+def test_put_that_cannot_encode_leaves_columns_aligned(full_diet):
+    profiles = ColumnarProfiles()
+    profiles.put("a", {**PROFILE, "dietary_preferences": "diet 1"})
+
+    with pytest.raises(ValueError):
+        profiles.put("b", {**PROFILE, "dietary_preferences": "something new"})
+
+    assert column_lengths(profiles) == {1}
+    assert "b" not in profiles
+    profiles.put("c", {**PROFILE, "dietary_preferences": "diet 2"})
+    assert profiles.get("c")["dietary_preferences"] == "diet 2"
+    assert profiles.get("a")["dietary_preferences"] == "diet 1"
+
+
+def test_failed_replace_keeps_the_previous_profile(full_diet):
+    profiles = ColumnarProfiles()
+    profiles.put("a", {**PROFILE, "dietary_preferences": "diet 1"})
+
+    with pytest.raises(ValueError):
+        profiles.put("a", {**PROFILE, "age": 31, "dietary_preferences": "something new"})
+
+    assert profiles.get("a") == {**PROFILE, "dietary_preferences": "diet 1"}
+    assert column_lengths(profiles) == {1}
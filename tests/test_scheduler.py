@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from scheduler import CircuitOpenError, ModelCallScheduler
+
+LIMITS = {"fake": {"rpm": 10000, "tpm": 10_000_000}}
+RESET_TIMEOUT = 0.05
+
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+
+class FakeProvider:
+    """Fails, rate-limits or answers according to a script of outcomes, one per call."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else "ok"
+        if outcome == "error":
+            raise RuntimeError("503 Service Unavailable")
+        if outcome == "429":
+            raise FakeRateLimitError("429 Too Many Requests")
+        return outcome
+
+
+def make_scheduler():
+    scheduler = ModelCallScheduler(limits=LIMITS, sleep=lambda seconds: None)
+    breaker = scheduler.queues["fake"].breaker
+    breaker.reset_timeout = RESET_TIMEOUT
+    return scheduler, breaker
+
+
+def trip(scheduler, breaker):
+    provider = FakeProvider(*["error"] * breaker.failure_threshold)
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(RuntimeError):
+            scheduler.call("fake", "s", provider)
+    assert breaker.state == "open"
+
+
+def test_breaker_recovers_open_half_open_closed():
+    scheduler, breaker = make_scheduler()
+    trip(scheduler, breaker)
+    with pytest.raises(CircuitOpenError):
+        scheduler.call("fake", "s", FakeProvider())
+
+    time.sleep(RESET_TIMEOUT)
+    assert breaker.state == "half_open"
+    assert scheduler.call("fake", "s", FakeProvider("ok")) == "ok"
+    assert breaker.state == "closed"
+    assert not breaker.probing
+
+
+def test_failed_probe_reopens_breaker():
+    scheduler, breaker = make_scheduler()
+    trip(scheduler, breaker)
+    time.sleep(RESET_TIMEOUT)
+    with pytest.raises(RuntimeError):
+        scheduler.call("fake", "s", FakeProvider("error"))
+    assert breaker.state == "open"
+    assert not breaker.probing
+
+
+def test_rate_limited_probe_keeps_its_slot_and_closes_breaker():
+    scheduler, breaker = make_scheduler()
+    trip(scheduler, breaker)
+    time.sleep(RESET_TIMEOUT)
+    provider = FakeProvider("429", "429", "ok")
+    assert scheduler.call("fake", "s", provider) == "ok"
+    assert provider.calls == 3
+    assert breaker.state == "closed"
+    assert scheduler.call("fake", "s", FakeProvider()) == "ok"
+
+
+def test_probe_slot_released_when_probe_is_interrupted():
+    scheduler, breaker = make_scheduler()
+    trip(scheduler, breaker)
+    time.sleep(RESET_TIMEOUT)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        scheduler.call("fake", "s", interrupted)
+    assert not breaker.probing
+    assert scheduler.call("fake", "s", FakeProvider()) == "ok"
+
+
+def fake_stream(*pieces, error=None):
+    if error is not None:
+        raise error
+    for piece in pieces:
+        yield type("Chunk", (), {"content": piece})()
+
+
+def test_probe_stream_closed_early_releases_probe():
+    scheduler, breaker = make_scheduler()
+    trip(scheduler, breaker)
+    time.sleep(RESET_TIMEOUT)
+
+    stream = scheduler.stream("fake", "s", lambda: fake_stream("a", "b", "c"))
+    assert next(stream).content == "a"
+    stream.close()
+    # Neither a success nor a failure: the breaker stays half-open but the next call may probe
+    assert breaker.state == "half_open"
+    assert not breaker.probing
+    assert "".join(chunk.content for chunk in scheduler.stream("fake", "s", lambda: fake_stream("x", "y"))) == "xy"
+    assert breaker.state == "closed"
+
+
+def test_rate_limited_probe_stream_retries_before_content():
+    scheduler, breaker = make_scheduler()
+    trip(scheduler, breaker)
+    time.sleep(RESET_TIMEOUT)
+    attempts = iter([FakeRateLimitError("429"), None])
+    stream = scheduler.stream("fake", "s", lambda: fake_stream("ok", error=next(attempts)))
+    assert [chunk.content for chunk in stream] == ["ok"]
+    assert breaker.state == "closed"